@@ -1,18 +1,76 @@
-from flask import Flask, render_template, request, jsonify, send_file, abort
+from flask import Flask, render_template, request, jsonify, send_file, abort, stream_with_context
 from flask_cors import CORS
+import hashlib
+import itertools
 import os
-import threading
+import re
+import shutil
 import time
-from scraper import YouTubeChannelScraper
-import zipfile
-import io
+from scraper import MANIFEST_DIRNAME, render_cache
+from async_scraper import AsyncScrapeRunner
+from batch import parse_channel
+from job_queue import JobStore, JobManager
+from work_queue import WorkQueue, work_queue_path
+from languages import LanguagePreference
+from progress_events import ProgressBroker, job_event, format_sse, KEEPALIVE, KEEPALIVE_SECONDS
+from transcript_index import TranscriptIndex, encode_cursor, listing_item
+from zip_stream import stream_zip
+from compact_store import load_transcript_file, read_segments
+from render import FORMATS, download_name, render_text
+from search_index import SearchIndex, search_index_path
+from dedup import DedupIndex
+from retry import FailureStore, failures_path
+from fetch_cache import TranscriptCache
+from channel_cache import ChannelCache
+from export import FORMATS as EXPORT_FORMATS, DEFAULT_SHARD_MB, EXPORTS_DIRNAME, MANIFEST, load_manifest
+from metrics import REGISTRY
 from datetime import datetime
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Global variables for progress tracking
-scraping_progress = {
+# One shared event loop drives every scrape started by this process
+scrape_runner = AsyncScrapeRunner(blocking_workers=int(os.environ.get('SCRAPER_BLOCKING_WORKERS', 32)))
+
+# Jobs live in SQLite so every worker process sees the same queue and they survive restarts
+DATA_DIR = os.environ.get('SCRAPER_DATA_DIR', 'data')
+job_store = JobStore(os.path.join(DATA_DIR, 'jobs.sqlite3'))
+# With SCRAPER_DISTRIBUTED=1 every replica fetches videos of every job from one shared work queue
+work_queue = WorkQueue(work_queue_path(DATA_DIR)) if os.environ.get('SCRAPER_DISTRIBUTED') == '1' else None
+
+# Progress is pushed to /api/progress/stream subscribers as jobs report it
+progress_broker = ProgressBroker()
+job_manager = JobManager(
+    job_store,
+    scrape_runner,
+    max_concurrent_jobs=int(os.environ.get('SCRAPER_MAX_JOBS', 2)),
+    broker=progress_broker,
+    work_queue=work_queue,
+    worker_slots=int(os.environ.get('SCRAPER_WORKER_SLOTS', 10))
+)
+# With SCRAPER_RUN_JOBS=0 this process only serves requests and never loads the scraping libraries;
+# `python job_queue.py` runs the jobs in a process of its own
+if os.environ.get('SCRAPER_RUN_JOBS', '1') != '0':
+    job_manager.start()
+scrape_runner.submit(progress_broker.watch_store(job_store))
+
+# Listings are served from the transcript index, which is cached per process until the next write
+TRANSCRIPTS_DIR = 'transcripts'
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+transcript_index = TranscriptIndex.open(TRANSCRIPTS_DIR)
+search_index = SearchIndex.shared(search_index_path(TRANSCRIPTS_DIR))
+dedup_index = DedupIndex.open(TRANSCRIPTS_DIR)
+failure_store = FailureStore.shared(failures_path(TRANSCRIPTS_DIR))
+# Shared with the scrapers this process runs; deliberately kept by /api/clear so re-scrapes stay offline
+fetch_cache = TranscriptCache.open(TRANSCRIPTS_DIR)
+channel_cache = ChannelCache.open(TRANSCRIPTS_DIR)
+
+# Bulk exports, one directory of shards per export name, written by export jobs
+EXPORTS_DIR = os.path.join(TRANSCRIPTS_DIR, EXPORTS_DIRNAME)
+EXPORT_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+IDLE_PROGRESS = {
     'active': False,
     'current': 0,
     'total': 0,
@@ -22,16 +80,6 @@ scraping_progress = {
     'results': None
 }
 
-def progress_callback(current, total, video_title, status):
-    """Callback function to update scraping progress"""
-    global scraping_progress
-    scraping_progress.update({
-        'current': current,
-        'total': total,
-        'current_video': video_title,
-        'status': status
-    })
-
 @app.route('/')
 def index():
     """Main page"""
@@ -44,91 +92,336 @@ def health():
 
 @app.route('/api/scrape', methods=['POST'])
 def start_scraping():
-    """Start scraping process"""
-    global scraping_progress
-    
-    if scraping_progress['active']:
-        return jsonify({'error': 'Scraping already in progress'}), 400
-    
+    """Queue a scraping job for one channel, or a batch job for a list of channel_urls"""
     data = request.get_json()
     channel_url = data.get('channel_url')
-    max_videos = data.get('max_videos')
-    include_timestamps = data.get('include_timestamps', False)
+    channels = data.get('channel_urls') or []
     
-    if not channel_url:
+    try:
+        channels = [parse_channel(channel) for channel in channels]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid channel_urls: {str(e)}'}), 400
+    
+    if not channel_url and not channels:
         return jsonify({'error': 'Channel URL is required'}), 400
     
-    # Reset progress
-    scraping_progress.update({
-        'active': True,
-        'current': 0,
-        'total': 0,
-        'current_video': '',
-        'status': 'starting',
-        'message': 'Initializing scraper...',
-        'results': None
+    if channels:
+        if channel_url:
+            channels.insert(0, parse_channel(channel_url))
+        channel_url = f"{len(channels)} channels"
+    
+    try:
+        languages = LanguagePreference.from_params(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if data.get('refresh'):
+        # Enumerate the channels again instead of using their cached listings
+        for url in [channel['url'] for channel in channels] or [channel_url]:
+            channel_cache.invalidate(url)
+    
+    job = job_store.create(channel_url, {
+        **languages.to_params(),
+        'channels': channels,
+        'max_videos': data.get('max_videos'),
+        'include_timestamps': data.get('include_timestamps', False),
+        'incremental': data.get('incremental', False),
+        'max_workers': int(data.get('max_workers') or os.environ.get('SCRAPER_MAX_WORKERS', 1)),
+        'requests_per_second': float(data.get('requests_per_second') or os.environ.get('SCRAPER_REQUESTS_PER_SECOND', 1.0))
     })
     
-    def scrape_thread():
-        global scraping_progress
-        try:
-            scraper = YouTubeChannelScraper(channel_url)
-            scraping_progress['message'] = 'Extracting video information...'
-            
-            results = scraper.scrape_all_transcripts(
-                max_videos=max_videos,
-                include_timestamps=include_timestamps,
-                progress_callback=progress_callback
-            )
-            
-            scraping_progress.update({
-                'active': False,
-                'status': 'completed',
-                'message': results['message'],
-                'results': results
-            })
-            
-        except Exception as e:
-            scraping_progress.update({
-                'active': False,
-                'status': 'error',
-                'message': f'Error: {str(e)}',
-                'results': None
-            })
-    
-    # Start scraping in background thread
-    thread = threading.Thread(target=scrape_thread)
-    thread.daemon = True
-    thread.start()
-    
-    return jsonify({'message': 'Scraping started', 'status': 'started'})
+    return jsonify({'message': 'Scraping queued', 'status': job['status'], 'job_id': job['id']})
+
+@app.route('/api/jobs')
+def list_jobs():
+    """List recent scraping jobs, newest first"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify(job_store.list(limit=limit))
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Get progress of a single scraping job"""
+    job = job_store.get(job_id)
+    
+    if job is None:
+        abort(404)
+    
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running scraping job"""
+    job = job_store.cancel(job_id)
+    
+    if job is None:
+        abort(404)
+    
+    return jsonify(job)
 
 @app.route('/api/progress')
 def get_progress():
-    """Get current scraping progress"""
-    return jsonify(scraping_progress)
+    """Get progress of the most recently queued job"""
+    return jsonify(job_store.latest() or IDLE_PROGRESS)
+
+def progress_job(job_id=None):
+    """Job a progress stream follows: the requested one, else the most recently queued"""
+    return job_store.get(job_id) if job_id else job_store.latest()
+
+def stream_progress(job):
+    """Server-sent events for one job: its current state, then every change until it finishes"""
+    with progress_broker.subscribe(job['id']) as subscription:
+        # Re-read after subscribing so no change between the two is lost
+        event = job_event(job_store.get(job['id']))
+        yield format_sse(event)
+        while event['active']:
+            events = subscription.get(KEEPALIVE_SECONDS)
+            if not events:
+                yield KEEPALIVE
+                continue
+            yield b"".join(format_sse(event) for event in events)
+            event = events[-1]
+
+@app.route('/api/progress/stream')
+def get_progress_stream():
+    """Push progress of a job (job_id, default the latest) as server-sent events
+    
+    Under a WSGI server each open stream holds a worker thread; asgi.py serves this
+    route on the event loop instead.
+    """
+    job = progress_job(request.args.get('job_id'))
+    
+    if job is None:
+        abort(404)
+    
+    return app.response_class(
+        stream_with_context(stream_progress(job)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/transcripts')
 def list_transcripts():
-    """List all existing transcripts"""
-    scraper = YouTubeChannelScraper("")  # Empty URL since we're just listing files
-    transcripts = scraper.get_existing_transcripts()
-    return jsonify(transcripts)
-
-@app.route('/api/transcript/<filename>')
-def get_transcript(filename):
-    """Get content of a specific transcript"""
-    scraper = YouTubeChannelScraper("")
-    content = scraper.get_transcript_content(filename)
-    
-    if content is None:
+    """List transcripts a page at a time, newest first by default"""
+    sort = request.args.get('sort', 'modified')
+    if sort not in ('modified', 'size', 'title'):
+        return jsonify({'error': 'sort must be one of modified, size, title'}), 400
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    
+    # The index version changes on every write, so it makes a cheap validator for any listing
+    etag = f"{transcript_index.version()}-{hashlib.sha1(request.query_string).hexdigest()[:16]}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    try:
+        _, entries = transcript_index.cached_list(
+            sort=sort,
+            descending=request.args.get('order', 'desc') != 'asc',
+            limit=limit + 1,
+            cursor=request.args.get('cursor'),
+            channel=request.args.get('channel'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            title_prefix=request.args.get('title_prefix'),
+            language=request.args.get('lang')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    page = entries[:limit]
+    response = jsonify({
+        'transcripts': [listing_item(entry, TRANSCRIPTS_DIR) for entry in page],
+        'next_cursor': encode_cursor(page[-1], sort) if len(entries) > limit else None
+    })
+    response.set_etag(etag)
+    return response
+
+def find_transcript(name):
+    """Index entry for a video ID, or for a text file name as listed by /api/transcripts
+
+    ?lang= picks one of the video's languages; by default the one it was first saved in.
+    """
+    return transcript_index.find(name, request.args.get('lang'))
+
+def timestamps_arg():
+    value = request.args.get('timestamps')
+    return None if value is None else value not in ('0', 'false', '')
+
+@app.route('/api/transcript/<name>')
+def get_transcript(name):
+    """Render a transcript by video ID (or text file name) as txt, srt, vtt or md
+    
+    Without ?format= the plain text is returned wrapped in JSON, as before.
+    """
+    fmt = request.args.get('format')
+    if fmt is not None and fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    
+    entry = find_transcript(name)
+    
+    if entry is None:
         abort(404)
     
-    return jsonify({'filename': filename, 'content': content})
+    content = render_cache.get_or_render(TRANSCRIPTS_DIR, entry, fmt or 'txt', timestamps_arg())
+    if fmt is None:
+        return jsonify({'filename': entry['txt_file'], 'language': entry['language'], 'content': content})
+    
+    headers = {}
+    if request.args.get('download'):
+        headers['Content-Disposition'] = f'attachment; filename="{download_name(entry, fmt)}"'
+    return app.response_class(content, content_type=FORMATS[fmt][0], headers=headers)
+
+@app.route('/api/search')
+def search_transcripts():
+    """Full-text search over all transcript segments, best matches first"""
+    query = request.args.get('q', '').strip()
+    
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    hits = search_index.search(query, limit=limit, offset=offset, language=request.args.get('lang'))
+    return jsonify({'query': query, 'hits': hits})
+
+@app.route('/api/duplicates')
+def list_duplicates():
+    """Videos that nearly duplicate an earlier one, and counts of the duplicate index"""
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    return jsonify({
+        'duplicates': dedup_index.duplicates(limit=limit, offset=offset),
+        'stats': dedup_index.stats()
+    })
+
+@app.route('/api/duplicates/<video_id>')
+def get_duplicate_marks(video_id):
+    """Which video one transcript repeats, if any, and its boilerplate time ranges"""
+    entry = transcript_index.get(video_id, request.args.get('lang'))
+    
+    if entry is None:
+        abort(404)
+    
+    return jsonify({
+        'video_id': video_id,
+        'language': entry['language'],
+        'duplicate_of': dedup_index.duplicate_of(video_id, entry['language']),
+        'boilerplate': dedup_index.boilerplate(video_id, entry['language'])
+    })
+
+@app.route('/api/segments/<video_id>')
+def get_segments(video_id):
+    """Get the transcript segments of one video, optionally only a time range in seconds"""
+    entry = transcript_index.get(video_id, request.args.get('lang'))
+    
+    if entry is None:
+        abort(404)
+    
+    start_time = request.args.get('start', 0.0, type=float)
+    end_time = request.args.get('end', type=float)
+    segments = read_segments(os.path.join(TRANSCRIPTS_DIR, entry['json_file']), start_time, end_time)
+    return jsonify({'video_id': video_id, 'language': entry['language'], 'segments': segments})
+
+@app.route('/api/failures')
+def list_failures():
+    """Videos whose transcript fetch failed, optionally one class (permanent, transient, rate_limited)"""
+    failures = failure_store.list(
+        error_class=request.args.get('class'),
+        channel=request.args.get('channel'),
+        limit=max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    )
+    return jsonify({'counts': failure_store.counts(), 'failures': failures})
+
+@app.route('/api/failures/clear', methods=['POST'])
+def clear_failures():
+    """Forget recorded failures so dead-lettered and deferred videos are fetched again"""
+    failure_store.clear(request.args.get('class'))
+    return jsonify({'message': 'Failures cleared'})
+
+@app.route('/api/export', methods=['POST'])
+def export_transcripts():
+    """Queue an export of all or some transcripts to JSONL and columnar shards, rewriting only changed shards
+
+    The export runs as a job; follow it at /api/jobs/<job_id> and read its manifest
+    from /api/export/<name> once it completes.
+    """
+    data = request.get_json(silent=True) or {}
+    name = data.get('name', 'corpus')
+    if not EXPORT_NAME.match(name):
+        return jsonify({'error': 'name may only contain letters, digits, - and _'}), 400
+    formats = data.get('formats') or list(EXPORT_FORMATS)
+    if isinstance(formats, str):
+        formats = formats.split(',')
+    if not set(formats) <= set(EXPORT_FORMATS):
+        return jsonify({'error': f"formats must be among {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        shard_mb = int(data.get('shard_mb') or DEFAULT_SHARD_MB)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'shard_mb must be a whole number of megabytes'}), 400
+    
+    # One job per export name at a time, across every process sharing the job queue
+    job = job_store.create(f"export:{name}", {
+        'export': {
+            'name': name,
+            'formats': formats,
+            'shard_mb': shard_mb,
+            'channel': data.get('channel'),
+            'lang': data.get('lang'),
+            'since': data.get('since'),
+            'gzip': bool(data.get('gzip')),
+            'full': bool(data.get('full')),
+            'dedup': bool(data.get('dedup'))
+        }
+    }, exclusive=True)
+    if job is None:
+        return jsonify({'error': f'An export to {name} is already queued or running'}), 409
+    
+    return jsonify({'message': 'Export queued', 'status': job['status'], 'job_id': job['id']}), 202
+
+@app.route('/api/export/<name>')
+def export_manifest(name):
+    """Manifest of an export: its shards, their files, counts and key ranges"""
+    if not EXPORT_NAME.match(name):
+        abort(404)
+    manifest = load_manifest(os.path.join(EXPORTS_DIR, name))
+    if manifest is None:
+        abort(404)
+    return jsonify(manifest)
+
+@app.route('/api/export/<name>/<filename>')
+def download_export_file(name, filename):
+    """Download one shard file (or the manifest) of an export"""
+    if not EXPORT_NAME.match(name):
+        abort(404)
+    manifest = load_manifest(os.path.join(EXPORTS_DIR, name)) or {'shards': []}
+    files = {file['file'] for shard in manifest['shards'] for file in shard['files'].values()}
+    if filename not in files and filename != MANIFEST:
+        abort(404)
+    return send_file(os.path.abspath(os.path.join(EXPORTS_DIR, name, filename)), as_attachment=True)
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Fetch cache hit/miss/eviction counters for this process and entry counts, plus cached channel listings"""
+    return jsonify({**fetch_cache.stats(), 'channel_listings': channel_cache.stats()})
+
+@app.route('/metrics')
+def metrics():
+    """Scrape pipeline counters and histograms of this process, in the Prometheus text format"""
+    return app.response_class(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/download/<filename>')
 def download_transcript(filename):
-    """Download a specific transcript file"""
+    """Download a transcript as text by its file name, or any other file in the transcripts directory"""
+    entry = find_transcript(filename)
+    if entry is not None and filename != entry['json_file']:
+        content = render_cache.get_or_render(TRANSCRIPTS_DIR, entry, 'txt')
+        return app.response_class(
+            content,
+            content_type=FORMATS['txt'][0],
+            headers={'Content-Disposition': f'attachment; filename="{download_name(entry, "txt")}"'}
+        )
+    
     file_path = os.path.join('transcripts', filename)
     
     if not os.path.exists(file_path):
@@ -138,28 +431,45 @@ def download_transcript(filename):
 
 @app.route('/api/download-all')
 def download_all_transcripts():
-    """Download all transcripts as a ZIP file"""
-    transcripts_dir = 'transcripts'
+    """Stream transcripts as a ZIP file, optionally only one channel or a list of video IDs
     
-    if not os.path.exists(transcripts_dir) or not os.listdir(transcripts_dir):
-        return jsonify({'error': 'No transcripts available'}), 404
+    Each transcript's segment file is included along with a rendering in `format` (txt by default),
+    in each video's default language or only videos saved in ?lang=.
+    """
+    transcripts_dir = TRANSCRIPTS_DIR
+    channel = request.args.get('channel')
+    video_ids = [video_id for video_id in request.args.get('ids', '').split(',') if video_id]
+    compress = request.args.get('compress', '1') != '0'
+    fmt = request.args.get('format', 'txt')
     
-    # Create ZIP file in memory
-    memory_file = io.BytesIO()
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
     
-    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for filename in os.listdir(transcripts_dir):
-            file_path = os.path.join(transcripts_dir, filename)
-            if os.path.isfile(file_path):
-                zf.write(file_path, filename)
+    def entry_files(entry):
+        yield os.path.join(transcripts_dir, entry['json_file']), entry['json_file']
+        try:
+            metadata, segments = load_transcript_file(os.path.join(transcripts_dir, entry['json_file']))
+        except (OSError, ValueError):
+            return
+        yield render_text(metadata, segments, fmt).encode('utf-8'), download_name(entry, fmt)
     
-    memory_file.seek(0)
+    files = (
+        item
+        for entry in transcript_index.iter_entries(channel=channel, video_ids=video_ids or None,
+                                                   language=request.args.get('lang'))
+        for item in entry_files(entry)
+    )
+    
+    first = next(files, None)
+    if first is None:
+        return jsonify({'error': 'No transcripts available'}), 404
     
-    return send_file(
-        memory_file,
+    # Entries are compressed and sent one chunk at a time, so memory stays flat for any archive size
+    archive_name = f'transcripts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+    return app.response_class(
+        stream_with_context(stream_zip(itertools.chain([first], files), compress=compress)),
         mimetype='application/zip',
-        as_attachment=True,
-        download_name=f'transcripts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+        headers={'Content-Disposition': f'attachment; filename={archive_name}'}
     )
 
 @app.route('/api/clear')
@@ -172,6 +482,13 @@ def clear_transcripts():
             file_path = os.path.join(transcripts_dir, filename)
             if os.path.isfile(file_path):
                 os.remove(file_path)
+        
+        # Forget synced channels and indexed transcripts too, otherwise later syncs would skip everything
+        shutil.rmtree(os.path.join(transcripts_dir, MANIFEST_DIRNAME), ignore_errors=True)
+        transcript_index.clear()
+        search_index.clear()
+        dedup_index.clear()
+        failure_store.clear()
     
     return jsonify({'message': 'All transcripts cleared'})
 
@@ -0,0 +1,115 @@
+"""ASGI entry point for production: `uvicorn asgi:application`
+
+Regular routes run the Flask app through asgiref's WSGI adapter, each request on its
+own thread of a pool of SCRAPER_WSGI_THREADS. /api/progress/stream is served natively
+on the event loop, so each idle subscriber costs one suspended coroutine instead of a
+worker thread.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.sync import SyncToAsync
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import app, progress_broker, progress_job, scrape_runner, job_store
+from progress_events import job_event, format_sse, KEEPALIVE, KEEPALIVE_SECONDS
+
+PROGRESS_STREAM_PATH = '/api/progress/stream'
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+# Flask requests served at once; a slow download client holds one of these threads until it is done
+WSGI_THREADS = int(os.environ.get('SCRAPER_WSGI_THREADS', 32))
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi that runs each request on a thread of its own pool
+
+    asgiref runs WSGI apps thread-sensitively by default, which puts every request of
+    the process on one thread: a single slow /api/download-all would hold up /health
+    and the rest of the API behind it.
+    """
+
+    def __init__(self, wsgi_application, threads=WSGI_THREADS):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application, self.executor)(scope, receive, send)
+
+
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        # The undecorated WsgiToAsgiInstance.run_wsgi_app, run on the pool instead of the shared thread
+        run_wsgi_app = vars(WsgiToAsgiInstance)['run_wsgi_app'].func
+        await SyncToAsync(run_wsgi_app, thread_sensitive=False, executor=self.executor)(self, body)
+
+
+flask_application = ThreadedWsgiToAsgi(app)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def progress_stream(scope, receive, send):
+    """Async twin of app.stream_progress"""
+    loop = asyncio.get_running_loop()
+    job_id = parse_qs(scope['query_string'].decode('latin-1')).get('job_id', [None])[0]
+    job = await loop.run_in_executor(None, progress_job, job_id)
+    if job is None:
+        await send({'type': 'http.response.start', 'status': 404, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
+        return
+
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    with progress_broker.subscribe(job['id'], loop=loop) as subscription:
+        try:
+            event = job_event(await loop.run_in_executor(None, job_store.get, job['id']))
+            await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+            await send({'type': 'http.response.body', 'body': format_sse(event), 'more_body': True})
+            while event['active']:
+                pending = asyncio.ensure_future(subscription.get_async(KEEPALIVE_SECONDS))
+                await asyncio.wait({pending, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    pending.cancel()
+                    return
+                events = pending.result()
+                body = b"".join(format_sse(event) for event in events) or KEEPALIVE
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+                if events:
+                    event = events[-1]
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            scrape_runner.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == PROGRESS_STREAM_PATH:
+        await progress_stream(scope, receive, send)
+    else:
+        await flask_application(scope, receive, send)
@@ -0,0 +1,550 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from languages import DEFAULT_LANGUAGE, raw_segments
+from metrics import JobMetrics, ACTIVE_WORKERS, QUEUE_DEPTH
+from rate_limiter import AdaptiveRateLimiter
+from scraper import YouTubeChannelScraper
+
+logger = logging.getLogger(__name__)
+
+# Pool for blocking transcript fetches shared by every scraper in the process, see submit_fetch()
+_fetch_pool = None
+_fetch_pool_threads = 0
+_fetch_pool_lock = threading.Lock()
+
+
+def submit_fetch(loop, threads, func, *args):
+    """Run a blocking fetch on the process-wide fetch pool, growing it to at least `threads` threads
+
+    Every scraper, channel and job shares the pool, so the process never holds more
+    fetch threads than the largest max_in_flight asked for. Growing replaces the pool;
+    fetches already running on the old one finish there and its threads then exit.
+    """
+    global _fetch_pool, _fetch_pool_threads
+    with _fetch_pool_lock:
+        if threads > _fetch_pool_threads:
+            old, _fetch_pool = _fetch_pool, ThreadPoolExecutor(max_workers=threads,
+                                                               thread_name_prefix='transcript-fetch')
+            _fetch_pool_threads = threads
+            if old is not None:
+                old.shutdown(wait=False)
+        # Submitted under the lock so no fetch lands on a pool that is being replaced
+        return loop.run_in_executor(_fetch_pool, func, *args)
+
+
+class PooledTranscriptClient:
+    """youtube-transcript-api client backed by one pooled, keep-alive HTTP session"""
+
+    def __init__(self, pool_size=100):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from youtube_transcript_api import YouTubeTranscriptApi
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._api = YouTubeTranscriptApi(http_client=self.session)
+
+    def get_transcript(self, video_id, languages=('en',)):
+        """Fetch a transcript as the list of segment dicts used everywhere else"""
+        return self._api.fetch(video_id, languages=languages).to_raw_data()
+
+    def list(self, video_id):
+        """Every transcript of a video, to pick languages from with one request"""
+        return self._api.list(video_id)
+
+
+class AsyncYouTubeChannelScraper(YouTubeChannelScraper):
+    """Asyncio engine for YouTubeChannelScraper
+
+    Backends that provide `list_async`/`get_transcript_async` are awaited directly, so
+    thousands of fetches can be in flight on one thread. youtube-transcript-api has no
+    async interface: with it (the default PooledTranscriptClient) every fetch in flight
+    holds a thread of the process-wide fetch pool (see submit_fetch), which has as many
+    threads as the largest `max_in_flight` of any scraper. Other blocking work (yt-dlp,
+    disk writes) runs on the loop's default executor.
+    """
+
+    def __init__(self, channel_url, output_dir="transcripts", transcript_api=None, max_in_flight=100, **kwargs):
+        super().__init__(channel_url, output_dir, transcript_api or PooledTranscriptClient(max_in_flight), **kwargs)
+        self.max_in_flight = max_in_flight
+
+    async def _run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def get_video_ids_async(self, max_videos=None):
+        """Extract video IDs and titles from all of the channel's tabs"""
+        return await self._run_blocking(self.get_video_ids, max_videos)
+
+    async def get_new_video_ids_async(self, max_videos=None, manifest=None):
+        """Page through every tab until its first video already in the channel manifest"""
+        return await self._run_blocking(self.get_new_video_ids, max_videos, manifest)
+
+    async def iter_channel_videos_async(self, max_videos=None, known=None):
+        """Async generator over iter_channel_videos, which runs on an executor thread"""
+        loop = asyncio.get_running_loop()
+        videos = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for video in self.iter_channel_videos(max_videos, known):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(videos.put_nowait, video)
+            finally:
+                loop.call_soon_threadsafe(videos.put_nowait, done)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                video = await videos.get()
+                if video is done:
+                    break
+                yield video
+        finally:
+            stop.set()
+        await producer
+
+    async def download_transcripts_async(self, video_id, rate_limiter=None):
+        """Fetch the wanted languages of a video over the network into the fetch cache, raising on failure
+
+        Like download_transcripts, awaiting the backend's `list_async` and each
+        transcript's `fetch_async` where it has them.
+        """
+        list_async = getattr(self.transcript_api, 'list_async', None)
+        get_transcript_async = getattr(self.transcript_api, 'get_transcript_async', None)
+        if not list_async and (hasattr(self.transcript_api, 'list') or not get_transcript_async):
+            # Blocking backends such as youtube-transcript-api get a thread per fetch in flight
+            return await submit_fetch(asyncio.get_running_loop(), self.max_in_flight, self.download_transcripts,
+                                      video_id, rate_limiter)
+
+        with self.metrics.timed('fetch'):
+            if list_async:
+                fetched = []
+                for language, transcript, info in self.languages.select(await list_async(video_id)):
+                    if rate_limiter:
+                        await rate_limiter.acquire_async()
+                    fetch_async = getattr(transcript, 'fetch_async', None)
+                    segments = await fetch_async() if fetch_async else await self._run_blocking(transcript.fetch)
+                    fetched.append((language, raw_segments(segments), info))
+            else:
+                language = self.languages.languages[0]
+                fetched = [(language, await get_transcript_async(video_id, languages=[language]), None)]
+        for language, transcript, _ in fetched:
+            await self._run_blocking(self.fetch_cache.put, video_id, transcript, language)
+        return fetched
+
+    async def download_transcript_async(self, video_id):
+        """Fetch the most wanted available transcript over the network, raising on failure"""
+        return (await self.download_transcripts_async(video_id))[0][1]
+
+    async def fetch_transcript_async(self, video_id):
+        """Get transcript for a single video from the fetch cache or the network, raising on failure"""
+        cached = await self._run_blocking(self.fetch_cache.get, video_id, self.languages.languages[0])
+        if cached is not None:
+            return cached
+        return await self.download_transcript_async(video_id)
+
+    async def get_transcript_async(self, video_id):
+        """Get transcript for a single video"""
+        try:
+            return await self.fetch_transcript_async(video_id)
+        except Exception as e:
+            logger.warning(f"Error getting transcript for video {video_id}: {str(e)}")
+            return None
+
+    async def save_transcript_async(self, video_id, video_title, original_title, transcript, include_timestamps=False,
+                                    language=DEFAULT_LANGUAGE, info=None):
+        """Save transcript to both JSON and TXT files without blocking the loop"""
+        await self._run_blocking(
+            self.save_transcript, video_id, video_title, original_title, transcript, include_timestamps, language, info
+        )
+
+    async def _fetch_and_save_async(self, video, include_timestamps, rate_limiter, semaphore):
+        ACTIVE_WORKERS.inc()
+        try:
+            return await self._fetch_and_save_video_async(video, include_timestamps, rate_limiter, semaphore)
+        finally:
+            ACTIVE_WORKERS.dec()
+
+    async def _fetch_and_save_video_async(self, video, include_timestamps, rate_limiter, semaphore):
+        fetched, status = await self._fetch_video_async(video, rate_limiter, semaphore)
+        if fetched is None:
+            return status
+        await self._run_blocking(self._save_fetched, video, fetched, include_timestamps)
+        await self._run_blocking(self.failures.resolve, video['id'])
+        logger.info(f"✓ Saved transcript for: {video['original_title']}")
+        return "success"
+
+    async def _fetch_video_async(self, video, rate_limiter, semaphore):
+        """Coroutine version of _fetch_video"""
+        video_id = video['id']
+
+        async def attempt():
+            async with semaphore:
+                await rate_limiter.acquire_async()
+                return await self.download_transcripts_async(video_id, rate_limiter)
+
+        fetched = await self._run_blocking(self._cached_transcripts, video_id)
+        if fetched is None:
+            try:
+                # Backoff sleeps happen outside the semaphore so they do not hold a fetch slot
+                fetched = await self.retry_policy.call_async(
+                    attempt, on_error=lambda error: self._on_fetch_error(error, rate_limiter),
+                    on_retry=self._on_retry
+                )
+            except Exception as e:
+                fetched = await self._run_blocking(self._cached_transcripts, video_id, True)
+                if fetched is None:
+                    return None, await self._run_blocking(self._fetch_failed, video, e)
+                logger.info(f"Using stale cached transcript for {video_id}: {str(e)}")
+            else:
+                rate_limiter.on_success()
+
+        fetched = [item for item in fetched if item[1]]
+        if fetched:
+            return fetched, None
+
+        logger.warning(f"✗ Could not get transcript for: {video['original_title']}")
+        return None, "failed"
+
+    async def iter_transcripts_async(self, max_videos=None, requests_per_second=1.0, rate_limiter=None, save=False,
+                                     include_timestamps=False, skip_saved=False, buffer=None):
+        """Async iterator version of iter_transcripts with max_in_flight concurrent fetches
+
+        At most `buffer` records (default max_in_flight) wait for the consumer; once
+        they do, fetching and listing pause. Close the iterator (e.g. with
+        contextlib.aclosing) when stopping early, so its fetches are cancelled at once.
+        """
+        self.metrics = JobMetrics()
+        if rate_limiter is None:
+            rate_limiter = AdaptiveRateLimiter(rate=requests_per_second)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        pending = asyncio.Queue(maxsize=self.max_in_flight)
+        records = asyncio.Queue(maxsize=buffer or self.max_in_flight)
+        done = object()
+
+        async def produce():
+            async for video in self.iter_channel_videos_async(max_videos):
+                if skip_saved:
+                    status = await self._run_blocking(self.skip_status, video)
+                else:
+                    status = await self._run_blocking(self.failures.skip_reason, video['id'])
+                if status:
+                    self._record_status(status)
+                else:
+                    await pending.put(video)
+
+        async def worker():
+            while True:
+                video = await pending.get()
+                if video is done:
+                    return
+                ACTIVE_WORKERS.inc()
+                try:
+                    fetched, status = await self._fetch_video_async(video, rate_limiter, semaphore)
+                    if fetched is not None and save:
+                        await self._run_blocking(self._save_fetched, video, fetched, include_timestamps)
+                        await self._run_blocking(self.failures.resolve, video['id'])
+                except Exception as e:
+                    logger.error(f"Error processing video {video['id']}: {str(e)}")
+                    fetched, status = None, "failed"
+                finally:
+                    ACTIVE_WORKERS.dec()
+                self._record_status(status or "success")
+                for record in self._records(video, fetched or []):
+                    await records.put(record)
+
+        async def run():
+            workers = [asyncio.ensure_future(worker()) for _ in range(self.max_in_flight)]
+            try:
+                try:
+                    await produce()
+                except Exception as e:
+                    logger.error(f"Error getting video information: {str(e)}")
+                for _ in workers:
+                    await pending.put(done)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+            await records.put(done)
+
+        if save:
+            self.open_writer()
+        runner = asyncio.ensure_future(run())
+        try:
+            while True:
+                record = await records.get()
+                if record is done:
+                    break
+                yield record
+            await runner
+        finally:
+            runner.cancel()
+            if save:
+                await self._run_blocking(self.close_writer)
+
+    async def scrape_all_transcripts_async(self, max_videos=None, include_timestamps=False, progress_callback=None,
+                                           requests_per_second=1.0, rate_limiter=None, incremental=False):
+        """Scrape transcripts from all videos in the channel on the running event loop
+
+        Fetching starts as soon as the first listing page arrives; `total` in progress
+        callbacks grows while the channel's tabs are still being enumerated. The
+        'enumerate' stage of the result's metrics covers the whole listing, overlapping
+        the fetches it feeds.
+        """
+        self.metrics = JobMetrics()
+        manifest = self.get_manifest() if incremental else None
+        if rate_limiter is None:
+            rate_limiter = AdaptiveRateLimiter(rate=requests_per_second)
+
+        successful_downloads = 0
+        processed = 0
+        total = 0
+        queued = 0
+        videos = []
+        statuses = {}
+
+        def record(video, status):
+            nonlocal processed, successful_downloads
+            processed += 1
+            statuses[video['id']] = status
+            self._record_status(status)
+            if status in ("success", "skipped"):
+                successful_downloads += 1
+            if progress_callback:
+                progress_callback(processed, total, video['title'], status)
+
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        pending = asyncio.Queue()
+
+        async def worker():
+            nonlocal queued
+            while True:
+                video = await pending.get()
+                if video is None:
+                    return
+                queued -= 1
+                QUEUE_DEPTH.dec()
+                try:
+                    status = await self._fetch_and_save_async(video, include_timestamps, rate_limiter, semaphore)
+                except Exception as e:
+                    logger.error(f"Error processing video {video['id']}: {str(e)}")
+                    status = "failed"
+                record(video, status)
+
+        async def enqueue(video):
+            nonlocal total, queued
+            videos.append(video)
+            total += 1
+            status = await self._run_blocking(self.skip_status, video)
+            if status:
+                logger.info(f"Not fetching ({status}): {video['original_title']}")
+                record(video, status)
+            else:
+                queued += 1
+                QUEUE_DEPTH.inc()
+                pending.put_nowait(video)
+
+        self.open_writer()
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.max_in_flight)]
+        try:
+            try:
+                with self.metrics.timed('enumerate'):
+                    async for video in self.iter_channel_videos_async(max_videos, known=manifest):
+                        await enqueue(video)
+            except Exception as e:
+                logger.error(f"Error getting video information: {str(e)}")
+            if manifest is not None:
+                logger.info(f"Found {len(videos)} new videos ({len(manifest)} already synced)")
+                for video in self._with_failed(videos, manifest)[len(videos):]:
+                    await enqueue(video)
+            for _ in workers:
+                pending.put_nowait(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            # Videos left behind by a cancelled job no longer count as queued
+            QUEUE_DEPTH.dec(queued)
+            unsaved = await self._run_blocking(self.close_writer)
+
+        # Videos counted as downloaded whose file the background writer failed to save
+        for video_id in unsaved:
+            statuses[video_id] = "failed"
+        successful_downloads -= len(unsaved)
+
+        if not videos:
+            if incremental:
+                logger.info("No new videos since the last sync")
+                return {"success": True, "message": "No new videos since the last sync", "processed": 0,
+                        "successful": 0, "total_found": 0}
+            logger.error("No videos found or unable to extract video information")
+            return {"success": False, "message": "No videos found", "processed": 0, "successful": 0}
+
+        if manifest is not None:
+            await self._run_blocking(manifest.record, videos, statuses)
+
+        result = {
+            "success": True,
+            "message": f"Completed! Successfully downloaded {successful_downloads} out of {processed} transcripts.",
+            "processed": processed,
+            "successful": successful_downloads,
+            "total_found": len(videos),
+            "metrics": self.metrics.summary()
+        }
+
+        logger.info(result["message"])
+        return result
+
+    async def scrape_distributed_async(self, work_queue, job_id, max_videos=None, include_timestamps=False,
+                                       progress_callback=None, requests_per_second=1.0, incremental=False,
+                                       poll_interval=1.0):
+        """Scrape the channel by queueing its videos for VideoWorkers on every replica
+
+        This coordinator lists the channel, settles the videos that need no fetch and
+        enqueues the rest in `work_queue` under `job_id`, then reports progress as
+        workers finish them. Re-running it for the same job (e.g. after its lease moved
+        to another replica) picks up the items already queued. Cancelling it cancels the
+        job's unfinished items. Returns the same result as scrape_all_transcripts_async.
+        """
+        self.metrics = JobMetrics()
+        manifest = self.get_manifest() if incremental else None
+        params = {
+            'include_timestamps': include_timestamps,
+            'requests_per_second': requests_per_second,
+            'max_in_flight': self.max_in_flight,
+            **self.languages.to_params(),
+        }
+        statuses = {}
+        processed = 0
+
+        def record(video, status):
+            nonlocal processed
+            processed += 1
+            statuses[video['id']] = status
+            if progress_callback:
+                progress_callback(processed, len(videos), video['title'], status)
+
+        videos = []
+        pending = []
+        try:
+            with self.metrics.timed('enumerate'):
+                async for video in self.iter_channel_videos_async(max_videos, known=manifest):
+                    videos.append(video)
+        except Exception as e:
+            logger.error(f"Error getting video information: {str(e)}")
+        if manifest is not None:
+            logger.info(f"Found {len(videos)} new videos ({len(manifest)} already synced)")
+            videos = self._with_failed(videos, manifest)
+
+        for video in videos:
+            status = await self._run_blocking(self.skip_status, video)
+            if status:
+                self._record_status(status)
+                record(video, status)
+            else:
+                pending.append(video)
+
+        try:
+            await self._run_blocking(work_queue.enqueue, job_id, self.channel_url, params, pending)
+            by_id = {video['id']: video for video in pending}
+            since = 0
+            while True:
+                # Read the count first so items finishing in between are picked up by this pass; replica
+                # clocks may disagree, so the last pass rereads every finished item
+                unfinished = await self._run_blocking(work_queue.unfinished, job_id)
+                finished = await self._run_blocking(work_queue.finished_since, job_id, since if unfinished else 0)
+                for video_id, status, finished_at in finished:
+                    since = max(since, finished_at)
+                    if video_id in by_id and video_id not in statuses:
+                        record(by_id[video_id], status)
+                if not unfinished:
+                    break
+                await asyncio.sleep(poll_interval)
+        except asyncio.CancelledError:
+            await self._run_blocking(work_queue.cancel, job_id)
+            raise
+
+        if not videos:
+            if incremental:
+                logger.info("No new videos since the last sync")
+                return {"success": True, "message": "No new videos since the last sync", "processed": 0,
+                        "successful": 0, "total_found": 0}
+            logger.error("No videos found or unable to extract video information")
+            return {"success": False, "message": "No videos found", "processed": 0, "successful": 0}
+
+        if manifest is not None:
+            await self._run_blocking(manifest.record, videos, statuses)
+
+        successful_downloads = sum(status in ("success", "skipped") for status in statuses.values())
+        # Workers count fetches in their own processes; the job summary counts every outcome here
+        summary = self.metrics.summary()
+        summary['videos'] = {}
+        for status in statuses.values():
+            summary['videos'][status] = summary['videos'].get(status, 0) + 1
+        result = {
+            "success": True,
+            "message": f"Completed! Successfully downloaded {successful_downloads} out of {processed} transcripts.",
+            "processed": processed,
+            "successful": successful_downloads,
+            "total_found": len(videos),
+            "metrics": summary
+        }
+
+        logger.info(result["message"])
+        return result
+
+
+async def scrape_channels_async(channel_urls, output_dir="transcripts", transcript_api=None, max_in_flight=100,
+                                requests_per_second=1.0, **kwargs):
+    """Scrape several channels concurrently on one loop, sharing a single rate limiter"""
+    rate_limiter = AdaptiveRateLimiter(rate=requests_per_second)
+    scrapers = [
+        AsyncYouTubeChannelScraper(url, output_dir, transcript_api, max_in_flight)
+        for url in channel_urls
+    ]
+    results = await asyncio.gather(
+        *(scraper.scrape_all_transcripts_async(rate_limiter=rate_limiter, **kwargs) for scraper in scrapers)
+    )
+    return dict(zip(channel_urls, results))
+
+
+class AsyncScrapeRunner:
+    """Owns one background event loop that all scrape jobs of a web process share"""
+
+    def __init__(self, blocking_workers=32):
+        self.blocking_workers = blocking_workers
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the loop thread if it is not running yet"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.loop.set_default_executor(ThreadPoolExecutor(max_workers=self.blocking_workers))
+            self._thread = threading.Thread(target=self.loop.run_forever, name="scrape-loop", daemon=True)
+            self._thread.start()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the shared loop and return a concurrent.futures.Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        """Stop the loop thread"""
+        with self._lock:
+            if self.loop and self._thread:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join()
+                self._thread = None
@@ -0,0 +1,322 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+
+from async_scraper import AsyncYouTubeChannelScraper
+from languages import PREFERENCES, LanguagePreference
+from metrics import QUEUE_DEPTH
+from rate_limiter import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Channels whose uploads are being listed at once; each listing holds a blocking worker
+MAX_ENUMERATIONS = 4
+
+
+def parse_channel(spec):
+    """Normalise a channel given as a URL, "URL priority" or {'url', 'priority'} dict"""
+    if isinstance(spec, dict):
+        url, priority = spec['url'], spec.get('priority', 1)
+    else:
+        parts = spec.split()
+        url, priority = parts[0], parts[1] if len(parts) > 1 else 1
+    priority = float(priority)
+    if priority <= 0:
+        raise ValueError(f"Priority of {url} must be positive")
+    return {'url': url.strip(), 'priority': priority}
+
+
+def read_channels_file(path):
+    """Channels from a file with one "URL [priority]" per line; blank lines and # comments are ignored"""
+    channels = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                channels.append(parse_channel(line))
+    return channels
+
+
+class FairScheduler:
+    """Weighted fair queue of videos across channels
+
+    Every video handed out advances its channel's virtual clock by 1/priority and the
+    channel with the earliest clock goes next. While they all have work, a channel
+    with priority 2 gets twice the fetch slots of one with priority 1 however many
+    videos each has queued, and a channel that joins late starts at the current clock
+    instead of catching up on turns it was not there for.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._priorities = {}
+        self._heap = []
+        self._clock = 0.0
+        self._seq = 0
+
+    def add(self, channel, videos, priority=1.0):
+        videos = list(videos)
+        if not videos:
+            return
+        queue = self._queues.get(channel)
+        self._priorities[channel] = priority
+        if queue:
+            queue.extend(videos)
+            return
+        self._queues[channel] = deque(videos)
+        self._push(channel, self._clock)
+
+    def _push(self, channel, finish):
+        self._seq += 1
+        heapq.heappush(self._heap, (finish, self._seq, channel))
+
+    def next(self):
+        """(channel, video) to fetch next, or None when every queue is empty"""
+        if not self._heap:
+            return None
+        start, _, channel = heapq.heappop(self._heap)
+        self._clock = start
+        queue = self._queues[channel]
+        video = queue.popleft()
+        if queue:
+            self._push(channel, start + 1.0 / self._priorities[channel])
+        else:
+            del self._queues[channel]
+        return channel, video
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+
+def _throughput(stats):
+    started, finished = stats.pop('started'), stats.pop('finished')
+    stats['elapsed'] = round(finished - started, 3) if started else 0.0
+    stats['videos_per_second'] = round(stats['processed'] / stats['elapsed'], 2) if stats['elapsed'] else 0.0
+    return stats
+
+
+async def scrape_batch_async(channels, output_dir="transcripts", transcript_api=None, max_in_flight=100,
+                             requests_per_second=1.0, rate_limiter=None, max_videos=None,
+                             include_timestamps=False, incremental=False, progress_callback=None,
+                             max_enumerations=MAX_ENUMERATIONS, languages=None):
+    """Scrape many channels through one shared, fair fetch scheduler
+
+    `channels` are URLs, "URL priority" strings or {'url', 'priority'} dicts. Uploads are
+    listed a few channels at a time and each channel's videos join the scheduler as
+    their listing pages arrive, so fetching starts before any channel has been fully listed.
+    `max_videos` applies per channel. Returns aggregate and per-channel counts and
+    throughput, and 'metrics' summarising stage timings across all channels;
+    progress_callback gets aggregate (processed, total, title, status). `languages` is a
+    LanguagePreference applied to every channel.
+    """
+    channels = list({channel['url']: channel for channel in map(parse_channel, channels)}.values())
+    if not channels:
+        return {"success": False, "message": "No channels given", "processed": 0, "successful": 0,
+                "channels": {}}
+
+    base = AsyncYouTubeChannelScraper(channels[0]['url'], output_dir, transcript_api, max_in_flight,
+                                      languages=languages)
+    writer = base.open_writer()
+    scrapers = {channel['url']: base.for_channel(channel['url']) for channel in channels}
+    if rate_limiter is None:
+        rate_limiter = AdaptiveRateLimiter(rate=requests_per_second)
+
+    scheduler = FairScheduler()
+    work = asyncio.Condition()
+    stats = {
+        channel['url']: {'priority': channel['priority'], 'found': 0, 'processed': 0, 'successful': 0,
+                         'failed': 0, 'skipped': 0, 'started': None, 'finished': None}
+        for channel in channels
+    }
+    videos_by_channel = {}
+    statuses = {url: {} for url in scrapers}
+    remaining = {}
+    listed = set()
+    enumerating = len(channels)
+    processed = 0
+    total = 0
+    batch_started = time.monotonic()
+
+    def unsaved_as_failed(url):
+        # Videos counted as downloaded whose file the background writer failed to save
+        for video_id in list(writer.failed):
+            if statuses[url].get(video_id) == "success":
+                statuses[url][video_id] = "failed"
+                stats[url]['successful'] -= 1
+                stats[url]['failed'] += 1
+
+    async def record(url, video, status):
+        nonlocal processed
+        processed += 1
+        channel_stats = stats[url]
+        channel_stats['processed'] += 1
+        if status in ("success", "skipped"):
+            channel_stats['successful'] += 1
+        else:
+            channel_stats['failed'] += 1
+        if status == "skipped":
+            channel_stats['skipped'] += 1
+        channel_stats['finished'] = time.monotonic()
+        statuses[url][video['id']] = status
+        base._record_status(status)
+        if progress_callback:
+            progress_callback(processed, total, video['title'], status)
+        remaining[url] -= 1
+        await finish_channel(url)
+
+    async def finish_channel(url):
+        """Record an incremental sync once a channel is listed and each of its videos has an outcome"""
+        if not incremental or url not in listed or remaining[url] or not videos_by_channel[url]:
+            return
+        await base._run_blocking(writer.flush)
+        unsaved_as_failed(url)
+        await scrapers[url]._run_blocking(scrapers[url].get_manifest().record, videos_by_channel[url],
+                                          statuses[url])
+
+    enumeration_slots = asyncio.Semaphore(max_enumerations)
+
+    async def enumerate_channel(channel):
+        nonlocal enumerating
+        url = channel['url']
+        scraper = scrapers[url]
+        videos = videos_by_channel[url] = []
+        remaining[url] = 0
+
+        async def admit(video):
+            nonlocal total
+            videos.append(video)
+            stats[url]['found'] += 1
+            remaining[url] += 1
+            total += 1
+            status = await scraper._run_blocking(scraper.skip_status, video)
+            if status:
+                stats[url]['started'] = stats[url]['started'] or time.monotonic()
+                await record(url, video, status)
+                return
+            QUEUE_DEPTH.inc()
+            async with work:
+                scheduler.add(url, [video], channel['priority'])
+                work.notify()
+
+        try:
+            async with enumeration_slots:
+                manifest = await scraper._run_blocking(scraper.get_manifest) if incremental else None
+                # Videos join the scheduler page by page, so a large channel gets fetch slots while it is listed
+                async for video in scraper.iter_channel_videos_async(max_videos, known=manifest):
+                    await admit(video)
+            if manifest is not None:
+                for video in scraper._with_failed(list(videos), manifest)[len(videos):]:
+                    await admit(video)
+        except Exception as e:
+            logger.error(f"Error listing videos of {url}: {str(e)}")
+        finally:
+            listed.add(url)
+            enumerating -= 1
+            async with work:
+                work.notify_all()
+        await finish_channel(url)
+
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def worker():
+        while True:
+            async with work:
+                item = scheduler.next()
+                while item is None and enumerating:
+                    await work.wait()
+                    item = scheduler.next()
+            if item is None:
+                return
+            url, video = item
+            QUEUE_DEPTH.dec()
+            stats[url]['started'] = stats[url]['started'] or time.monotonic()
+            try:
+                status = await scrapers[url]._fetch_and_save_async(video, include_timestamps, rate_limiter, semaphore)
+            except Exception as e:
+                logger.error(f"Error processing video {video['id']}: {str(e)}")
+                status = "failed"
+            await record(url, video, status)
+
+    try:
+        await asyncio.gather(
+            *(enumerate_channel(channel) for channel in channels),
+            *(worker() for _ in range(max_in_flight))
+        )
+    finally:
+        QUEUE_DEPTH.dec(len(scheduler))
+        await base._run_blocking(base.close_writer)
+    for url in stats:
+        unsaved_as_failed(url)
+
+    elapsed = time.monotonic() - batch_started
+    successful = sum(channel_stats['successful'] for channel_stats in stats.values())
+    result = {
+        "success": True,
+        "message": f"Completed! Successfully downloaded {successful} out of {processed} transcripts "
+                   f"from {len(channels)} channels.",
+        "processed": processed,
+        "successful": successful,
+        "total_found": total,
+        "elapsed": round(elapsed, 3),
+        "videos_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        "channels": {url: _throughput(channel_stats) for url, channel_stats in stats.items()},
+        "metrics": base.metrics.summary()
+    }
+    logger.info(result["message"])
+    return result
+
+
+def format_report(result):
+    """Plain-text per-channel throughput table for the end of a batch"""
+    lines = [f"{'channel':<60} {'prio':>5} {'found':>7} {'ok':>7} {'failed':>7} {'skipped':>7} {'v/s':>8}"]
+    for url, stats in result['channels'].items():
+        lines.append(
+            f"{url[:60]:<60} {stats['priority']:>5g} {stats['found']:>7} {stats['successful']:>7} "
+            f"{stats['failed']:>7} {stats['skipped']:>7} {stats['videos_per_second']:>8.2f}"
+        )
+    lines.append(
+        f"{'total':<60} {'':>5} {result.get('total_found', 0):>7} {result['successful']:>7} "
+        f"{'':>7} {'':>7} {result.get('videos_per_second', 0.0):>8.2f}"
+    )
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Scrape transcripts from many channels in one batch")
+    parser.add_argument('channels', nargs='*', help='channel URLs (priority 1)')
+    parser.add_argument('--file', '-f', help='channels file, one "URL [priority]" per line')
+    parser.add_argument('--output-dir', default='transcripts')
+    parser.add_argument('--max-videos', type=int, help='per channel')
+    parser.add_argument('--max-in-flight', type=int, default=10)
+    parser.add_argument('--requests-per-second', type=float, default=1.0)
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--timestamps', action='store_true')
+    parser.add_argument('--languages', default='en', help='comma-separated language codes, most wanted first')
+    parser.add_argument('--prefer', choices=PREFERENCES, default='manual',
+                        help='manually created or auto-generated transcripts')
+    parser.add_argument('--translate', action='store_true', help='translate when a language has no transcript')
+    parser.add_argument('--all-languages', action='store_true', help='fetch every listed language, not the first')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    args = parser.parse_args()
+
+    channels = read_channels_file(args.file) if args.file else []
+    channels += [parse_channel(channel) for channel in args.channels]
+    if not channels:
+        parser.error("give channel URLs or --file")
+
+    result = asyncio.run(scrape_batch_async(
+        channels, args.output_dir,
+        max_in_flight=args.max_in_flight,
+        requests_per_second=args.requests_per_second,
+        max_videos=args.max_videos,
+        include_timestamps=args.timestamps,
+        incremental=args.incremental,
+        languages=LanguagePreference(args.languages, args.prefer, args.translate, args.all_languages)
+    ))
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
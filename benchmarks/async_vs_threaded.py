@@ -0,0 +1,72 @@
+"""Compare throughput of the asyncio engine with the threaded worker pool
+
+Both engines run against FakeTranscriptBackend with a lognormal latency
+distribution, so no network access is needed. The fake backend has native
+`list_async`/`fetch_async`; youtube-transcript-api does not, so against YouTube the
+async engine holds a thread per fetch in flight and these figures do not carry over:
+
+    python benchmarks/async_vs_threaded.py --videos 2000 --workers 32 --in-flight 1000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_scraper import AsyncYouTubeChannelScraper
+from fake_youtube import FakeChannel, FakeTranscriptBackend, lognormal_latency
+from rate_limiter import AdaptiveRateLimiter
+from scraper import YouTubeChannelScraper
+
+CHANNEL_URL = "https://www.youtube.com/@benchmark"
+
+
+def unlimited():
+    # The benchmark measures the engines, not the rate limiter
+    return AdaptiveRateLimiter(rate=1e9, max_rate=1e9)
+
+
+def run_threaded(args, backend, output_dir):
+    scraper = YouTubeChannelScraper(CHANNEL_URL, output_dir, transcript_api=backend)
+    scraper.iter_tab_entries = FakeChannel(args.videos).iter_tab_entries
+    start = time.perf_counter()
+    result = scraper.scrape_all_transcripts(max_workers=args.workers, rate_limiter=unlimited())
+    return result, time.perf_counter() - start
+
+
+def run_async(args, backend, output_dir):
+    scraper = AsyncYouTubeChannelScraper(CHANNEL_URL, output_dir, transcript_api=backend, max_in_flight=args.in_flight)
+    scraper.iter_tab_entries = FakeChannel(args.videos).iter_tab_entries
+    start = time.perf_counter()
+    result = asyncio.run(scraper.scrape_all_transcripts_async(rate_limiter=unlimited()))
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--videos', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=32, help="threads for the threaded engine")
+    parser.add_argument('--in-flight', type=int, default=1000, help="concurrent fetches for the async engine")
+    parser.add_argument('--median-latency', type=float, default=0.2)
+    parser.add_argument('--sigma', type=float, default=0.6)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print("fake backend only: async numbers assume an async-native transcript client")
+
+    for name, runner in (("threaded", run_threaded), ("async", run_async)):
+        backend = FakeTranscriptBackend(latency_sampler=lognormal_latency(args.median_latency, args.sigma))
+        with tempfile.TemporaryDirectory() as output_dir:
+            result, elapsed = runner(args, backend, output_dir)
+        if result['processed'] != args.videos:
+            sys.exit(f"{name}: processed {result['processed']} of {args.videos} videos")
+        print(f"{name:>9}: {args.videos / elapsed:8.1f} videos/s  "
+              f"({elapsed:.2f}s, peak in-flight {backend.max_in_flight})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Cost of checking one new transcript for near-duplicates and boilerplate as the index grows
+
+Builds a DedupIndex of random transcripts at each size, a share of them carrying
+one of a few sponsor reads and a share re-uploads of an earlier video with a few
+words changed, then times adding new videos one at a time:
+
+    python benchmarks/dedup_latency.py --sizes 1000 10000 --words 1500
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DedupIndex, dedup_path
+
+WORDS_PER_SEGMENT = 8
+
+
+class Corpus:
+    def __init__(self, words, sponsor_share, duplicate_share, seed=0):
+        self.rng = random.Random(seed)
+        self.vocabulary = [f"w{n}" for n in range(20000)]
+        # Zipf-like word frequencies, as in speech
+        self.cum_weights = list(itertools.accumulate(1 / (n + 1) for n in range(len(self.vocabulary))))
+        self.words = words
+        self.sponsor_share = sponsor_share
+        self.duplicate_share = duplicate_share
+        self.sponsors = [self.text(120) for _ in range(5)]
+        self.originals = []
+
+    def text(self, count):
+        return self.rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count)
+
+    def video(self):
+        """(words, kind) where kind is 'duplicate', 'sponsor' or None"""
+        if self.originals and self.rng.random() < self.duplicate_share:
+            words = list(self.rng.choice(self.originals))
+            for _ in range(len(words) // 100):
+                words[self.rng.randrange(len(words))] = self.rng.choice(self.vocabulary)
+            return words, 'duplicate'
+        words, kind = self.text(self.words), None
+        if self.rng.random() < self.sponsor_share:
+            at = self.rng.randrange(len(words))
+            words, kind = words[:at] + self.rng.choice(self.sponsors) + words[at:], 'sponsor'
+        self.originals.append(words)
+        if len(self.originals) > 1000:
+            self.originals.pop(self.rng.randrange(len(self.originals)))
+        return words, kind
+
+
+def segments(words):
+    return [
+        {'text': " ".join(words[i:i + WORDS_PER_SEGMENT]), 'start': i * 0.4, 'duration': WORDS_PER_SEGMENT * 0.4}
+        for i in range(0, len(words), WORDS_PER_SEGMENT)
+    ]
+
+
+def run(args, size):
+    corpus = Corpus(args.words, args.sponsor_share, args.duplicate_share)
+    with tempfile.TemporaryDirectory() as output_dir:
+        index = DedupIndex(dedup_path(output_dir))
+        start = time.perf_counter()
+        batch = []
+        for n in range(size):
+            batch.append((f"video{n}", segments(corpus.video()[0]), 'en'))
+            if len(batch) == 64:
+                index.add_transcripts(batch)
+                batch = []
+        if batch:
+            index.add_transcripts(batch)
+        built = time.perf_counter() - start
+
+        timings = []
+        found = {'duplicate': 0, 'sponsor': 0}
+        planted = {'duplicate': 0, 'sponsor': 0}
+        for n in range(args.probes):
+            words, kind = corpus.video()
+            start = time.perf_counter()
+            duplicate_of = index.add_transcript(f"probe{n}", segments(words))
+            timings.append(time.perf_counter() - start)
+            if kind:
+                planted[kind] += 1
+                if kind == 'duplicate':
+                    found[kind] += duplicate_of is not None
+                else:
+                    found[kind] += bool(index.boilerplate(f"probe{n}"))
+        stats = index.stats()
+    return built, timings, found, planted, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help="transcripts indexed first")
+    parser.add_argument('--words', type=int, default=1500, help="words per transcript")
+    parser.add_argument('--probes', type=int, default=50, help="videos added and timed one at a time")
+    parser.add_argument('--sponsor-share', type=float, default=0.3)
+    parser.add_argument('--duplicate-share', type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{args.words} words per transcript")
+    for size in args.sizes:
+        built, timings, found, planted, stats = run(args, size)
+        timings.sort()
+        print(f"  {size:>7} indexed ({built:.1f}s, {stats['windows']} windows): "
+              f"add median {statistics.median(timings) * 1000:.1f} ms, "
+              f"p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms; "
+              f"found {found['duplicate']}/{planted['duplicate']} duplicates, "
+              f"{found['sponsor']}/{planted['sponsor']} sponsor reads")
+
+
+if __name__ == '__main__':
+    main()
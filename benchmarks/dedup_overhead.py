@@ -0,0 +1,56 @@
+"""Scrape throughput with and without the background duplicate check
+
+Runs benchmarks/scrape_throughput.py with SCRAPER_DEDUP=0 and with the default,
+each `--repeat` times in a fresh interpreter, and compares the median videos/s.
+Extra arguments are passed on to scrape_throughput.py. The exit status is 1 if
+the duplicate check slows the scrape by more than --tolerance:
+
+    python benchmarks/dedup_overhead.py --repeat 3 -- --videos 500 --workers 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SCRAPE_THROUGHPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrape_throughput.py')
+
+
+def run(dedup, argv, repeat):
+    """Median report of `repeat` scrapes with SCRAPER_DEDUP set to `dedup`"""
+    reports = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            subprocess.run(
+                [sys.executable, SCRAPE_THROUGHPUT, *argv, '--json', path],
+                check=True, stdout=subprocess.DEVNULL, env={**os.environ, 'SCRAPER_DEDUP': dedup}
+            )
+            with open(path, 'r', encoding='utf-8') as f:
+                reports.append(json.load(f)['results'])
+    reports.sort(key=lambda results: results['videos_per_second'])
+    return reports[len(reports) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help="runs of each setting to take the median of")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed relative slowdown")
+    parser.add_argument('scrape_args', nargs='*', help="arguments for scrape_throughput.py (after --)")
+    args = parser.parse_args()
+
+    off = run('0', args.scrape_args, args.repeat)
+    on = run('1', args.scrape_args, args.repeat)
+    change = (on['videos_per_second'] - off['videos_per_second']) / off['videos_per_second']
+    print(f"  without duplicate check: {off['videos_per_second']:8.1f} videos/s, "
+          f"{off['stages']['write']['mean_seconds'] * 1000:.1f} ms per write batch")
+    print(f"  with duplicate check:    {on['videos_per_second']:8.1f} videos/s, "
+          f"{on['stages']['write']['mean_seconds'] * 1000:.1f} ms per write batch ({change:+.1%}), "
+          f"caught up {on['dedup_drain_seconds']:.2f}s after the scrape")
+    if -change > args.tolerance:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
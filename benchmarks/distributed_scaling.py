@@ -0,0 +1,94 @@
+"""Throughput of distributed scraping as replicas are added, against the local fake backend
+
+Each replica is a separate process running a VideoWorker on the same output
+directory and work queue, as containers sharing the data volumes would. The main
+process coordinates one job and reports videos/s for every replica count:
+
+    python benchmarks/distributed_scaling.py --videos 2000 --replicas 1 2 4 --slots 16
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_scraper import AsyncYouTubeChannelScraper
+from fake_youtube import FakeChannel, FakeTranscriptBackend, lognormal_latency
+from work_queue import VideoWorker, WorkQueue, work_queue_path
+
+CHANNEL_URL = "https://www.youtube.com/@benchmark"
+
+
+def replica(output_dir, data_dir, args, ready):
+    logging.disable(logging.WARNING)
+    backend = FakeTranscriptBackend(
+        latency_sampler=lognormal_latency(args.median_latency, args.sigma), segments=args.segments,
+        seed=os.getpid()
+    )
+
+    def scraper_factory(item):
+        return AsyncYouTubeChannelScraper(item['channel_url'], output_dir, backend, args.slots)
+
+    worker = VideoWorker(WorkQueue(work_queue_path(data_dir)), output_dir, slots=args.slots,
+                         poll_interval=0.05, scraper_factory=scraper_factory)
+    ready.set()
+    asyncio.run(worker.run(idle_exit=args.idle_exit))
+
+
+def run(args, replicas):
+    with tempfile.TemporaryDirectory() as output_dir, tempfile.TemporaryDirectory() as data_dir:
+        queue = WorkQueue(work_queue_path(data_dir))
+        context = multiprocessing.get_context('spawn')
+        processes = []
+        for _ in range(replicas):
+            ready = context.Event()
+            process = context.Process(target=replica, args=(output_dir, data_dir, args, ready))
+            process.start()
+            processes.append((process, ready))
+        for _, ready in processes:
+            ready.wait()
+
+        coordinator = AsyncYouTubeChannelScraper(CHANNEL_URL, output_dir, FakeTranscriptBackend(), args.slots)
+        coordinator.iter_tab_entries = FakeChannel(args.videos).iter_tab_entries
+        start = time.perf_counter()
+        result = asyncio.run(coordinator.scrape_distributed_async(
+            queue, 'benchmark', requests_per_second=args.requests_per_second, poll_interval=0.05
+        ))
+        elapsed = time.perf_counter() - start
+        for process, _ in processes:
+            process.join()
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--videos', type=int, default=1000)
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--slots', type=int, default=16, help="videos each replica fetches at once")
+    parser.add_argument('--median-latency', type=float, default=0.05, help="seconds per transcript request")
+    parser.add_argument('--sigma', type=float, default=0.5, help="spread of the lognormal latency")
+    parser.add_argument('--segments', type=int, default=200, help="segments per transcript")
+    parser.add_argument('--requests-per-second', type=float, default=1e9,
+                        help="rate limit of each replica; the default leaves it out of the measurement")
+    parser.add_argument('--idle-exit', type=float, default=2.0,
+                        help="seconds a replica waits with nothing to claim before it exits")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print(f"{args.videos} videos, {args.slots} slots per replica")
+    base = None
+    for replicas in args.replicas:
+        result, elapsed = run(args, replicas)
+        rate = result['processed'] / elapsed
+        base = base or rate / replicas
+        print(f"  {replicas:>3} replicas: {rate:8.1f} videos/s ({elapsed:.2f}s, "
+              f"{rate / (base * replicas):.0%} of linear, {result['successful']} saved)")
+
+
+if __name__ == '__main__':
+    main()
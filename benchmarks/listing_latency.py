@@ -0,0 +1,100 @@
+"""Measure /api/transcripts listing latency against large synthetic transcript indexes
+
+Populates a throwaway index with N rows (no transcript files are written) and
+times first pages, deep cursor pages and filtered pages, both cold and from the
+in-memory listing cache:
+
+    python benchmarks/listing_latency.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_index import TranscriptIndex, encode_cursor, index_path
+
+PAGE_SIZE = 100
+CHANNELS = [f"https://www.youtube.com/@channel{n}" for n in range(50)]
+
+
+def populate(index, size, batch=50000):
+    start = datetime(2024, 1, 1)
+    conn = index._connect()
+    for offset in range(0, size, batch):
+        rows = [
+            {
+                'video_id': f"vid{n:09d}",
+                'title': f"Video number {n}",
+                'clean_title': f"Video number {n}",
+                'channel_url': CHANNELS[n % len(CHANNELS)],
+                'language': 'en',
+                'segments': 100 + n % 400,
+                'json_file': f"vid{n:09d}_transcript.json",
+                'json_size': 20000 + n % 9000,
+                'txt_file': f"Video number {n}.txt",
+                'txt_size': 5000 + (n * 7919) % 30000,
+                'scraped_at': (start + timedelta(seconds=n * 37)).isoformat(),
+            }
+            for n in range(offset, min(size, offset + batch))
+        ]
+        with conn:
+            conn.executemany(
+                "INSERT INTO transcripts VALUES (:video_id, :title, :clean_title, :channel_url, :language, "
+                ":segments, :json_file, :json_size, :txt_file, :txt_size, :scraped_at)",
+                rows
+            )
+    with conn:
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+
+def timed(func, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def deep_cursor(index, sort, pages=50):
+    cursor = None
+    for _ in range(pages):
+        page = index.list(sort=sort, limit=PAGE_SIZE, cursor=cursor)
+        cursor = encode_cursor(page[-1], sort)
+    return cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'query':<28} {'median ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as output_dir:
+            index = TranscriptIndex(index_path(output_dir))
+            populate(index, size)
+            modified_cursor = deep_cursor(index, 'modified')
+            size_cursor = deep_cursor(index, 'size')
+
+            queries = {
+                'first page, by modified': lambda: index.list(limit=PAGE_SIZE),
+                'first page, by size': lambda: index.list(sort='size', limit=PAGE_SIZE),
+                'page 51, by modified': lambda: index.list(limit=PAGE_SIZE, cursor=modified_cursor),
+                'page 51, by size': lambda: index.list(sort='size', limit=PAGE_SIZE, cursor=size_cursor),
+                'channel filter': lambda: index.list(limit=PAGE_SIZE, channel=CHANNELS[7]),
+                'date range': lambda: index.list(limit=PAGE_SIZE, since='2024-01-02', until='2024-01-03'),
+                'title prefix': lambda: index.list(sort='title', limit=PAGE_SIZE, title_prefix='Video number 12'),
+                'cached first page': lambda: index.cached_list(limit=PAGE_SIZE),
+            }
+            for name, query in queries.items():
+                print(f"{size:>9}  {name:<28} {timed(query):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""End-to-end scrape benchmark against a local fake channel and transcript backend
+
+Runs a whole scrape (listing, fetch, save, indexing) with configurable latency,
+error rate and transcript size, and reports videos/s, p50/p99 per-video latency,
+peak RSS and bytes written. Save a run with --json and compare a later commit
+against it with --baseline; the exit status is 1 if anything regressed by more
+than --tolerance:
+
+    python benchmarks/scrape_throughput.py --videos 2000 --json before.json
+    python benchmarks/scrape_throughput.py --videos 2000 --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_scraper import AsyncYouTubeChannelScraper
+from fake_youtube import FakeChannel, FakeTranscriptBackend, lognormal_latency
+from rate_limiter import AdaptiveRateLimiter
+from retry import RetryPolicy
+from scraper import YouTubeChannelScraper
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CHANNEL_URL = "https://www.youtube.com/@benchmark"
+
+# Whether a higher value is better, for comparisons against a baseline
+COMPARED = {
+    'videos_per_second': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'peak_rss_mb': False,
+    'bytes_written': False,
+}
+
+
+def unlimited():
+    # The benchmark measures the scraper, not the rate limiter, so timeouts must not slow it down
+    return AdaptiveRateLimiter(rate=1e9, min_rate=1e9, max_rate=1e9)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_scraper(args, output_dir):
+    backend = FakeTranscriptBackend(
+        latency_sampler=lognormal_latency(args.median_latency, args.sigma), error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, segments=args.segments, seed=args.seed
+    )
+    channel = FakeChannel(args.videos, page_size=args.page_size, page_latency=args.page_latency)
+    retry_policy = RetryPolicy(base_delay=args.retry_delay, max_delay=args.retry_delay * 8)
+    if args.engine == 'async':
+        scraper = AsyncYouTubeChannelScraper(CHANNEL_URL, output_dir, backend, args.workers,
+                                             storage=args.storage, retry_policy=retry_policy)
+    else:
+        scraper = YouTubeChannelScraper(CHANNEL_URL, output_dir, backend, storage=args.storage,
+                                        retry_policy=retry_policy)
+    scraper.iter_tab_entries = channel.iter_tab_entries
+    return scraper
+
+
+def time_videos(scraper, latencies):
+    """Record the wall time of every fetch-and-save on the scraper instance"""
+    if isinstance(scraper, AsyncYouTubeChannelScraper):
+        fetch_and_save = scraper._fetch_and_save_async
+
+        async def timed(*args):
+            start = time.perf_counter()
+            try:
+                return await fetch_and_save(*args)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        scraper._fetch_and_save_async = timed
+    else:
+        fetch_and_save = scraper._fetch_and_save
+
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return fetch_and_save(*args)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        scraper._fetch_and_save = timed
+
+
+def run_once(args):
+    latencies = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        scraper = make_scraper(args, output_dir)
+        time_videos(scraper, latencies)
+        start = time.perf_counter()
+        if args.engine == 'async':
+            result = asyncio.run(scraper.scrape_all_transcripts_async(rate_limiter=unlimited()))
+        else:
+            result = scraper.scrape_all_transcripts(max_workers=args.workers, rate_limiter=unlimited())
+        elapsed = time.perf_counter() - start
+        # Duplicate checks run behind the scrape; how long they take to catch up is reported, not timed
+        drain_start = time.perf_counter()
+        if scraper.dedup:
+            scraper.dedup.flush()
+        dedup_drain = time.perf_counter() - drain_start
+        disk_bytes = directory_size(output_dir)
+    return {
+        'elapsed': round(elapsed, 3),
+        'processed': result['processed'],
+        'successful': result['successful'],
+        'videos_per_second': round(result['processed'] / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'bytes_written': result['metrics'].get('bytes_written', 0),
+        'disk_bytes': disk_bytes,
+        'dedup_drain_seconds': round(dedup_drain, 3),
+        'stages': result['metrics']['stages'],
+    }
+
+
+def run_repeated(args):
+    """Median run of `args.repeat`, each in a fresh interpreter so peak RSS is per run"""
+    argv = []
+    for key, value in vars(args).items():
+        if key not in ('repeat', 'json', 'baseline', 'tolerance'):
+            argv += ['--' + key.replace('_', '-'), str(value)]
+    reports = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *argv, '--json', path],
+                check=True, stdout=subprocess.DEVNULL
+            )
+            with open(path, 'r', encoding='utf-8') as f:
+                reports.append(json.load(f)['results'])
+    reports.sort(key=lambda results: results['videos_per_second'])
+    return reports[len(reports) // 2]
+
+
+def compare(report, baseline, tolerance):
+    """Lines describing each compared figure against the baseline, and whether any regressed"""
+    lines = []
+    regressed = False
+    for key, higher_is_better in COMPARED.items():
+        old, new = baseline['results'].get(key), report['results'].get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        regressed = regressed or bool(flag)
+        lines.append(f"{key:>18}: {old:>12} -> {new:>12} ({change:+.1%}) {flag}")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--engine', choices=('threaded', 'async'), default='threaded')
+    parser.add_argument('--videos', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=16,
+                        help="worker threads, or concurrent fetches for the async engine")
+    parser.add_argument('--median-latency', type=float, default=0.05, help="seconds per transcript request")
+    parser.add_argument('--sigma', type=float, default=0.5, help="spread of the lognormal latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of videos without a transcript")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="share of requests that time out")
+    parser.add_argument('--retry-delay', type=float, default=0.01, help="base backoff before a retry")
+    parser.add_argument('--segments', type=int, default=200, help="segments per transcript")
+    parser.add_argument('--page-size', type=int, default=30, help="videos per listing page")
+    parser.add_argument('--page-latency', type=float, default=0.0, help="seconds per listing page")
+    parser.add_argument('--storage', choices=('json', 'compact'), default='json')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="runs to take the median of")
+    parser.add_argument('--json', metavar='PATH', help="write the report to PATH")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against a report saved with --json")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.repeat > 1:
+        results = run_repeated(args)
+    else:
+        results = run_once(args)
+        results['peak_rss_mb'] = peak_rss_mb()
+    params = {
+        key: value for key, value in vars(args).items() if key not in ('repeat', 'json', 'baseline', 'tolerance')
+    }
+    report = {'commit': git_commit(), 'params': params, 'results': results}
+
+    print(f"{args.engine} engine, {args.videos} videos, {args.workers} workers, {args.storage} storage")
+    print(f"  {results['videos_per_second']:.1f} videos/s ({results['elapsed']:.2f}s)")
+    print(f"  per-video latency p50 {results['p50_ms']:.1f} ms, p99 {results['p99_ms']:.1f} ms")
+    for stage, timing in results['stages'].items():
+        print(f"  {stage:>9}: {timing['count']} x {timing['mean_seconds'] * 1000:.2f} ms mean")
+    if results.get('dedup_drain_seconds'):
+        print(f"  duplicate checks caught up {results['dedup_drain_seconds']:.2f}s after the scrape")
+    print(f"  peak RSS {results['peak_rss_mb']} MB, {results['bytes_written']} bytes of transcripts, "
+          f"{results['disk_bytes']} bytes on disk")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['params'] != params:
+            print("warning: baseline was run with different parameters")
+        print(f"against {baseline.get('commit') or args.baseline}:")
+        lines, regressed = compare(report, baseline, args.tolerance)
+        print("\n".join(lines))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Measure full-text search latency on a large synthetic segment corpus
+
+    python benchmarks/search_latency.py --videos 2000 --segments 500
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex, search_index_path
+
+VOCABULARY = [f"word{n}" for n in range(20000)] + [
+    "black", "hole", "quantum", "physics", "history", "ancient", "rome", "music", "theory", "ocean",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--videos', type=int, default=2000)
+    parser.add_argument('--segments', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Zipf-like word frequencies, as in natural language
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+    with tempfile.TemporaryDirectory() as output_dir:
+        index = SearchIndex(search_index_path(output_dir))
+        start = time.perf_counter()
+        for n in range(args.videos):
+            transcript = [
+                {'text': " ".join(rng.choices(VOCABULARY, cum_weights=cum_weights, k=10)), 'start': i * 4.0}
+                for i in range(args.segments)
+            ]
+            index.add_transcript(f"vid{n:07d}", f"Video {n}", transcript)
+        elapsed = time.perf_counter() - start
+        total = args.videos * args.segments
+        print(f"indexed {total} segments in {elapsed:.1f}s ({total / elapsed:.0f} segments/s)")
+
+        for query in ("quantum", "word5 word7", '"black hole"', "hist*", "word1999*", "nonexistent"):
+            samples = []
+            for _ in range(20):
+                t = time.perf_counter()
+                hits = index.search(query)
+                samples.append(time.perf_counter() - t)
+            samples.sort()
+            print(f"{query:<14} {len(hits):>3} hits  median {samples[len(samples) // 2] * 1000:8.2f} ms")
+
+        t = time.perf_counter()
+        index.add_transcript("vid0000000", "Video 0 (updated)", [{'text': "quantum update", 'start': 0.0}])
+        print(f"re-index one video: {(time.perf_counter() - t) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Import time and memory of a freshly started web process
+
+Each run imports the module (default `app`) in a new interpreter inside a
+throwaway working directory and reports wall time, peak RSS and which of the
+scraping libraries got loaded. Those should only load once a scrape starts;
+--check exits 1 if any of them were imported at startup:
+
+    python benchmarks/startup_time.py --repeat 5 --check
+    python benchmarks/startup_time.py --module asgi
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries only a scrape needs
+HEAVY_MODULES = ('yt_dlp', 'youtube_transcript_api', 'requests')
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+except ImportError:
+    peak_mb = None
+print(json.dumps({{
+    'seconds': elapsed,
+    'peak_rss_mb': peak_mb,
+    'modules': len(sys.modules),
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+sys.stdout.flush()
+import os
+os._exit(0)
+"""
+
+
+def run_once(module):
+    with tempfile.TemporaryDirectory() as cwd:
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(repo=REPO, module=module, heavy=HEAVY_MODULES)],
+            cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app', help="module a worker imports at boot")
+    parser.add_argument('--repeat', type=int, default=5, help="runs to take the median of")
+    parser.add_argument('--check', action='store_true', help="fail if a scraping library was imported")
+    args = parser.parse_args()
+
+    runs = sorted((run_once(args.module) for _ in range(args.repeat)), key=lambda run: run['seconds'])
+    median = runs[len(runs) // 2]
+    print(f"import {args.module}: {median['seconds'] * 1000:.0f} ms median of {args.repeat} "
+          f"(min {runs[0]['seconds'] * 1000:.0f} ms, max {runs[-1]['seconds'] * 1000:.0f} ms)")
+    print(f"  peak RSS {median['peak_rss_mb']} MB, {median['modules']} modules loaded")
+    print(f"  scraping libraries loaded: {', '.join(median['heavy']) or 'none'}")
+    if args.check and median['heavy']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
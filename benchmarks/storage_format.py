@@ -0,0 +1,103 @@
+"""Compare size and read latency of the JSON and compact transcript formats
+
+    python benchmarks/storage_format.py --videos 200 --segments 1500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_store import CompactTranscript, compact_filename, load_transcript_file, write_compact
+
+WORDS = ("the quick brown fox jumps over lazy dog and then we talk about science history "
+         "music energy planet ocean brain language market future people because really").split()
+
+
+def make_transcript(rng, segments):
+    start = 0.0
+    transcript = []
+    for _ in range(segments):
+        duration = round(rng.uniform(1.5, 6.0), 3)
+        transcript.append({
+            'text': " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14))),
+            'start': round(start, 3),
+            'duration': duration
+        })
+        start += duration
+    return transcript
+
+
+def median_ms(func, paths):
+    samples = []
+    for path in paths:
+        start = time.perf_counter()
+        func(path)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def json_segment(path):
+    _, transcript = load_transcript_file(path)
+    return transcript[len(transcript) // 2]
+
+
+def json_slice(path):
+    _, transcript = load_transcript_file(path)
+    return [entry for entry in transcript if 600 <= entry['start'] < 660]
+
+
+def compact_segment(path):
+    with CompactTranscript(path) as transcript:
+        return transcript.segment(len(transcript) // 2)
+
+
+def compact_slice(path):
+    with CompactTranscript(path) as transcript:
+        return transcript.slice(600, 660)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--videos', type=int, default=200)
+    parser.add_argument('--segments', type=int, default=1500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        json_paths, compact_paths = [], []
+        for n in range(args.videos):
+            video_id = f"vid{n:07d}"
+            metadata = {'video_id': video_id, 'title': f"Video {n}", 'clean_title': f"Video {n}"}
+            transcript = make_transcript(rng, args.segments)
+
+            json_path = os.path.join(directory, f"{video_id}_transcript.json")
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({**metadata, 'transcript': transcript}, f, ensure_ascii=False, indent=2)
+            json_paths.append(json_path)
+
+            compact_path = os.path.join(directory, compact_filename(video_id))
+            write_compact(compact_path, metadata, transcript)
+            compact_paths.append(compact_path)
+
+        json_bytes = sum(os.path.getsize(path) for path in json_paths)
+        compact_bytes = sum(os.path.getsize(path) for path in compact_paths)
+        print(f"{args.videos} videos x {args.segments} segments")
+        print(f"size      json {json_bytes / 1e6:9.2f} MB   compact {compact_bytes / 1e6:9.2f} MB"
+              f"   ({json_bytes / compact_bytes:.1f}x smaller)")
+        for name, json_func, compact_func in (
+            ("full read", load_transcript_file, load_transcript_file),
+            ("1 segment", json_segment, compact_segment),
+            ("60s slice", json_slice, compact_slice),
+        ):
+            print(f"{name:<9} json {median_ms(json_func, json_paths):9.3f} ms   "
+                  f"compact {median_ms(compact_func, compact_paths):9.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Check that the streaming ZIP export keeps memory flat on a large synthetic corpus
+
+Writes N synthetic transcript files, streams them through zip_stream.stream_zip
+(discarding the output, as a slow client would consume it) and compares peak
+traced memory with building the same archive in an io.BytesIO. Exits non-zero
+if the streaming export's peak grows beyond --max-peak-mb:
+
+    python benchmarks/zip_export_memory.py --files 1000 --file-kb 256
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zip_stream import directory_files, stream_zip
+
+
+def make_corpus(directory, files, file_kb):
+    # Random bytes rendered as hex compress about 2:1, so the archive is large too
+    for n in range(files):
+        with open(os.path.join(directory, f"video{n:06d}.txt"), 'w', encoding='utf-8') as f:
+            f.write(f"Title: Video {n}\n")
+            f.write(os.urandom(file_kb * 512).hex())
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak / (1024 * 1024), elapsed
+
+
+def streamed(directory):
+    return sum(len(chunk) for chunk in stream_zip(directory_files(directory)))
+
+
+def in_memory(directory):
+    memory_file = io.BytesIO()
+    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for path, arcname in directory_files(directory):
+            zf.write(path, arcname)
+    return memory_file.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--file-kb', type=int, default=256)
+    parser.add_argument('--max-peak-mb', type=float, default=8.0)
+    parser.add_argument('--skip-in-memory', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_corpus(directory, args.files, args.file_kb)
+        corpus_mb = args.files * args.file_kb / 1024
+        print(f"corpus: {args.files} files, {corpus_mb:.0f} MB")
+
+        # Half the corpus first: a flat profile means peak does not grow with archive size
+        half_dir = os.path.join(directory, 'half')
+        os.mkdir(half_dir)
+        make_corpus(half_dir, args.files // 2, args.file_kb)
+        _, half_peak, _ = measure(lambda: streamed(half_dir))
+
+        size, peak, elapsed = measure(lambda: streamed(directory))
+        print(f"streamed : archive {size / 1e6:8.1f} MB, peak {peak:7.2f} MB (half corpus {half_peak:.2f} MB), {elapsed:.2f}s")
+
+        if not args.skip_in_memory:
+            size, mem_peak, elapsed = measure(lambda: in_memory(directory))
+            print(f"in-memory: archive {size / 1e6:8.1f} MB, peak {mem_peak:7.2f} MB, {elapsed:.2f}s")
+
+    if peak > args.max_peak_mb or peak > half_peak * 1.5 + 1:
+        print(f"FAIL: streaming export peak {peak:.2f} MB is not flat")
+        sys.exit(1)
+    print("OK: streaming export memory is flat")
+
+
+if __name__ == '__main__':
+    main()
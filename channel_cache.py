@@ -0,0 +1,191 @@
+"""Channel listings persisted between scrapes, so yt-dlp does not re-enumerate a channel each run
+
+A listing holds the channel's resolved ID and title and every video found on its
+tabs (ID, title, duration, upload date), newest first. Within `ttl` seconds of the
+last check a listing is used as is. After that it is refreshed by paging each tab
+only down to its newest listed video, and once it is older than `max_age` the
+channel is enumerated from scratch again, which also drops deleted videos.
+"""
+import os
+import time
+
+from manifest import channel_key
+from sqlite_store import SQLiteStore
+from transcript_index import INDEX_DIRNAME
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_key TEXT PRIMARY KEY,
+    channel_url TEXT NOT NULL,
+    channel_id TEXT,
+    title TEXT,
+    complete INTEGER NOT NULL, -- 0 if the listing stopped at max_videos
+    listed_at REAL NOT NULL, -- last full enumeration
+    checked_at REAL NOT NULL -- last full enumeration or refresh
+);
+CREATE TABLE IF NOT EXISTS channel_videos (
+    channel_key TEXT NOT NULL,
+    position INTEGER NOT NULL, -- ascending from newest; videos found by a refresh get lower ones
+    video_id TEXT NOT NULL,
+    tab TEXT NOT NULL,
+    title TEXT NOT NULL,
+    original_title TEXT NOT NULL,
+    duration REAL,
+    upload_date TEXT,
+    PRIMARY KEY (channel_key, position)
+);
+"""
+
+INSERT_VIDEO = (
+    "INSERT INTO channel_videos (channel_key, position, video_id, tab, title, original_title, duration, upload_date) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def channel_cache_path(output_dir):
+    """Location of the channel listing cache for an output directory"""
+    return os.path.join(output_dir, INDEX_DIRNAME, 'channels.sqlite3')
+
+
+class ChannelListing:
+    """One channel's cached videos as (tab, video) pairs, newest first"""
+
+    def __init__(self, channel_id, title, entries, complete, listed_at, checked_at):
+        self.channel_id = channel_id
+        self.title = title
+        self.entries = entries
+        self.complete = complete
+        self.listed_at = listed_at
+        self.checked_at = checked_at
+
+    def __len__(self):
+        return len(self.entries)
+
+    def video_ids(self):
+        return {video['id'] for _, video in self.entries}
+
+    def covers(self, max_videos=None):
+        """Whether the listing holds every video a scrape limited to max_videos would list"""
+        return self.complete or bool(max_videos and max_videos <= len(self.entries))
+
+    def select(self, max_videos=None, known=None):
+        """Videos as a live enumeration would yield them: each tab stops at its first `known` video"""
+        stopped = set()
+        videos = []
+        for tab, video in self.entries:
+            if tab in stopped:
+                continue
+            if known is not None and video['id'] in known:
+                stopped.add(tab)
+                continue
+            videos.append(video)
+            if max_videos and len(videos) >= max_videos:
+                break
+        return videos
+
+
+class ChannelCache(SQLiteStore):
+    """Channel listings in SQLite, shared by every worker process using the output directory"""
+
+    SCHEMA = SCHEMA
+
+    def __init__(self, db_path, ttl=DEFAULT_TTL, max_age=DEFAULT_MAX_AGE):
+        super().__init__(db_path)
+        self.ttl = ttl
+        self.max_age = max_age
+
+    @classmethod
+    def open(cls, output_dir):
+        """Process-wide cache for an output directory"""
+        return cls.shared(
+            channel_cache_path(output_dir),
+            ttl=float(os.environ.get('SCRAPER_CHANNEL_CACHE_TTL', DEFAULT_TTL)),
+            max_age=float(os.environ.get('SCRAPER_CHANNEL_CACHE_MAX_AGE', DEFAULT_MAX_AGE))
+        )
+
+    def get(self, channel_url):
+        conn = self._connect()
+        key = channel_key(channel_url)
+        channel = conn.execute("SELECT * FROM channels WHERE channel_key = ?", (key,)).fetchone()
+        if channel is None:
+            return None
+        rows = conn.execute(
+            "SELECT * FROM channel_videos WHERE channel_key = ? ORDER BY position", (key,)
+        ).fetchall()
+        entries = [
+            (row['tab'], {
+                'id': row['video_id'],
+                'title': row['title'],
+                'original_title': row['original_title'],
+                'duration': row['duration'],
+                'upload_date': row['upload_date'],
+            })
+            for row in rows
+        ]
+        return ChannelListing(channel['channel_id'], channel['title'], entries, bool(channel['complete']),
+                              channel['listed_at'], channel['checked_at'])
+
+    def is_fresh(self, listing, now=None):
+        """Whether a listing can be used without asking YouTube for anything"""
+        return (now or time.time()) - listing.checked_at < self.ttl
+
+    def is_refreshable(self, listing, now=None):
+        """Whether a stale listing can be brought up to date by paging only its new videos"""
+        return listing.complete and (now or time.time()) - listing.listed_at < self.max_age
+
+    @staticmethod
+    def _rows(key, entries, first_position):
+        return [
+            (key, first_position + n, video['id'], tab, video['title'], video['original_title'],
+             video.get('duration'), video.get('upload_date'))
+            for n, (tab, video) in enumerate(entries)
+        ]
+
+    def put(self, channel_url, entries, complete=True, channel_id=None, title=None):
+        """Replace a channel's listing with (tab, video) pairs, newest first"""
+        key = channel_key(channel_url)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM channel_videos WHERE channel_key = ?", (key,))
+            conn.executemany(INSERT_VIDEO, self._rows(key, entries, 0))
+            conn.execute(
+                "INSERT OR REPLACE INTO channels (channel_key, channel_url, channel_id, title, complete, listed_at, "
+                "checked_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, channel_url, channel_id, title, int(complete), now, now)
+            )
+
+    def prepend(self, channel_url, entries):
+        """Add videos a refresh found (newest first) ahead of the listed ones and mark the listing checked"""
+        key = channel_key(channel_url)
+        with self._connect() as conn:
+            known = {row[0] for row in conn.execute(
+                "SELECT video_id FROM channel_videos WHERE channel_key = ?", (key,)
+            )}
+            entries = [(tab, video) for tab, video in entries if video['id'] not in known]
+            first = conn.execute(
+                "SELECT COALESCE(MIN(position), 0) FROM channel_videos WHERE channel_key = ?", (key,)
+            ).fetchone()[0]
+            conn.executemany(INSERT_VIDEO, self._rows(key, entries, first - len(entries)))
+            conn.execute("UPDATE channels SET checked_at = ? WHERE channel_key = ?", (time.time(), key))
+        return len(entries)
+
+    def invalidate(self, channel_url):
+        key = channel_key(channel_url)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM channel_videos WHERE channel_key = ?", (key,))
+            conn.execute("DELETE FROM channels WHERE channel_key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM channel_videos")
+            conn.execute("DELETE FROM channels")
+
+    def stats(self):
+        conn = self._connect()
+        return {
+            'channels': conn.execute("SELECT COUNT(*) FROM channels").fetchone()[0],
+            'videos': conn.execute("SELECT COUNT(*) FROM channel_videos").fetchone()[0],
+        }
@@ -0,0 +1,194 @@
+"""Columnar table files (`.tcol`) for analytics over many transcripts
+
+Layout, all integers little-endian:
+
+    header      magic 'YTCL', version u16
+    row groups  per column a zlib-compressed chunk: packed f64/f32/i64 values, or
+                for strings (rows + 1) x u32 offsets followed by the UTF-8 text
+    footer      UTF-8 JSON: columns as [name, type], and each row group's row count
+                and [offset, length] of its chunks
+    trailer     footer length u32, magic 'YTCL'
+
+Like Parquet, rows are written in groups as they arrive and the footer is written
+last, so a writer holds one row group in memory whatever the table's size, and a
+reader decodes only the row groups and columns it asks for. Repeated per-video
+values (IDs, titles) cost little once their chunk is compressed.
+"""
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b'YTCL'
+VERSION = 1
+EXTENSION = '.tcol'
+ROW_GROUP_SIZE = 65536
+
+HEADER = struct.Struct('<4sH')
+TRAILER = struct.Struct('<I4s')
+
+# Column type -> array typecode; 'str' columns are offsets plus text
+TYPECODES = {'f64': 'd', 'f32': 'f', 'i64': 'q'}
+
+
+def _packed(typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpacked(typecode, data, count):
+    values = array(typecode)
+    values.frombytes(data[:values.itemsize * count])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def encode_column(kind, values):
+    """Compressed chunk for one column of a row group"""
+    if kind == 'str':
+        texts = [(value or '').encode('utf-8') for value in values]
+        offsets = [0]
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        raw = _packed('I', offsets) + b"".join(texts)
+    else:
+        raw = _packed(TYPECODES[kind], (value or 0 for value in values))
+    return zlib.compress(raw, 6)
+
+
+def decode_column(kind, chunk, rows):
+    raw = zlib.decompress(chunk)
+    if kind == 'str':
+        offsets = _unpacked('I', raw, rows + 1)
+        base = 4 * (rows + 1)
+        return [raw[base + offsets[i]:base + offsets[i + 1]].decode('utf-8') for i in range(rows)]
+    return _unpacked(TYPECODES[kind], raw, rows).tolist()
+
+
+class ColumnarWriter:
+    """Streams rows (dicts) into a columnar file, one row group at a time
+
+    The file is written under a temporary name and renamed into place by close(), so
+    readers never see a partial table. Leaving the `with` block on an error discards it.
+    """
+
+    def __init__(self, path, columns, row_group_size=ROW_GROUP_SIZE):
+        for _, kind in columns:
+            if kind != 'str' and kind not in TYPECODES:
+                raise ValueError(f"Unknown column type {kind}")
+        self.path = path
+        self.columns = [tuple(column) for column in columns]
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._row_groups = []
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_row(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self):
+        """Write the buffered rows as a row group"""
+        if not self._rows:
+            return
+        chunks = []
+        for name, kind in self.columns:
+            chunk = encode_column(kind, [row.get(name) for row in self._rows])
+            chunks.append([self._file.tell(), len(chunk)])
+            self._file.write(chunk)
+        self._row_groups.append({'rows': len(self._rows), 'chunks': chunks})
+        self.rows_written += len(self._rows)
+        self._rows = []
+
+    def close(self):
+        """Write the footer and move the file into place; returns its size in bytes"""
+        self.flush()
+        footer = json.dumps({'columns': self.columns, 'row_groups': self._row_groups}).encode('utf-8')
+        self._file.write(footer)
+        self._file.write(TRAILER.pack(len(footer), MAGIC))
+        size = self._file.tell()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return size
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+class ColumnarReader:
+    """Reads whole columns of a columnar file, a row group at a time"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a columnar table file")
+            f.seek(-TRAILER.size, os.SEEK_END)
+            footer_size, magic = TRAILER.unpack(f.read(TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is truncated")
+            f.seek(-TRAILER.size - footer_size, os.SEEK_END)
+            footer = json.loads(f.read(footer_size).decode('utf-8'))
+        self.columns = [tuple(column) for column in footer['columns']]
+        self.row_groups = footer['row_groups']
+
+    def __len__(self):
+        return sum(group['rows'] for group in self.row_groups)
+
+    def read_row_group(self, index, columns=None):
+        """{column: [values]} of one row group, for `columns` (default all)"""
+        group = self.row_groups[index]
+        wanted = set(columns) if columns is not None else None
+        table = {}
+        with open(self.path, 'rb') as f:
+            for (name, kind), (offset, length) in zip(self.columns, group['chunks']):
+                if wanted is not None and name not in wanted:
+                    continue
+                f.seek(offset)
+                table[name] = decode_column(kind, f.read(length), group['rows'])
+        return table
+
+    def iter_rows(self, columns=None):
+        """Rows as dicts, decoding one row group at a time"""
+        for index in range(len(self.row_groups)):
+            table = self.read_row_group(index, columns)
+            names = list(table)
+            for values in zip(*(table[name] for name in names)):
+                yield dict(zip(names, values))
+
+
+def read_columns(path, columns=None):
+    """Whole table as {column: [values]}"""
+    reader = ColumnarReader(path)
+    table = {name: [] for name, _ in reader.columns if columns is None or name in columns}
+    for index in range(len(reader.row_groups)):
+        for name, values in reader.read_row_group(index, columns).items():
+            table[name].extend(values)
+    return table
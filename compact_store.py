@@ -0,0 +1,273 @@
+"""Compact binary transcript storage (`{video_id}_transcript.tsb`)
+
+Layout, all integers little-endian:
+
+    header      magic 'YTTS', version u16, flags u16, segments u32, blocks u32,
+                block size u32, metadata length u32
+    metadata    UTF-8 JSON (video_id, title, url, scraped_at, ...)
+    starts      segments x f64, sorted as in the source transcript
+    durations   segments x f32
+    text index  (segments + 1) x u32 offsets into the uncompressed text
+    block index (blocks + 1) x u64 offsets into the compressed text area
+    text        zlib-compressed blocks of `block size` segments' UTF-8 text
+
+Files are memory-mapped on read. Looking up one segment decompresses a single
+block, and a time-range slice binary-searches the start times.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from languages import DEFAULT_LANGUAGE
+from transcript_writer import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'YTTS'
+VERSION = 1
+EXTENSION = '.tsb'
+BLOCK_SIZE = 64
+
+HEADER = struct.Struct('<4sHHIIII')
+
+
+def _packed(typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def compact_filename(video_id):
+    return f"{video_id}_transcript{EXTENSION}"
+
+
+def encode_transcript(metadata, transcript, block_size=BLOCK_SIZE):
+    """Serialise metadata plus a list of {'text', 'start', 'duration'} segments"""
+    texts = [entry['text'].encode('utf-8') for entry in transcript]
+    offsets = [0]
+    for text in texts:
+        offsets.append(offsets[-1] + len(text))
+
+    blocks = []
+    block_offsets = [0]
+    for start in range(0, len(texts), block_size):
+        block = zlib.compress(b"".join(texts[start:start + block_size]), 6)
+        blocks.append(block)
+        block_offsets.append(block_offsets[-1] + len(block))
+
+    meta = json.dumps(metadata, ensure_ascii=False).encode('utf-8')
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION, 0, len(transcript), len(blocks), block_size, len(meta)),
+        meta,
+        _packed('d', (float(entry['start']) for entry in transcript)),
+        _packed('f', (float(entry.get('duration', 0.0)) for entry in transcript)),
+        _packed('I', offsets),
+        _packed('Q', block_offsets),
+        *blocks,
+    ])
+
+
+def write_compact(path, metadata, transcript, block_size=BLOCK_SIZE):
+    """Write a compact transcript file atomically"""
+    atomic_write(path, encode_transcript(metadata, transcript, block_size))
+
+
+class CompactTranscript:
+    """Memory-mapped reader for a compact transcript file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, self.count, self.block_count, self.block_size, meta_len = HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            # Shorter than a header, e.g. truncated by a crash before atomic writes
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a compact transcript file")
+
+        pos = HEADER.size
+        self.metadata = json.loads(self._mm[pos:pos + meta_len].decode('utf-8'))
+        pos += meta_len
+        self._starts = pos
+        pos += 8 * self.count
+        self._durations = pos
+        pos += 4 * self.count
+        self._text_offsets = pos
+        pos += 4 * (self.count + 1)
+        self._block_offsets = pos
+        pos += 8 * (self.block_count + 1)
+        self._blocks = pos
+        self._block_cache = (None, None)
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def start(self, i):
+        return struct.unpack_from('<d', self._mm, self._starts + 8 * i)[0]
+
+    def duration(self, i):
+        return struct.unpack_from('<f', self._mm, self._durations + 4 * i)[0]
+
+    def _text_offset(self, i):
+        return struct.unpack_from('<I', self._mm, self._text_offsets + 4 * i)[0]
+
+    def _block(self, b):
+        cached_index, cached = self._block_cache
+        if cached_index == b:
+            return cached
+        begin, end = struct.unpack_from('<QQ', self._mm, self._block_offsets + 8 * b)
+        data = zlib.decompress(self._mm[self._blocks + begin:self._blocks + end])
+        self._block_cache = (b, data)
+        return data
+
+    def text(self, i):
+        """Text of segment i, decompressing only the block that holds it"""
+        b = i // self.block_size
+        base = self._text_offset(b * self.block_size)
+        data = self._block(b)
+        return data[self._text_offset(i) - base:self._text_offset(i + 1) - base].decode('utf-8')
+
+    def segment(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return {'text': self.text(i), 'start': self.start(i), 'duration': round(self.duration(i), 3)}
+
+    def bisect(self, time):
+        """Index of the first segment starting at or after `time`"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.start(mid) < time:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def slice(self, start_time=0.0, end_time=None):
+        """Segments overlapping [start_time, end_time)"""
+        first = self.bisect(start_time)
+        # Include a segment that began before start_time but is still running
+        if first > 0 and self.start(first - 1) + self.duration(first - 1) > start_time:
+            first -= 1
+        last = self.count if end_time is None else self.bisect(end_time)
+        return [self.segment(i) for i in range(first, last)]
+
+    def _array(self, typecode, offset, count):
+        data = array(typecode)
+        data.frombytes(self._mm[offset:offset + data.itemsize * count])
+        if sys.byteorder != 'little':
+            data.byteswap()
+        return data
+
+    def segments(self):
+        """Every segment, in order, decoded in bulk"""
+        starts = self._array('d', self._starts, self.count)
+        durations = self._array('f', self._durations, self.count)
+        offsets = self._array('I', self._text_offsets, self.count + 1)
+        block_offsets = self._array('Q', self._block_offsets, self.block_count + 1)
+        text = b"".join(
+            zlib.decompress(self._mm[self._blocks + block_offsets[b]:self._blocks + block_offsets[b + 1]])
+            for b in range(self.block_count)
+        )
+        return [
+            {'text': text[offsets[i]:offsets[i + 1]].decode('utf-8'), 'start': starts[i],
+             'duration': round(durations[i], 3)}
+            for i in range(self.count)
+        ]
+
+
+def read_compact(path):
+    """Load a compact file as (metadata, transcript segments)"""
+    with CompactTranscript(path) as transcript:
+        return transcript.metadata, transcript.segments()
+
+
+def load_transcript_file(path):
+    """Load a JSON or compact transcript file as (metadata, transcript segments)"""
+    if path.endswith(EXTENSION):
+        return read_compact(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    transcript = data.pop('transcript', [])
+    return data, transcript
+
+
+def read_segments(path, start_time=0.0, end_time=None):
+    """Segments of a JSON or compact file overlapping [start_time, end_time)"""
+    if path.endswith(EXTENSION):
+        with CompactTranscript(path) as transcript:
+            return transcript.slice(start_time, end_time)
+    _, transcript = load_transcript_file(path)
+    return [
+        entry for entry in transcript
+        if entry['start'] + entry.get('duration', 0.0) > start_time
+        and (end_time is None or entry['start'] < end_time)
+    ]
+
+
+def _same_transcript(metadata, other):
+    # Files saved before languages were tracked have no language, which means the default one
+    return all(
+        (metadata.get(key) or default) == (other.get(key) or default)
+        for key, default in (('video_id', None), ('language', DEFAULT_LANGUAGE))
+    )
+
+
+def convert_directory(output_dir, delete=False):
+    """Convert every {stem}_transcript.json in output_dir to {stem}_transcript.tsb
+
+    The stem keeps the `.{language}` suffix of further languages, so every language of
+    a video gets its own file. A JSON file whose target already holds another
+    transcript is left alone, and never deleted.
+    """
+    converted = 0
+    for filename in os.listdir(output_dir):
+        if not filename.endswith('_transcript.json'):
+            continue
+        json_path = os.path.join(output_dir, filename)
+        metadata, transcript = load_transcript_file(json_path)
+        compact_path = os.path.join(output_dir, compact_filename(filename[:-len('_transcript.json')]))
+        if os.path.exists(compact_path):
+            with CompactTranscript(compact_path) as existing:
+                if not _same_transcript(metadata, existing.metadata):
+                    logger.warning(f"Not converting {filename}: {os.path.basename(compact_path)} holds "
+                                   f"another transcript")
+                    continue
+        write_compact(compact_path, metadata, transcript)
+        if delete:
+            os.remove(json_path)
+        converted += 1
+    return converted
+
+
+if __name__ == '__main__':
+    import argparse
+    from transcript_index import TranscriptIndex, index_path
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Convert JSON transcripts to the compact format")
+    parser.add_argument('output_dir', nargs='?', default='transcripts')
+    parser.add_argument('--delete', action='store_true', help="remove the JSON files after converting")
+    args = parser.parse_args()
+
+    count = convert_directory(args.output_dir, delete=args.delete)
+    print(f"Converted {count} transcripts")
+    TranscriptIndex(index_path(args.output_dir)).rebuild(args.output_dir)
@@ -0,0 +1,572 @@
+"""Near-duplicate videos and recurring boilerplate (intros, outros, sponsor reads) across transcripts
+
+Each saved transcript gets a MinHash signature over 5-word shingles of its text.
+Its bands go in an LSH table, so a new video is compared only with videos that
+share a band. If the signatures agree on at least `threshold` of their values, it
+is marked a near-duplicate of the most similar one, or of the original that video
+itself copies.
+
+Recurring passages are found from windows of WINDOW_WORDS consecutive words.
+Winnowing picks where windows start from the text itself (the smallest shingle
+hash among every WINNOW_SPAN shingles), so the same passage yields the same
+windows in every video, whatever precedes it or how its captions are split
+into segments. Each window gets a 64-bit SimHash of its word pairs. Windows
+within MAX_DISTANCE bits of each other are near-identical; three 21-bit bands
+find them, since two such hashes must agree on at least one band. Every window
+counts the other videos that repeat it. A window repeated in `min_videos` videos
+or more is boilerplate. Adding or removing a video reads and updates only the rows
+in its own buckets, never the whole corpus.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import queue
+import random
+import re
+import subprocess
+import sys
+import threading
+from array import array
+
+from languages import DEFAULT_LANGUAGE
+from sqlite_store import SQLiteStore
+from transcript_index import INDEX_DIRNAME
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r'\w+')
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DUPLICATE_THRESHOLD = 0.8
+
+WINDOW_WORDS = 30
+WINNOW_SPAN = 30
+SIMHASH_BANDS = 3
+BAND_BITS = 21
+MAX_DISTANCE = 2
+BOILERPLATE_MIN_VIDEOS = 3
+
+BATCH_SIZE = 64
+MAX_PENDING = 10000
+
+# Each MinHash value is the smallest shingle hash XORed with one of these masks, a cheap
+# stand-in for a random permutation; fixed so signatures stay comparable across runs
+_rng = random.Random(0x5eed)
+MASKS = [_rng.getrandbits(32) for _ in range(NUM_PERM)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    signature BLOB NOT NULL, -- NUM_PERM x u32 MinHash values
+    duplicate_of TEXT, -- earlier video this one nearly repeats
+    similarity REAL,
+    PRIMARY KEY (video_id, language)
+);
+CREATE TABLE IF NOT EXISTS signature_bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signature_bands_bucket ON signature_bands (band, bucket);
+CREATE INDEX IF NOT EXISTS signature_bands_video ON signature_bands (video_id, language);
+CREATE TABLE IF NOT EXISTS windows (
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    window INTEGER NOT NULL, -- position of its first word
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    simhash INTEGER NOT NULL, -- signed 64-bit, as SQLite stores integers
+    b0 INTEGER NOT NULL,
+    b1 INTEGER NOT NULL,
+    b2 INTEGER NOT NULL,
+    repeats INTEGER NOT NULL DEFAULT 0, -- other videos with a near-identical window
+    PRIMARY KEY (video_id, language, window)
+);
+CREATE INDEX IF NOT EXISTS windows_b0 ON windows (b0);
+CREATE INDEX IF NOT EXISTS windows_b1 ON windows (b1);
+CREATE INDEX IF NOT EXISTS windows_b2 ON windows (b2);
+"""
+
+
+def dedup_path(output_dir):
+    """Location of the duplicate and boilerplate index for an output directory"""
+    return os.path.join(output_dir, INDEX_DIRNAME, 'dedup.sqlite3')
+
+
+def _hash(text, size):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=size).digest(), 'little')
+
+
+def _signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _words(text):
+    return WORD.findall(text.lower())
+
+
+def transcript_words(transcript):
+    """Lower-cased words of a transcript and the index of the segment each comes from"""
+    words = []
+    segment_of = []
+    for n, segment in enumerate(transcript):
+        found = _words(segment['text'])
+        words.extend(found)
+        segment_of.extend([n] * len(found))
+    return words, segment_of
+
+
+def shingle_hashes(words):
+    """32-bit hash of the SHINGLE_WORDS-word shingle starting at each word"""
+    return [_hash(" ".join(words[i:i + SHINGLE_WORDS]), 4) for i in range(max(0, len(words) - SHINGLE_WORDS + 1))]
+
+
+def minhash(shingles):
+    """NUM_PERM MinHash values over shingle hashes, or None without any"""
+    if not shingles:
+        return None
+    shingles = set(shingles)
+    return [min(map(mask.__xor__, shingles)) for mask in MASKS]
+
+
+def signature_bands(signature):
+    """LSH bucket of each band of ROWS values"""
+    return [
+        _signed(_hash(f"{band}:" + ",".join(map(str, signature[band * ROWS:(band + 1) * ROWS])), 8))
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def simhash(words):
+    """64-bit SimHash of a window's word pairs"""
+    pairs = [format(_hash(f"{a} {b}", 8), '064b') for a, b in zip(words, words[1:])] or ['0' * 64]
+    half = len(pairs) / 2
+    value = 0
+    # Bit by bit, most significant first: set where most pairs' hashes have it set
+    for column in zip(*pairs):
+        value = value << 1 | (column.count('1') > half)
+    return value
+
+
+def simhash_bands(value):
+    return [value >> (BAND_BITS * band) & ((1 << BAND_BITS) - 1) for band in range(SIMHASH_BANDS)]
+
+
+def winnow(hashes, span=WINNOW_SPAN):
+    """Positions of the rightmost smallest hash in every run of `span` hashes"""
+    selected = []
+    for first in range(max(1, len(hashes) - span + 1)):
+        run = hashes[first:first + span]
+        position = first + len(run) - 1 - run[::-1].index(min(run))
+        if not selected or selected[-1] != position:
+            selected.append(position)
+    return selected
+
+
+def transcript_windows(transcript, words, segment_of, shingles):
+    """(window, start, end, words) for the WINDOW_WORDS-word runs winnowing selects
+
+    Takes transcript_words() and shingle_hashes() of the transcript. `window` is the
+    position of the run's first word; start and end are the times of the segments
+    holding its first and last word.
+    """
+    if len(words) < WINDOW_WORDS:
+        return []
+    windows = []
+    for position in winnow(shingles[:len(words) - WINDOW_WORDS + 1]):
+        first = transcript[segment_of[position]]
+        last = transcript[segment_of[position + WINDOW_WORDS - 1]]
+        windows.append((position, first['start'], last['start'] + last.get('duration', 0.0),
+                        words[position:position + WINDOW_WORDS]))
+    return windows
+
+
+def _pack(signature):
+    data = array('I', signature)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpack(blob):
+    data = array('I')
+    data.frombytes(blob)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tolist()
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def strip_ranges(transcript, ranges):
+    """Segments of a transcript that are not inside any of the (start, end) ranges"""
+    if not ranges:
+        return transcript
+    return [
+        segment for segment in transcript
+        if not any(start <= segment['start'] and segment['start'] + segment.get('duration', 0.0) <= end + 0.001
+                   for start, end in ranges)
+    ]
+
+
+class DedupIndex(SQLiteStore):
+    """Incremental LSH index of transcript signatures and window hashes, persisted in SQLite"""
+
+    SCHEMA = SCHEMA
+
+    def __init__(self, db_path, threshold=DUPLICATE_THRESHOLD, min_videos=BOILERPLATE_MIN_VIDEOS):
+        super().__init__(db_path)
+        self.threshold = threshold
+        self.min_videos = min_videos
+        self._stage = None
+        self._stage_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, output_dir):
+        """Process-wide index for an output directory"""
+        return cls.shared(dedup_path(output_dir))
+
+    def background(self):
+        """The DedupStage feeding this index, started on first use"""
+        with self._stage_lock:
+            if self._stage is None:
+                self._stage = DedupStage(self)
+            return self._stage
+
+    def add_transcript(self, video_id, transcript, language=DEFAULT_LANGUAGE):
+        """(Re)index one transcript and return the video it nearly duplicates, if any"""
+        return self.add_transcripts([(video_id, transcript, language)])[0]
+
+    def add_transcripts(self, transcripts):
+        """(Re)index several (video_id, transcript, language) in a single transaction"""
+        return self._add_prepared(
+            [self._prepare(video_id, transcript, language) for video_id, transcript, language in transcripts]
+        )
+
+    def _add_prepared(self, prepared):
+        conn = self._connect()
+        with conn:
+            # Lookups and counts must see every other process's videos, so take the write lock first
+            conn.execute("BEGIN IMMEDIATE")
+            return [self._add(conn, *item) for item in prepared]
+
+    @staticmethod
+    def _prepare(video_id, transcript, language):
+        # Hashing happens before the write transaction so other writers are not held up by it
+        words, segment_of = transcript_words(transcript)
+        shingles = shingle_hashes(words)
+        windows = [
+            (window, start, end, simhash(window_words))
+            for window, start, end, window_words in transcript_windows(transcript, words, segment_of, shingles)
+        ]
+        return video_id, language, minhash(shingles), windows
+
+    def _add(self, conn, video_id, language, signature, windows):
+        self._remove(conn, video_id, language)
+        duplicate_of, best = None, 0.0
+        if signature is not None:
+            bands = signature_bands(signature)
+            candidates = set()
+            for band, bucket in enumerate(bands):
+                candidates.update(
+                    (row['video_id'], row['language']) for row in conn.execute(
+                        "SELECT video_id, language FROM signature_bands WHERE band = ? AND bucket = ?", (band, bucket)
+                    ) if row['video_id'] != video_id
+                )
+            for other_id, other_language in candidates:
+                row = conn.execute(
+                    "SELECT signature, duplicate_of FROM signatures WHERE video_id = ? AND language = ?",
+                    (other_id, other_language)
+                ).fetchone()
+                score = similarity(signature, _unpack(row['signature']))
+                if score >= self.threshold and score > best:
+                    # Point at the original, not at another copy of it
+                    duplicate_of, best = row['duplicate_of'] or other_id, score
+            conn.execute(
+                "INSERT INTO signatures (video_id, language, signature, duplicate_of, similarity) VALUES (?, ?, ?, ?, ?)",
+                (video_id, language, _pack(signature), duplicate_of, round(best, 4) if duplicate_of else None)
+            )
+            conn.executemany(
+                "INSERT INTO signature_bands (band, bucket, video_id, language) VALUES (?, ?, ?, ?)",
+                ((band, bucket, video_id, language) for band, bucket in enumerate(bands))
+            )
+
+        matched = self._matching_windows(conn, video_id, windows)
+        repeats = {}
+        for window, others in matched.items():
+            repeats[window] = len({other[0] for other in others})
+        conn.executemany(
+            "INSERT INTO windows (video_id, language, window, start, end, simhash, b0, b1, b2, repeats) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((video_id, language, window, start, end, _signed(value), *simhash_bands(value), repeats.get(window, 0))
+             for window, start, end, value in windows)
+        )
+        self._bump(conn, matched, 1)
+        return duplicate_of
+
+    @staticmethod
+    def _matching_windows(conn, video_id, windows):
+        """{window: {(video_id, language, window)}} of other videos' near-identical windows"""
+        by_band = [{} for _ in range(SIMHASH_BANDS)]
+        for window, _, _, value in windows:
+            for band, bucket in enumerate(simhash_bands(value)):
+                by_band[band].setdefault(bucket, []).append((window, value))
+        matched = {}
+        for band, buckets in enumerate(by_band):
+            keys = list(buckets)
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT video_id, language, window, simhash, b{band} AS bucket FROM windows "
+                    f"WHERE b{band} IN ({', '.join('?' * len(batch))}) AND video_id != ?", (*batch, video_id)
+                )
+                for row in rows:
+                    other = row['simhash'] & 0xFFFFFFFFFFFFFFFF
+                    for window, value in buckets[row['bucket']]:
+                        if (value ^ other).bit_count() <= MAX_DISTANCE:
+                            matched.setdefault(window, set()).add((row['video_id'], row['language'], row['window']))
+        return matched
+
+    @staticmethod
+    def _bump(conn, matched, amount):
+        """Count this video once in the repeats of every window of another video it matches"""
+        others = set().union(*matched.values()) if matched else set()
+        conn.executemany(
+            "UPDATE windows SET repeats = MAX(0, repeats + ?) WHERE video_id = ? AND language = ? AND window = ?",
+            ((amount, *other) for other in others)
+        )
+
+    def _remove(self, conn, video_id, language=None):
+        rows = conn.execute(
+            "SELECT language, window, start, end, simhash FROM windows "
+            "WHERE video_id = ? AND language = COALESCE(?, language)", (video_id, language)
+        ).fetchall()
+        windows = [(row['window'], row['start'], row['end'], row['simhash'] & 0xFFFFFFFFFFFFFFFF) for row in rows]
+        if windows:
+            self._bump(conn, self._matching_windows(conn, video_id, windows), -1)
+        for table in ('windows', 'signatures', 'signature_bands'):
+            conn.execute(f"DELETE FROM {table} WHERE video_id = ? AND language = COALESCE(?, language)",
+                         (video_id, language))
+        # Copies of a removed original are left as originals themselves
+        conn.execute("UPDATE signatures SET duplicate_of = NULL, similarity = NULL WHERE duplicate_of = ?",
+                     (video_id,))
+
+    def remove(self, video_id, language=None):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._remove(conn, video_id, language)
+
+    def clear(self):
+        with self._connect() as conn:
+            for table in ('windows', 'signatures', 'signature_bands'):
+                conn.execute(f"DELETE FROM {table}")
+
+    def duplicates(self, limit=100, offset=0):
+        rows = self._connect().execute(
+            "SELECT video_id, language, duplicate_of, similarity FROM signatures WHERE duplicate_of IS NOT NULL "
+            "ORDER BY video_id, language LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def duplicate_of(self, video_id, language=DEFAULT_LANGUAGE):
+        row = self._connect().execute(
+            "SELECT duplicate_of FROM signatures WHERE video_id = ? AND language = ?", (video_id, language)
+        ).fetchone()
+        return row['duplicate_of'] if row else None
+
+    def boilerplate(self, video_id, language=DEFAULT_LANGUAGE):
+        """Merged (start, end) time ranges of a transcript that recur in at least min_videos videos"""
+        rows = self._connect().execute(
+            "SELECT start, end FROM windows WHERE video_id = ? AND language = ? AND repeats >= ?",
+            (video_id, language, self.min_videos - 1)
+        ).fetchall()
+        return merge_ranges((row['start'], row['end']) for row in rows)
+
+    def marks(self):
+        """{(video_id, language): (duplicate_of, boilerplate ranges)} of every transcript with either"""
+        conn = self._connect()
+        marks = {}
+        for row in conn.execute("SELECT video_id, language, duplicate_of FROM signatures "
+                                "WHERE duplicate_of IS NOT NULL"):
+            marks[(row['video_id'], row['language'])] = (row['duplicate_of'], [])
+        ranges = {}
+        for row in conn.execute("SELECT video_id, language, start, end FROM windows WHERE repeats >= ?",
+                                (self.min_videos - 1,)):
+            ranges.setdefault((row['video_id'], row['language']), []).append((row['start'], row['end']))
+        for key, found in ranges.items():
+            marks[key] = (marks.get(key, (None, None))[0], merge_ranges(found))
+        return marks
+
+    def stats(self):
+        conn = self._connect()
+        return {
+            'transcripts': conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0],
+            'duplicates': conn.execute(
+                "SELECT COUNT(*) FROM signatures WHERE duplicate_of IS NOT NULL"
+            ).fetchone()[0],
+            'windows': conn.execute("SELECT COUNT(*) FROM windows").fetchone()[0],
+            'boilerplate_windows': conn.execute(
+                "SELECT COUNT(*) FROM windows WHERE repeats >= ?", (self.min_videos - 1,)
+            ).fetchone()[0],
+        }
+
+    def rebuild(self, output_dir, transcript_index):
+        """Index every transcript listed in transcript_index from its segment file, oldest first"""
+        from compact_store import load_transcript_file
+        self.clear()
+        indexed = 0
+        entries = sorted(transcript_index.iter_languages(), key=lambda entry: entry['scraped_at'])
+        for entry in entries:
+            try:
+                _, transcript = load_transcript_file(os.path.join(output_dir, entry['json_file']))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable transcript {entry['json_file']}: {str(e)}")
+                continue
+            self.add_transcript(entry['video_id'], transcript, entry['language'])
+            indexed += 1
+        logger.info(f"Rebuilt duplicate index with {indexed} transcripts")
+        return indexed
+
+
+class DedupStage:
+    """Checks saved transcripts for duplicates in a helper process, off the save path
+
+    submit() never waits, so the transcript writer and fetch workers hand a transcript
+    over and move on. A thread sends up to `batch_size` waiting transcripts at a time
+    to a `python dedup.py --serve` process, which hashes them and adds them to the
+    index. Hashing is pure Python, so in a thread of the scraping process it would hold
+    the GIL the fetch workers and writer need; the helper is started with subprocess
+    rather than multiprocessing, so it never re-imports the caller's main module.
+    While `max_pending` transcripts are already waiting, new ones are dropped and
+    counted in `dropped` rather than buffered without bound; `python dedup.py`
+    indexes every saved transcript again.
+    """
+
+    def __init__(self, index, batch_size=BATCH_SIZE, max_pending=MAX_PENDING):
+        self.index = index
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._process = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._submitted = 0
+        self._done = 0
+        self._done_changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='dedup', daemon=True)
+        self._thread.start()
+
+    def submit(self, video_id, transcript, language=DEFAULT_LANGUAGE):
+        with self._done_changed:
+            try:
+                self._queue.put_nowait((video_id, transcript, language))
+            except queue.Full:
+                self.dropped += 1
+                if self.dropped == 1:
+                    logger.warning("Duplicate checks are falling behind; skipping transcripts until they catch up")
+                return
+            self._submitted += 1
+
+    def flush(self):
+        """Wait until everything submitted before this call is indexed"""
+        with self._done_changed:
+            target = self._submitted
+            self._done_changed.wait_for(lambda: self._done >= target)
+
+    def close(self):
+        """Flush, then stop the thread and the helper process"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._process:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # This thread is the only consumer, so a non-empty queue never blocks it
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get()
+                if item is None:
+                    self._add(batch)
+                    return
+                batch.append(item)
+            self._add(batch)
+
+    def _helper(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--serve', self.index.db_path,
+                 str(self.index.threshold), str(self.index.min_videos)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+        return self._process
+
+    def _add(self, batch):
+        try:
+            helper = self._helper()
+            pickle.dump(batch, helper.stdin, pickle.HIGHEST_PROTOCOL)
+            helper.stdin.flush()
+            # Waiting on the pipe releases the GIL
+            if helper.stdout.readline() != b'ok\n':
+                raise OSError("the duplicate check process failed")
+        except (OSError, pickle.PickleError) as e:
+            # Saved and searchable already; a video missing here is only never flagged
+            logger.warning(f"Could not check {len(batch)} saved transcripts for duplicates: {str(e)}")
+            if self._process and self._process.poll() is None:
+                self._process.kill()
+        finally:
+            with self._done_changed:
+                self._done += len(batch)
+                self._done_changed.notify_all()
+
+
+def serve(db_path, threshold, min_videos, stdin, stdout):
+    """Helper side of DedupStage: index each pickled batch from stdin and answer on stdout"""
+    index = DedupIndex(db_path, threshold, min_videos)
+    while True:
+        try:
+            batch = pickle.load(stdin)
+        except EOFError:
+            return
+        try:
+            index.add_transcripts(batch)
+            stdout.write(b'ok\n')
+        except Exception as e:
+            logger.warning(f"Could not check {len(batch)} saved transcripts for duplicates: {str(e)}")
+            stdout.write(b'failed\n')
+        stdout.flush()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--serve']:
+        serve(sys.argv[2], float(sys.argv[3]), int(sys.argv[4]), sys.stdin.buffer, sys.stdout.buffer)
+        sys.exit(0)
+    from transcript_index import TranscriptIndex
+    logging.basicConfig(level=logging.INFO)
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else 'transcripts'
+    index = DedupIndex(dedup_path(output_dir))
+    index.rebuild(output_dir, TranscriptIndex.open(output_dir))
+    print(index.stats())
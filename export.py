@@ -0,0 +1,296 @@
+"""Bulk export of the transcript corpus to large JSONL and columnar shard files
+
+Analytics jobs read a few size-bounded shards instead of opening one file per
+transcript. Transcripts are ordered by (video_id, language) and cut into shards of
+about `shard_mb` MB; each shard is written as `{shard}.jsonl[.gz]` (one record per
+transcript, shaped like pipeline.transcript_record) and/or `{shard}.tcol` (one row
+per segment, see columnar.py) by a pool of worker processes. manifest.json lists
+every shard with its key range, counts, files and a fingerprint of its transcripts.
+
+A re-export keeps the previous shard boundaries and rewrites only shards whose
+transcripts were added, removed or re-scraped since; a shard that outgrew the size
+bound is split. full=True plans the shards from scratch.
+
+With dedup=True, transcripts that nearly duplicate an earlier video are left out and
+segments inside boilerplate (intros, outros, sponsor reads) are dropped, as marked by
+the duplicate index (see dedup.py).
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from compact_store import load_transcript_file
+from dedup import DedupIndex, strip_ranges
+from pipeline import ColumnarSink, JsonlSink, transcript_record
+from transcript_index import TranscriptIndex
+from transcript_writer import atomic_write
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'columnar')
+DEFAULT_SHARD_MB = 128
+MANIFEST = 'manifest.json'
+SHARD_PREFIX = 'shard-'
+EXPORTS_DIRNAME = '.exports'
+
+
+class ExportCancelled(Exception):
+    """Raised by export_corpus when asked to stop before every shard was written"""
+
+
+def export_path(output_dir, name):
+    """Directory of a named export of an output directory's transcripts, as served by the web app"""
+    return os.path.join(output_dir, EXPORTS_DIRNAME, name)
+
+
+def _key(entry):
+    return (entry['video_id'], entry['language'])
+
+
+def shard_name(first_key):
+    """File name stem of the shard starting at first_key; stable while its boundary is"""
+    return SHARD_PREFIX + hashlib.sha1('\t'.join(first_key).encode('utf-8')).hexdigest()[:12]
+
+
+def fingerprint(entries):
+    """Changes whenever a transcript of the shard is added, removed or saved again"""
+    digest = hashlib.sha1()
+    for entry in entries:
+        digest.update(f"{entry['video_id']}\t{entry['language']}\t{entry['scraped_at']}\t{entry['json_size']}"
+                      f"\t{entry.get('boilerplate') or ''}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _split(entries, shard_bytes, first_key=None):
+    """Cut sorted entries into runs of about shard_bytes (by segment file size); the first keeps first_key"""
+    shards = []
+    current, size = [], 0
+    for entry in entries:
+        if current and size + entry['json_size'] > shard_bytes:
+            shards.append(current)
+            current, size = [], 0
+        current.append(entry)
+        size += entry['json_size']
+    if current:
+        shards.append(current)
+    return [
+        (first_key if n == 0 and first_key is not None else _key(shard[0]), shard)
+        for n, shard in enumerate(shards)
+    ]
+
+
+def plan_shards(entries, shard_bytes, boundaries=None):
+    """[(first_key, entries)] for entries sorted by key
+
+    With the first keys of a previous export's shards, every entry goes to the shard
+    whose range holds it, so unchanged ranges keep their contents and names.
+    """
+    if not boundaries:
+        return _split(entries, shard_bytes)
+    boundaries = sorted(boundaries)
+    groups = [[] for _ in boundaries]
+    for entry in entries:
+        groups[max(0, bisect_right(boundaries, _key(entry)) - 1)].append(entry)
+    shards = []
+    for first_key, group in zip(boundaries, groups):
+        if group:
+            shards.extend(_split(group, shard_bytes, first_key))
+    return shards
+
+
+def _write_shard(output_dir, export_dir, name, entries, formats, compress):
+    """Write one shard's files from its transcripts' segment files; runs in a worker process"""
+    files = {}
+    jsonl_path = os.path.join(export_dir, f"{name}.jsonl{'.gz' if compress else ''}")
+    sinks = []
+    if 'jsonl' in formats:
+        jsonl_tmp = f"{jsonl_path}.{os.getpid()}.tmp"
+        sinks.append(JsonlSink(jsonl_tmp))
+    if 'columnar' in formats:
+        sinks.append(ColumnarSink(os.path.join(export_dir, f"{name}.tcol")))
+    segments = 0
+    written = 0
+    try:
+        for entry in entries:
+            try:
+                _, transcript = load_transcript_file(os.path.join(output_dir, entry['json_file']))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable transcript {entry['json_file']}: {str(e)}")
+                continue
+            transcript = strip_ranges(transcript, entry.get('boilerplate'))
+            record = transcript_record(
+                {'id': entry['video_id'], 'original_title': entry['title']}, entry['language'], transcript,
+                {'is_generated': entry['is_generated'], 'translated_from': entry['translated_from']},
+                entry['channel_url']
+            )
+            for sink in sinks:
+                sink.write(record)
+            segments += len(transcript)
+            written += 1
+    except BaseException:
+        for sink in sinks:
+            if isinstance(sink, ColumnarSink):
+                sink.writer.abort()
+            else:
+                sink.close()
+                os.remove(jsonl_tmp)
+        raise
+    for sink in sinks:
+        sink.close()
+    if 'jsonl' in formats:
+        os.replace(jsonl_tmp, jsonl_path)
+        files['jsonl'] = {'file': os.path.basename(jsonl_path), 'bytes': os.path.getsize(jsonl_path)}
+    if 'columnar' in formats:
+        path = os.path.join(export_dir, f"{name}.tcol")
+        files['columnar'] = {'file': os.path.basename(path), 'bytes': os.path.getsize(path)}
+    return {'transcripts': written, 'segments': segments, 'files': files}
+
+
+def load_manifest(export_dir):
+    try:
+        with open(os.path.join(export_dir, MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def select_entries(index, channel=None, language=None, since=None):
+    """Index rows of every saved language matching the filters, sorted by (video_id, language)"""
+    entries = [
+        entry for entry in index.iter_languages()
+        if (not channel or entry['channel_url'] == channel)
+        and (not language or entry['language'] == language)
+        and (not since or entry['scraped_at'] >= since)
+    ]
+    entries.sort(key=_key)
+    return entries
+
+
+def export_corpus(output_dir, export_dir, formats=FORMATS, shard_mb=DEFAULT_SHARD_MB, channel=None, language=None,
+                  since=None, compress=False, workers=None, full=False, dedup=False, progress_callback=None,
+                  stop=None):
+    """Export the transcripts matching the filters into shards under export_dir and return the manifest
+
+    The manifest's 'written' and 'kept' count the shards rewritten and left as they were.
+    With dedup, a shard is also rewritten when its transcripts' duplicate or boilerplate
+    marks change. progress_callback gets (written, to_write, shard, 'written') as each
+    shard is done. Once `stop` (a threading.Event) is set no more shards are started and
+    ExportCancelled is raised; the manifest is left as the previous export wrote it.
+    """
+    formats = tuple(fmt for fmt in FORMATS if fmt in formats)
+    if not formats:
+        raise ValueError(f"formats must include one of {', '.join(FORMATS)}")
+    os.makedirs(export_dir, exist_ok=True)
+    settings = {
+        'formats': list(formats),
+        'compress': compress,
+        'shard_mb': shard_mb,
+        'filters': {'channel': channel, 'language': language, 'since': since},
+    }
+    if dedup:
+        settings['dedup'] = True
+    previous = load_manifest(export_dir)
+    if full or previous is None or previous.get('settings') != settings:
+        previous = {'shards': []}
+    previous_shards = {shard['name']: shard for shard in previous['shards']}
+
+    entries = select_entries(TranscriptIndex.open(output_dir), channel, language, since)
+    if dedup:
+        marks = DedupIndex.open(output_dir).marks()
+        entries = [
+            {**entry, 'boilerplate': marks[_key(entry)][1]} if _key(entry) in marks else entry
+            for entry in entries
+            if marks.get(_key(entry), (None,))[0] is None
+        ]
+    plan = plan_shards(entries, shard_mb * 1024 * 1024,
+                       [tuple(shard['first_key']) for shard in previous['shards']])
+
+    shards = []
+    tasks = []
+    for first_key, shard_entries in plan:
+        name = shard_name(first_key)
+        shard = {
+            'name': name,
+            'first_key': list(first_key),
+            'last_key': list(_key(shard_entries[-1])),
+            'fingerprint': fingerprint(shard_entries),
+        }
+        old = previous_shards.get(name)
+        if old and old['fingerprint'] == shard['fingerprint'] and all(
+            os.path.exists(os.path.join(export_dir, file['file'])) for file in old['files'].values()
+        ):
+            shards.append({**old, **shard})
+            continue
+        shards.append(shard)
+        tasks.append((shard, shard_entries))
+
+    if tasks:
+        # Spawned workers: forking a process with running threads (the web app) is unsafe
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [
+                (shard, executor.submit(_write_shard, output_dir, export_dir, shard['name'], shard_entries,
+                                        formats, compress))
+                for shard, shard_entries in tasks
+            ]
+            for written, (shard, future) in enumerate(futures, 1):
+                if stop is not None and stop.is_set():
+                    for _, pending in futures:
+                        pending.cancel()
+                    raise ExportCancelled(f"Export to {export_dir} stopped after {written - 1} shards")
+                shard.update(future.result())
+                if progress_callback:
+                    progress_callback(written, len(futures), shard['name'], 'written')
+
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'settings': settings,
+        'transcripts': sum(shard['transcripts'] for shard in shards),
+        'segments': sum(shard['segments'] for shard in shards),
+        'bytes': sum(file['bytes'] for shard in shards for file in shard['files'].values()),
+        'shards': shards,
+    }
+    atomic_write(os.path.join(export_dir, MANIFEST),
+                 json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    # Shards that were split, emptied or renamed by a new plan
+    current = {file['file'] for shard in shards for file in shard['files'].values()}
+    for filename in os.listdir(export_dir):
+        if filename.startswith(SHARD_PREFIX) and filename not in current:
+            os.remove(os.path.join(export_dir, filename))
+
+    logger.info(f"Exported {manifest['transcripts']} transcripts in {len(shards)} shards "
+                f"({len(tasks)} written, {len(shards) - len(tasks)} unchanged)")
+    return {**manifest, 'written': len(tasks), 'kept': len(shards) - len(tasks)}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export transcripts to JSONL and columnar shard files")
+    parser.add_argument('output_dir', nargs='?', default='transcripts', help="transcripts directory")
+    parser.add_argument('--to', default='exports', help="directory for the shards and manifest")
+    parser.add_argument('--formats', default=','.join(FORMATS), help="comma-separated: jsonl, columnar")
+    parser.add_argument('--shard-mb', type=int, default=DEFAULT_SHARD_MB, help="approximate size of each shard")
+    parser.add_argument('--channel', help="only this channel URL")
+    parser.add_argument('--lang', help="only transcripts in this language")
+    parser.add_argument('--since', help="only transcripts scraped at or after this ISO timestamp")
+    parser.add_argument('--gzip', action='store_true', help="gzip the JSONL shards")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--full', action='store_true', help="re-plan and rewrite every shard")
+    parser.add_argument('--dedup', action='store_true', help="leave out near-duplicate videos and boilerplate segments")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = export_corpus(
+        args.output_dir, args.to, formats=args.formats.split(','), shard_mb=args.shard_mb, channel=args.channel,
+        language=args.lang, since=args.since, compress=args.gzip, workers=args.workers, full=args.full,
+        dedup=args.dedup
+    )
+    print(f"{result['transcripts']} transcripts, {result['segments']} segments in {len(result['shards'])} shards "
+          f"({result['written']} written, {result['kept']} unchanged), {result['bytes']} bytes")
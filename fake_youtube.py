@@ -0,0 +1,217 @@
+import asyncio
+import math
+import random
+import threading
+import time
+
+
+class FakeRateLimitError(Exception):
+    """Stand-in for a 429 Too Many Requests response"""
+    status_code = 429
+
+
+class FakeTranscriptsDisabled(Exception):
+    """Stand-in for a video that has no transcript"""
+    error_class = 'permanent'
+
+
+class FakeTranscriptBackend:
+    """Local, deterministic replacement for YouTubeTranscriptApi used in tests and benchmarks
+
+    Injects latency and errors so the scraper can be exercised without touching YouTube.
+    Pass an instance as `transcript_api` to YouTubeChannelScraper.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 timeout_rate=0.0, segments=50, seed=0, latency_sampler=None, available=(('en', False),),
+                 translation_languages=()):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.timeout_rate = timeout_rate
+        self.segments = segments
+        # (language code, is_generated) of every video's transcripts, for list()
+        self.available = tuple(available)
+        self.translation_languages = tuple(translation_languages)
+        # Optional callable(random.Random) -> seconds, e.g. a lognormal network model
+        self.latency_sampler = latency_sampler
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _begin(self, video_id):
+        """Pick the delay and outcome of one simulated request"""
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if self.latency_sampler:
+                delay = self.latency_sampler(self._random)
+            else:
+                delay = self.latency + (self._random.random() * 2 - 1) * self.jitter
+            roll = self._random.random()
+
+        error = None
+        if roll < self.throttle_rate:
+            error = FakeRateLimitError(f"429 Too Many Requests for {video_id}")
+        elif roll < self.throttle_rate + self.timeout_rate:
+            error = TimeoutError(f"Timed out fetching {video_id}")
+        elif roll < self.throttle_rate + self.timeout_rate + self.error_rate:
+            error = FakeTranscriptsDisabled(f"Transcripts are disabled for {video_id}")
+        return max(0.0, delay), error
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def get_transcript(self, video_id, languages=('en',)):
+        """Return a synthetic transcript after a simulated network delay"""
+        delay, error = self._begin(video_id)
+        try:
+            time.sleep(delay)
+        finally:
+            self._end()
+        if error:
+            raise error
+        return make_transcript(video_id, self.segments)
+
+    async def get_transcript_async(self, video_id, languages=('en',)):
+        """Coroutine version of get_transcript for the asyncio engine"""
+        delay, error = self._begin(video_id)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._end()
+        if error:
+            raise error
+        return make_transcript(video_id, self.segments)
+
+    def _transcript_list(self, video_id):
+        return [
+            FakeTranscript(self, video_id, code, is_generated, self.translation_languages)
+            for code, is_generated in self.available
+        ]
+
+    def list(self, video_id):
+        """A video's transcript list, as YouTubeTranscriptApi().list() returns it, after one simulated request"""
+        delay, error = self._begin(video_id)
+        try:
+            time.sleep(delay)
+        finally:
+            self._end()
+        if error:
+            raise error
+        return self._transcript_list(video_id)
+
+    async def list_async(self, video_id):
+        delay, error = self._begin(video_id)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._end()
+        if error:
+            raise error
+        return self._transcript_list(video_id)
+
+
+class FakeTranslationLanguage:
+    def __init__(self, language_code):
+        self.language = language_code
+        self.language_code = language_code
+
+
+class FakeTranscript:
+    """Stand-in for one entry of a transcript list; fetching it is another simulated request"""
+
+    def __init__(self, backend, video_id, language_code, is_generated, translation_languages=()):
+        self._backend = backend
+        self.video_id = video_id
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self.translation_languages = [FakeTranslationLanguage(code) for code in translation_languages]
+
+    @property
+    def is_translatable(self):
+        return bool(self.translation_languages)
+
+    def translate(self, language_code):
+        if language_code not in {lang.language_code for lang in self.translation_languages}:
+            raise ValueError(f"{self.video_id} cannot be translated to {language_code}")
+        return FakeTranscript(self._backend, self.video_id, language_code, True)
+
+    def fetch(self):
+        delay, _ = self._backend._begin(self.video_id)
+        try:
+            time.sleep(delay)
+        finally:
+            self._backend._end()
+        return make_transcript(self.video_id, self._backend.segments, self.language_code)
+
+    async def fetch_async(self):
+        delay, _ = self._backend._begin(self.video_id)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._backend._end()
+        return make_transcript(self.video_id, self._backend.segments, self.language_code)
+
+
+def lognormal_latency(median=0.2, sigma=0.6):
+    """Latency sampler with a long tail, resembling real-world HTTP round trips"""
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def make_transcript(video_id, segments=50, language='en'):
+    """Build a synthetic transcript in the youtube-transcript-api list-of-dicts shape"""
+    marker = "" if language == 'en' else f"[{language}] "
+    return [
+        {
+            'text': f"{marker}segment {n} of {video_id} lorem ipsum dolor sit amet",
+            'start': n * 4.0,
+            'duration': 4.0
+        }
+        for n in range(segments)
+    ]
+
+
+def make_videos(count, prefix="vid"):
+    """Build a synthetic video list in the shape returned by get_video_ids"""
+    return [
+        {
+            'id': f"{prefix}{n:07d}",
+            'title': f"Fake video {n}",
+            'original_title': f"Fake video #{n}"
+        }
+        for n in range(count)
+    ]
+
+
+class FakeChannel:
+    """Local stand-in for a channel's listing pages, in the shape iter_tab_entries yields
+
+    Each tab yields its videos `page_size` at a time, waiting `page_latency` seconds
+    before every page like a playlist continuation request. A tab with no videos
+    raises, as yt-dlp does for a channel without that tab. Assign `iter_tab_entries`
+    to a scraper instance to enumerate from it.
+    """
+
+    def __init__(self, videos=1000, shorts=0, streams=0, page_size=30, page_latency=0.0):
+        self.counts = {'videos': videos, 'shorts': shorts, 'streams': streams}
+        self.page_size = page_size
+        self.page_latency = page_latency
+        self.pages = 0
+
+    def iter_tab_entries(self, url):
+        tab = url.rstrip('/').rsplit('/', 1)[-1]
+        count = self.counts.get(tab, self.counts['videos'])
+        if not count:
+            raise ValueError(f"This channel does not have a {tab} tab")
+        videos = make_videos(count, prefix=tab[:3])
+        for offset in range(0, count, self.page_size):
+            self.pages += 1
+            time.sleep(self.page_latency)
+            yield from videos[offset:offset + self.page_size]
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from languages import DEFAULT_LANGUAGE
+from sqlite_store import SQLiteStore
+from transcript_index import INDEX_DIRNAME
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    data BLOB NOT NULL, -- zlib-compressed JSON list of segments
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (video_id, language)
+);
+"""
+
+
+def fetch_cache_path(output_dir):
+    """Location of the on-disk fetch cache for an output directory"""
+    return os.path.join(output_dir, INDEX_DIRNAME, 'fetch_cache.sqlite3')
+
+
+class TranscriptCache(SQLiteStore):
+    """Raw transcript segments keyed by (video ID, language), in two tiers
+
+    A byte-bounded in-memory LRU sits in front of an SQLite store that every worker
+    process pointing at the same output directory shares. Entries older than `ttl`
+    seconds are stale: get() misses on them so the caller refetches, but they remain
+    available with allow_stale=True for when that refetch fails.
+    """
+
+    SCHEMA = SCHEMA
+
+    def __init__(self, db_path, ttl=DEFAULT_TTL, memory_bytes=DEFAULT_MEMORY_BYTES):
+        super().__init__(db_path)
+        self.ttl = ttl
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'stores': 0}
+
+    @classmethod
+    def open(cls, output_dir):
+        """Process-wide cache for an output directory, so every scraper shares one memory tier"""
+        return cls.shared(
+            fetch_cache_path(output_dir),
+            ttl=float(os.environ.get('SCRAPER_FETCH_CACHE_TTL', DEFAULT_TTL)),
+            memory_bytes=int(float(os.environ.get('SCRAPER_FETCH_CACHE_MB', 64)) * 1024 * 1024)
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _remember(self, key, segments, fetched_at, size):
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old:
+                self._memory_size -= old[2]
+            if size > self.memory_bytes:
+                return
+            self._memory[key] = (segments, fetched_at, size)
+            self._memory_size += size
+            while self._memory_size > self.memory_bytes:
+                _, (_, _, evicted) = self._memory.popitem(last=False)
+                self._memory_size -= evicted
+                self.counters['evictions'] += 1
+
+    def get(self, video_id, language=DEFAULT_LANGUAGE, allow_stale=False):
+        """Cached segments, or None on a miss or (unless allow_stale) a stale entry"""
+        key = (video_id, language)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                self._memory.move_to_end(key)
+        if entry:
+            segments, fetched_at, _ = entry
+            if allow_stale or now - fetched_at < self.ttl:
+                self._count('memory_hits')
+                return segments
+
+        row = self._connect().execute(
+            "SELECT data, fetched_at FROM transcripts WHERE video_id = ? AND language = ?", key
+        ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        if not allow_stale and now - row['fetched_at'] >= self.ttl:
+            self._count('stale')
+            return None
+        raw = zlib.decompress(row['data'])
+        segments = json.loads(raw)
+        self._remember(key, segments, row['fetched_at'], len(raw))
+        self._count('disk_hits')
+        return segments
+
+    def put(self, video_id, segments, language=DEFAULT_LANGUAGE):
+        fetched_at = time.time()
+        raw = json.dumps(segments, ensure_ascii=False).encode('utf-8')
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, language, data, fetched_at) VALUES (?, ?, ?, ?)",
+                (video_id, language, zlib.compress(raw, 6), fetched_at)
+            )
+        self._remember((video_id, language), segments, fetched_at, len(raw))
+        self._count('stores')
+
+    def invalidate(self, video_id, language=DEFAULT_LANGUAGE):
+        with self._lock:
+            entry = self._memory.pop((video_id, language), None)
+            if entry:
+                self._memory_size -= entry[2]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM transcripts WHERE video_id = ? AND language = ?", (video_id, language))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        with self._connect() as conn:
+            conn.execute("DELETE FROM transcripts")
+
+    def stats(self):
+        """Hit/miss/eviction counters of this process plus the size of both tiers"""
+        disk_entries = self._connect().execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        with self._lock:
+            return {
+                **self.counters,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': disk_entries,
+            }
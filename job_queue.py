@@ -0,0 +1,381 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from languages import LanguagePreference
+from metrics import RUNNING_JOBS
+from progress_events import job_event
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    channel_url TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    current INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    current_video TEXT NOT NULL DEFAULT '',
+    message TEXT NOT NULL DEFAULT '',
+    results TEXT,
+    owner TEXT,
+    lease_expires REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+"""
+
+
+class JobStore(SQLiteStore):
+    """SQLite-backed job table shared by every worker process that points at the same file"""
+
+    SCHEMA = SCHEMA
+
+    def _to_dict(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['results'] = json.loads(job['results']) if job['results'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        job['active'] = job['status'] in ACTIVE_STATUSES
+        return job
+
+    def create(self, channel_url, params, exclusive=False):
+        """Queue a new job and return it
+
+        With exclusive=True nothing is queued and None is returned while another job for
+        the same channel_url is queued or running.
+        """
+        now = datetime.now().isoformat()
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if exclusive and conn.execute(
+                f"SELECT 1 FROM jobs WHERE channel_url = ? AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))})",
+                (channel_url, *ACTIVE_STATUSES)
+            ).fetchone():
+                return None
+            conn.execute(
+                "INSERT INTO jobs (id, channel_url, params, status, message, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', 'Waiting for a free worker...', ?, ?)",
+                (job_id, channel_url, json.dumps(params), now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def list(self, limit=100):
+        rows = self._connect().execute(
+            "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def latest(self):
+        jobs = self.list(limit=1)
+        return jobs[0] if jobs else None
+
+    def updated_since(self, since):
+        """Jobs whose updated_at is at or after `since`, oldest change first"""
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE updated_at >= ? ORDER BY updated_at", (since,)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def last_update(self):
+        return self._connect().execute("SELECT MAX(updated_at) FROM jobs").fetchone()[0]
+
+    def claim(self, owner, lease_seconds, max_running):
+        """Atomically take the oldest queued job, or a running job whose lease ran out
+
+        Returns None when nothing is claimable or `max_running` jobs already hold live leases.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'running' AND lease_expires >= ?", (now,)
+            ).fetchone()[0]
+            row = None
+            if running < max_running:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' "
+                    "OR (status = 'running' AND lease_expires < ?) "
+                    "ORDER BY created_at LIMIT 1", (now,)
+                ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (owner, now + lease_seconds, datetime.now().isoformat(), row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row['id']) if row else None
+
+    def renew(self, job_id, owner, lease_seconds):
+        """Extend the lease on a job this owner is running"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, owner)
+            )
+
+    def update(self, job_id, **fields):
+        """Update progress fields of a job"""
+        if 'results' in fields:
+            fields['results'] = json.dumps(fields['results']) if fields['results'] is not None else None
+        fields['updated_at'] = datetime.now().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def cancel(self, job_id):
+        """Cancel a queued job immediately, or flag a running one for its owner to stop"""
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', message = 'Cancelled', lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'", (now, job_id)
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, message = 'Cancelling...', updated_at = ? "
+                "WHERE id = ? AND status = 'running'", (now, job_id)
+            )
+        return self.get(job_id)
+
+
+class JobManager:
+    """Claims jobs from a JobStore and runs them on an AsyncScrapeRunner loop
+
+    Leases are renewed while a job runs, so jobs left behind by a crashed or restarted
+    process are picked up again once their lease expires. With a WorkQueue, a
+    single-channel job only lists the channel and queues its videos, and this process
+    also runs a VideoWorker that fetches queued videos of any replica's jobs. Jobs whose
+    params hold 'export' write a bulk export (see export.py) instead of scraping.
+    """
+
+    def __init__(self, store, runner, max_concurrent_jobs=2, lease_seconds=60, poll_interval=1.0,
+                 output_dir="transcripts", scraper_factory=None, broker=None, work_queue=None, worker_slots=10):
+        self.store = store
+        self.runner = runner
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.output_dir = output_dir
+        self.scraper_factory = scraper_factory
+        self.broker = broker
+        self.work_queue = work_queue
+        self.worker_slots = worker_slots
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.tasks = {}
+        self._supervisor = None
+
+    def start(self):
+        """Start polling for jobs on the runner's loop"""
+        if self._supervisor is None:
+            self._supervisor = self.runner.submit(self._supervise())
+            if self.work_queue is not None:
+                from work_queue import VideoWorker
+                worker = VideoWorker(self.work_queue, self.output_dir, slots=self.worker_slots,
+                                     lease_seconds=self.lease_seconds, poll_interval=self.poll_interval,
+                                     scraper_factory=self.scraper_factory, owner=self.owner)
+                self.runner.submit(worker.run())
+
+    def _update(self, job_id, video_status=None, **fields):
+        """Write job progress and push it to progress stream subscribers"""
+        self.store.update(job_id, **fields)
+        if self.broker:
+            self.broker.publish(job_event(self.store.get(job_id), video_status))
+
+    def _make_scraper(self, job):
+        if self.scraper_factory:
+            return self.scraper_factory(job)
+        from async_scraper import AsyncYouTubeChannelScraper
+        return AsyncYouTubeChannelScraper(
+            job['channel_url'], self.output_dir, max_in_flight=job['params'].get('max_workers', 1),
+            languages=LanguagePreference.from_params(job['params'])
+        )
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run a JobStore call on the loop's executor so a slow or locked SQLite file never stalls the loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _supervise(self):
+        while True:
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"Job supervisor error: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _tick(self):
+        for job_id, task in list(self.tasks.items()):
+            job = await self._run_blocking(self.store.get, job_id)
+            if job and job['cancel_requested'] and not task.done():
+                task.cancel()
+            else:
+                await self._run_blocking(self.store.renew, job_id, self.owner, self.lease_seconds)
+
+        while len(self.tasks) < self.max_concurrent_jobs:
+            job = await self._run_blocking(self.store.claim, self.owner, self.lease_seconds, self.max_concurrent_jobs)
+            if job is None:
+                break
+            logger.info(f"Starting job {job['id']} for {job['channel_url']}")
+            task = asyncio.get_running_loop().create_task(self._run(job))
+            self.tasks[job['id']] = task
+            task.add_done_callback(lambda _, job_id=job['id']: self.tasks.pop(job_id, None))
+
+    async def _export(self, job_id, params):
+        """Write an export job's shards on the loop's executor and return a summary of its manifest
+
+        Cancelling lets the shards being written finish, so a new export to the same
+        directory never overlaps this one.
+        """
+        from export import export_corpus, export_path
+
+        def progress_callback(current, total, shard, status):
+            self._update(job_id, current=current, total=total, current_video=shard, message="Writing shards")
+
+        stop = threading.Event()
+        export = asyncio.ensure_future(self._run_blocking(
+            export_corpus, self.output_dir, export_path(self.output_dir, params['name']),
+            formats=params['formats'],
+            shard_mb=params['shard_mb'],
+            channel=params.get('channel'),
+            language=params.get('lang'),
+            since=params.get('since'),
+            compress=params.get('gzip', False),
+            workers=int(os.environ.get('SCRAPER_EXPORT_WORKERS', 0)) or None,
+            full=params.get('full', False),
+            dedup=params.get('dedup', False),
+            progress_callback=progress_callback,
+            stop=stop
+        ))
+        try:
+            manifest = await asyncio.shield(export)
+        except asyncio.CancelledError:
+            stop.set()
+            await asyncio.gather(export, return_exceptions=True)
+            raise
+        return {
+            'message': f"Exported {manifest['transcripts']} transcripts in {len(manifest['shards'])} shards "
+                       f"({manifest['written']} written, {manifest['kept']} unchanged)",
+            'name': params['name'],
+            'transcripts': manifest['transcripts'],
+            'segments': manifest['segments'],
+            'bytes': manifest['bytes'],
+            'shards': len(manifest['shards']),
+            'written': manifest['written'],
+            'kept': manifest['kept']
+        }
+
+    async def _run(self, job):
+        job_id = job['id']
+        params = job['params']
+
+        def progress_callback(current, total, video_title, status):
+            self._update(job_id, video_status=status, current=current, total=total, current_video=video_title,
+                         message=f"Processing videos ({status})")
+
+        RUNNING_JOBS.inc()
+        try:
+            if params.get('export'):
+                await self._run_blocking(self._update, job_id, message='Planning export shards...')
+                results = await self._export(job_id, params['export'])
+            elif params.get('channels'):
+                await self._run_blocking(self._update, job_id, message='Extracting video information...')
+                from batch import scrape_batch_async
+                results = await scrape_batch_async(
+                    params['channels'],
+                    self.output_dir,
+                    max_in_flight=params.get('max_workers', 1),
+                    max_videos=params.get('max_videos'),
+                    include_timestamps=params.get('include_timestamps', False),
+                    progress_callback=progress_callback,
+                    requests_per_second=params.get('requests_per_second', 1.0),
+                    incremental=params.get('incremental', False),
+                    languages=LanguagePreference.from_params(params)
+                )
+            elif self.work_queue is not None:
+                await self._run_blocking(self._update, job_id, message='Extracting video information...')
+                scraper = self._make_scraper(job)
+                results = await scraper.scrape_distributed_async(
+                    self.work_queue,
+                    job_id,
+                    max_videos=params.get('max_videos'),
+                    include_timestamps=params.get('include_timestamps', False),
+                    progress_callback=progress_callback,
+                    requests_per_second=params.get('requests_per_second', 1.0),
+                    incremental=params.get('incremental', False),
+                    poll_interval=self.poll_interval
+                )
+            else:
+                await self._run_blocking(self._update, job_id, message='Extracting video information...')
+                scraper = self._make_scraper(job)
+                results = await scraper.scrape_all_transcripts_async(
+                    max_videos=params.get('max_videos'),
+                    include_timestamps=params.get('include_timestamps', False),
+                    progress_callback=progress_callback,
+                    requests_per_second=params.get('requests_per_second', 1.0),
+                    incremental=params.get('incremental', False)
+                )
+            await self._run_blocking(self._update, job_id, status='completed', message=results['message'],
+                                     results=results, lease_expires=None)
+        except asyncio.CancelledError:
+            await self._run_blocking(self._update, job_id, status='cancelled', message='Cancelled',
+                                     lease_expires=None)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await self._run_blocking(self._update, job_id, status='error', message=f'Error: {str(e)}',
+                                     results=None, lease_expires=None)
+        finally:
+            RUNNING_JOBS.dec()
+            if self.work_queue is not None:
+                await self._run_blocking(self.work_queue.remove, job_id)
+
+
+if __name__ == '__main__':
+    import argparse
+    from async_scraper import AsyncScrapeRunner
+    from work_queue import WorkQueue, work_queue_path
+
+    parser = argparse.ArgumentParser(description="Run queued scrape jobs for web processes with SCRAPER_RUN_JOBS=0")
+    parser.add_argument('--output-dir', default='transcripts')
+    parser.add_argument('--data-dir', default=os.environ.get('SCRAPER_DATA_DIR', 'data'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    distributed = os.environ.get('SCRAPER_DISTRIBUTED') == '1'
+    JobManager(
+        JobStore(os.path.join(args.data_dir, 'jobs.sqlite3')),
+        AsyncScrapeRunner(blocking_workers=int(os.environ.get('SCRAPER_BLOCKING_WORKERS', 32))),
+        max_concurrent_jobs=int(os.environ.get('SCRAPER_MAX_JOBS', 2)),
+        output_dir=args.output_dir,
+        work_queue=WorkQueue(work_queue_path(args.data_dir)) if distributed else None,
+        worker_slots=int(os.environ.get('SCRAPER_WORKER_SLOTS', 10))
+    ).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
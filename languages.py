@@ -0,0 +1,119 @@
+"""Which of a video's transcripts to fetch: language order, manual or generated, translation
+
+Works on the transcript list youtube-transcript-api returns for a video (one request),
+so every language a job wants is chosen from a single listing.
+"""
+DEFAULT_LANGUAGE = 'en'
+
+PREFERENCES = ('manual', 'generated', 'manual_only', 'generated_only')
+
+
+class NoMatchingTranscript(Exception):
+    """None of a video's transcripts is in, or translatable to, a requested language"""
+    error_class = 'permanent'
+
+
+def _primary(code):
+    return code.split('-', 1)[0].lower()
+
+
+def raw_segments(fetched):
+    """List of segment dicts from whatever a transcript's fetch() returned"""
+    to_raw_data = getattr(fetched, 'to_raw_data', None)
+    return to_raw_data() if to_raw_data else list(fetched)
+
+
+class LanguagePreference:
+    """Languages to fetch for each video, most wanted first
+
+    prefer='manual' takes a manually created transcript over an auto-generated one in
+    the same language and 'generated' the reverse; 'manual_only' and 'generated_only'
+    ignore the other kind. A requested language also matches its regional variants
+    ('en' takes 'en-GB'). With translate=True a language that has no transcript is
+    machine-translated from the best transcript that allows it. Only the first
+    available language is fetched unless all_languages=True.
+    """
+
+    def __init__(self, languages=(DEFAULT_LANGUAGE,), prefer='manual', translate=False, all_languages=False):
+        if isinstance(languages, str):
+            languages = languages.split(',')
+        languages = [code.strip() for code in languages if code and code.strip()]
+        if not languages:
+            raise ValueError("At least one language is required")
+        if prefer not in PREFERENCES:
+            raise ValueError(f"prefer must be one of {', '.join(PREFERENCES)}")
+        self.languages = tuple(dict.fromkeys(languages))
+        self.prefer = prefer
+        self.translate = translate
+        self.all_languages = all_languages
+
+    @classmethod
+    def from_params(cls, params):
+        """Preference from job or request parameters; missing keys keep the defaults"""
+        return cls(
+            params.get('languages') or (DEFAULT_LANGUAGE,),
+            params.get('prefer') or 'manual',
+            bool(params.get('translate')),
+            bool(params.get('all_languages'))
+        )
+
+    def to_params(self):
+        return {
+            'languages': list(self.languages),
+            'prefer': self.prefer,
+            'translate': self.translate,
+            'all_languages': self.all_languages,
+        }
+
+    def is_satisfied(self, saved):
+        """Whether the languages already saved for a video leave nothing to fetch"""
+        if self.all_languages:
+            return all(code in saved for code in self.languages)
+        return any(code in saved for code in self.languages)
+
+    def _ranked(self, transcripts):
+        if self.prefer == 'manual_only':
+            transcripts = [t for t in transcripts if not t.is_generated]
+        elif self.prefer == 'generated_only':
+            transcripts = [t for t in transcripts if t.is_generated]
+        generated_first = self.prefer.startswith('generated')
+        return sorted(transcripts, key=lambda t: t.is_generated != generated_first)
+
+    @staticmethod
+    def _find(ranked, code):
+        """Best transcript in `code` or a regional variant; the preferred kind wins over an exact code"""
+        matches = [t for t in ranked if _primary(t.language_code) == _primary(code)]
+        if not matches:
+            return None
+        kind = matches[0].is_generated
+        return next((t for t in matches if t.is_generated == kind and t.language_code == code), matches[0])
+
+    def select(self, transcripts):
+        """[(language, transcript, info)] to fetch from a video's transcript list
+
+        `language` is the requested code the transcript is saved under; info records
+        whether it was generated and, for translations, the source language.
+        """
+        ranked = self._ranked(list(transcripts))
+        picks = []
+        for code in self.languages:
+            transcript = self._find(ranked, code)
+            if transcript is not None:
+                info = {'is_generated': transcript.is_generated, 'translated_from': None}
+            elif self.translate:
+                source = next((
+                    t for t in ranked
+                    if t.is_translatable and code in {lang.language_code for lang in t.translation_languages}
+                ), None)
+                if source is None:
+                    continue
+                transcript = source.translate(code)
+                info = {'is_generated': True, 'translated_from': source.language_code}
+            else:
+                continue
+            picks.append((code, transcript, info))
+            if not self.all_languages:
+                break
+        if not picks:
+            raise NoMatchingTranscript(f"No transcript in {', '.join(self.languages)}")
+        return picks
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# Outcomes that leave a video to be tried again on the next sync; dead-lettered ones are not
+RETRY_STATUSES = ("failed", "deferred")
+
+
+def channel_key(channel_url):
+    """Stable file-name-safe key for a channel URL"""
+    normalized = channel_url.strip().rstrip('/')
+    if normalized.endswith('/videos'):
+        normalized = normalized[:-len('/videos')]
+    return hashlib.sha1(normalized.lower().encode('utf-8')).hexdigest()[:16]
+
+
+class ChannelManifest:
+    """Per-channel record of video IDs already synced, newest upload first
+
+    Videos whose transcript fetch failed or was deferred are still known (so enumeration
+    can stop at them) but are kept in `failed` and handed back for retry on the next sync.
+    """
+
+    def __init__(self, manifest_dir, channel_url):
+        self.channel_url = channel_url
+        self.path = os.path.join(manifest_dir, f"{channel_key(channel_url)}.json")
+        self.video_ids = []
+        self.failed = {}
+        self.updated_at = None
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.video_ids = data.get('video_ids', [])
+            self.failed = data.get('failed', {})
+            self.updated_at = data.get('updated_at')
+        self._known = set(self.video_ids)
+
+    def __contains__(self, video_id):
+        return video_id in self._known
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def record(self, videos, statuses):
+        """Add newly synced videos (given newest first) ahead of the known ones and persist"""
+        new_ids = [video['id'] for video in videos if video['id'] not in self._known]
+        self.video_ids = new_ids + self.video_ids
+        self._known.update(new_ids)
+        for video in videos:
+            if statuses.get(video['id']) in RETRY_STATUSES:
+                self.failed[video['id']] = video
+            else:
+                self.failed.pop(video['id'], None)
+        self.updated_at = datetime.now().isoformat()
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'channel_url': self.channel_url,
+                'updated_at': self.updated_at,
+                'video_ids': self.video_ids,
+                'failed': self.failed
+            }, f)
+        os.replace(tmp_path, self.path)
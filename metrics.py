@@ -0,0 +1,194 @@
+"""Process-wide scrape metrics in the Prometheus text exposition format
+
+Each worker process keeps its own values; scrape every worker (or run one) to get
+totals. JobMetrics records the same events for a single scrape and summarises them
+for the job's results.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if not self.labelnames and self.kind != 'histogram':
+            # Unlabelled series are exposed as 0 before their first update
+            self._values[()] = 0
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name + _labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name} {_number(value)}" for name, value in self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((
+                    f"{self.name}_bucket" + _labels(self.labelnames + ('le',), key + (le,)), cumulative
+                ))
+            samples.append((f"{self.name}_sum" + _labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count" + _labels(self.labelnames, key), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    'scraper_stage_seconds', 'Time spent per pipeline stage: enumerate (per channel), fetch (per request), '
+    'save (per video, encoding and queueing), write (per batch of files from the background writer)', ('stage',)
+)
+BYTES_WRITTEN = Counter('scraper_bytes_written_total', 'Bytes of transcript data written to disk')
+CACHE_LOOKUPS = Counter('scraper_fetch_cache_lookups_total', 'Fetch cache lookups before a transcript fetch',
+                        ('result',))
+CHANNEL_CACHE_LOOKUPS = Counter('scraper_channel_cache_lookups_total',
+                                'Channel listing cache lookups before enumerating a channel', ('result',))
+RETRIES = Counter('scraper_retries_total', 'Transcript fetch retries, by error class', ('error_class',))
+FETCH_ERRORS = Counter('scraper_fetch_errors_total', 'Failed transcript requests, by error class', ('error_class',))
+VIDEOS = Counter('scraper_videos_total', 'Videos processed, by outcome', ('status',))
+QUEUE_DEPTH = Gauge('scraper_queue_depth', 'Videos listed and waiting for a fetch worker')
+ACTIVE_WORKERS = Gauge('scraper_active_workers', 'Fetch workers currently processing a video')
+RUNNING_JOBS = Gauge('scraper_running_jobs', 'Scrape jobs running in this process')
+
+
+class JobMetrics:
+    """The events of one scrape, recorded both process-wide and in a per-job summary"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._stages = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        with self._lock:
+            count, total, longest = self._stages.get(stage, (0, 0.0, 0.0))
+            self._stages[stage] = (count + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - start)
+
+    def count(self, metric, amount=1, **labels):
+        """Increment a process-wide counter and the matching entry of this job's summary"""
+        metric.inc(amount, **labels)
+        key = metric.name[len('scraper_'):].rsplit('_total', 1)[0]
+        with self._lock:
+            if labels:
+                values = self._counts.setdefault(key, {})
+                label = next(iter(labels.values()))
+                values[label] = values.get(label, 0) + amount
+            else:
+                self._counts[key] = self._counts.get(key, 0) + amount
+
+    def summary(self):
+        with self._lock:
+            stages = {
+                stage: {'count': count, 'total_seconds': round(total, 3),
+                        'mean_seconds': round(total / count, 4), 'max_seconds': round(longest, 4)}
+                for stage, (count, total, longest) in self._stages.items()
+            }
+            counts = {key: dict(value) if isinstance(value, dict) else value for key, value in self._counts.items()}
+        return {'elapsed_seconds': round(time.monotonic() - self.started, 3), 'stages': stages, **counts}
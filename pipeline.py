@@ -0,0 +1,154 @@
+"""Transcripts as a stream of records for library users, with pluggable sinks
+
+YouTubeChannelScraper.iter_transcripts() and AsyncYouTubeChannelScraper.
+iter_transcripts_async() yield one record per fetched transcript as soon as it
+arrives, so downstream jobs (embedding, indexing) consume transcripts directly
+instead of re-reading them from disk. Fetching stays only a bounded number of
+records ahead of the consumer, so memory does not grow with the channel.
+
+    from pipeline import iter_transcripts, JsonlSink, ColumnarSink, drain
+
+    with JsonlSink('out.jsonl') as jsonl, ColumnarSink('segments.tcol') as table:
+        drain(iter_transcripts('https://www.youtube.com/@channel', max_workers=8), jsonl, table)
+
+A record is a dict: video_id, title, channel_url, language, is_generated,
+translated_from, upload_date, duration and segments (the list of
+{'text', 'start', 'duration'} dicts).
+"""
+import gzip
+import json
+
+from columnar import ColumnarWriter, ROW_GROUP_SIZE
+
+# One row per segment, with its video's fields repeated
+SEGMENT_COLUMNS = (
+    ('video_id', 'str'),
+    ('language', 'str'),
+    ('title', 'str'),
+    ('channel_url', 'str'),
+    ('segment', 'i64'),
+    ('start', 'f64'),
+    ('duration', 'f32'),
+    ('text', 'str'),
+)
+
+
+def transcript_record(video, language, segments, info=None, channel_url=None):
+    """Record for one language of a video as iter_transcripts yields it"""
+    info = info or {}
+    return {
+        'video_id': video['id'],
+        'title': video.get('original_title') or video.get('title'),
+        'channel_url': channel_url,
+        'language': language,
+        'is_generated': info.get('is_generated'),
+        'translated_from': info.get('translated_from'),
+        'upload_date': video.get('upload_date'),
+        'duration': video.get('duration'),
+        'segments': segments,
+    }
+
+
+def segment_rows(record):
+    """Rows of SEGMENT_COLUMNS for a record"""
+    for n, segment in enumerate(record['segments']):
+        yield {
+            'video_id': record['video_id'],
+            'language': record['language'],
+            'title': record['title'],
+            'channel_url': record['channel_url'],
+            'segment': n,
+            'start': segment['start'],
+            'duration': segment.get('duration', 0.0),
+            'text': segment['text'],
+        }
+
+
+class Sink:
+    """A pipeline stage that consumes records; use as a context manager or call close()"""
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlSink(Sink):
+    """One JSON record per line; a path ending in .gz is gzip-compressed"""
+
+    def __init__(self, path):
+        self.path = path
+        if path.endswith('.gz'):
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+        self.records = 0
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write('\n')
+        self.records += 1
+
+    def close(self):
+        self._file.close()
+
+
+class ColumnarSink(Sink):
+    """One row per segment in a columnar table file (see columnar.py)"""
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE):
+        self.writer = ColumnarWriter(path, SEGMENT_COLUMNS, row_group_size)
+        self.records = 0
+
+    def write(self, record):
+        self.writer.write_rows(segment_rows(record))
+        self.records += 1
+
+    def close(self):
+        self.writer.close()
+
+
+class CallbackSink(Sink):
+    """Passes every record to a function, e.g. one that embeds or indexes it"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.records = 0
+
+    def write(self, record):
+        self.callback(record)
+        self.records += 1
+
+
+def drain(records, *sinks):
+    """Send every record to each sink in turn and return how many there were"""
+    count = 0
+    for record in records:
+        for sink in sinks:
+            sink.write(record)
+        count += 1
+    return count
+
+
+async def drain_async(records, *sinks):
+    """drain() for the async iterator of iter_transcripts_async"""
+    count = 0
+    async for record in records:
+        for sink in sinks:
+            sink.write(record)
+        count += 1
+    return count
+
+
+def iter_transcripts(channel_url, output_dir="transcripts", transcript_api=None, languages=None, **kwargs):
+    """Records for a channel's transcripts from a new YouTubeChannelScraper, see its iter_transcripts()"""
+    from scraper import YouTubeChannelScraper
+    scraper = YouTubeChannelScraper(channel_url, output_dir, transcript_api, languages=languages)
+    return scraper.iter_transcripts(**kwargs)
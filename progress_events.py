@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15
+KEEPALIVE = b": keepalive\n\n"
+WATCH_INTERVAL = 1.0
+LATEST_SIZE = 1024
+
+# Job fields a progress event carries; results are only sent once the job finishes
+EVENT_FIELDS = ('id', 'status', 'active', 'current', 'total', 'current_video', 'message')
+
+
+def job_event(job, video_status=None):
+    """Slim progress event for a job dict as returned by JobStore"""
+    event = {name: job[name] for name in EVENT_FIELDS}
+    if video_status:
+        event['video_status'] = video_status
+    if not job['active']:
+        event['results'] = job['results']
+    return event
+
+
+def format_sse(event, name='progress'):
+    """Encode one event in the text/event-stream wire format"""
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n".encode('utf-8')
+
+
+class Subscription:
+    """One subscriber's pending events, coalesced to the newest event per job
+
+    A subscriber that keeps up sees every per-video event. One that falls behind only
+    gets the latest state of each job when it next reads, so a slow client never makes
+    the publisher queue work. Waiting works from a thread or, when created with a loop,
+    from a coroutine on that loop without tying up a thread.
+    """
+
+    def __init__(self, broker, job_id=None, loop=None):
+        self.broker = broker
+        self.job_id = job_id
+        self.loop = loop
+        self.coalesced = 0
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event() if loop else threading.Event()
+
+    def push(self, event):
+        if self.job_id is not None and event['id'] != self.job_id:
+            return
+        with self._lock:
+            if event['id'] in self._pending:
+                self.coalesced += 1
+            self._pending[event['id']] = event
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        else:
+            self._ready.set()
+
+    def drain(self):
+        with self._lock:
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._ready.clear()
+        return events
+
+    def get(self, timeout=None):
+        """Block until events are pending (or timeout) and return them, oldest job first"""
+        self._ready.wait(timeout)
+        return self.drain()
+
+    async def get_async(self, timeout=None):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.drain()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ProgressBroker:
+    """In-process fan-out of job progress events to any number of subscribers
+
+    Publishing is O(subscribers) with no per-subscriber queue or thread. An event that
+    repeats the last published state of its job is dropped, so the store watcher and
+    the in-process progress callback can both feed the broker.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id=None, loop=None):
+        subscription = Subscription(self, job_id, loop)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        state = tuple(event[name] for name in EVENT_FIELDS)
+        with self._lock:
+            if self._latest.get(event['id']) == state:
+                return
+            self._latest[event['id']] = state
+            self._latest.move_to_end(event['id'])
+            if len(self._latest) > LATEST_SIZE:
+                self._latest.popitem(last=False)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+
+    async def watch_store(self, store, interval=WATCH_INTERVAL):
+        """Publish changes to jobs run by other processes sharing the same job store
+
+        Jobs run in this process publish directly; this picks up the rest from the
+        store's updated_at column, once per process rather than once per subscriber.
+        """
+        since = None
+        while True:
+            try:
+                if not self.subscriber_count():
+                    since = None
+                elif since is None:
+                    since = store.last_update() or ''
+                else:
+                    for job in store.updated_since(since):
+                        self.publish(job_event(job))
+                        since = max(since, job['updated_at'])
+            except Exception as e:
+                logger.error(f"Progress watcher error: {str(e)}")
+            await asyncio.sleep(interval)
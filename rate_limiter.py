@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all fetch workers"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def set_rate(self, rate):
+        """Change the refill rate, keeping the tokens accumulated so far"""
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def drain(self):
+        """Discard any accumulated burst allowance"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0)
+
+    def try_acquire(self, tokens=1):
+        """Consume `tokens` if available; otherwise return how long to wait before retrying"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then consume them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            self._sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """Wait on the event loop until `tokens` are available, then consume them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate follows AIMD: additive increase, multiplicative decrease"""
+
+    def __init__(self, rate=1.0, min_rate=0.1, max_rate=None, increase=0.05, decrease=0.5,
+                 capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate * 4
+        self.increase = increase
+        self.decrease = decrease
+        self.bucket = TokenBucket(rate, capacity=capacity, clock=clock, sleep=sleep)
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def acquire(self):
+        """Wait for permission to issue one request"""
+        self.bucket.acquire()
+
+    async def acquire_async(self):
+        """Wait for permission to issue one request without blocking the event loop"""
+        await self.bucket.acquire_async()
+
+    def on_success(self):
+        """Grow the rate a little after a request went through"""
+        with self._lock:
+            new_rate = min(self.max_rate, self.bucket.rate + self.increase)
+            if new_rate != self.bucket.rate:
+                self.bucket.set_rate(new_rate)
+
+    def on_throttle(self):
+        """Back off sharply after a 429 or timeout"""
+        with self._lock:
+            new_rate = max(self.min_rate, self.bucket.rate * self.decrease)
+            if new_rate != self.bucket.rate:
+                logger.warning(f"Throttled, reducing request rate to {new_rate:.2f}/s")
+                self.bucket.set_rate(new_rate)
+                # Drop any burst allowance so the slowdown takes effect immediately
+                self.bucket.drain()
@@ -0,0 +1,187 @@
+"""Render transcripts from the segment store on demand
+
+The JSON/compact segment file is the only copy saved at scrape time; plain text,
+SubRip, WebVTT and Markdown are produced from it when asked for.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from compact_store import load_transcript_file
+
+FORMATS = {
+    'txt': ('text/plain; charset=utf-8', '.txt'),
+    'srt': ('application/x-subrip; charset=utf-8', '.srt'),
+    'vtt': ('text/vtt; charset=utf-8', '.vtt'),
+    'md': ('text/markdown; charset=utf-8', '.md'),
+}
+
+RENDER_CACHE_BYTES = 32 * 1024 * 1024
+
+# Markdown starts a new paragraph after this many seconds of speech
+PARAGRAPH_SECONDS = 60
+
+
+def _clock(seconds, separator=None):
+    """HH:MM:SS, or HH:MM:SS<separator>mmm for subtitle cues"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    if separator is None:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _cues(segments):
+    """(start, end, text) per segment; a segment without a duration ends where the next begins"""
+    for i, entry in enumerate(segments):
+        start = entry['start']
+        end = start + (entry.get('duration') or 0.0)
+        if end <= start:
+            end = segments[i + 1]['start'] if i + 1 < len(segments) else start + 2.0
+        yield start, end, entry['text']
+
+
+def _watch_url(metadata):
+    return metadata.get('url') or f"https://www.youtube.com/watch?v={metadata.get('video_id', '')}"
+
+
+def render_txt(metadata, segments, timestamps=False):
+    scraped_at = metadata.get('scraped_at')
+    scraped = datetime.fromisoformat(scraped_at).strftime('%Y-%m-%d %H:%M:%S') if scraped_at else ''
+    yield (
+        f"Title: {metadata.get('title', '')}\n"
+        f"Video ID: {metadata.get('video_id', '')}\n"
+        f"URL: {_watch_url(metadata)}\n"
+        f"Scraped: {scraped}\n"
+        + "-" * 50 + "\n\n"
+    )
+    for entry in segments:
+        if timestamps:
+            yield f"[{_clock(entry['start'])}] {entry['text']}\n"
+        else:
+            yield f"{entry['text']}\n"
+
+
+def render_srt(metadata, segments, timestamps=True):
+    for number, (start, end, text) in enumerate(_cues(segments), 1):
+        yield f"{number}\n{_clock(start, ',')} --> {_clock(end, ',')}\n{text}\n\n"
+
+
+def render_vtt(metadata, segments, timestamps=True):
+    yield "WEBVTT\n\n"
+    for start, end, text in _cues(segments):
+        yield f"{_clock(start, '.')} --> {_clock(end, '.')}\n{text}\n\n"
+
+
+def render_md(metadata, segments, timestamps=False):
+    url = _watch_url(metadata)
+    yield f"# {metadata.get('title', '')}\n\n[Watch on YouTube]({url})"
+    paragraph_start = None
+    for entry in segments:
+        if paragraph_start is None or entry['start'] - paragraph_start >= PARAGRAPH_SECONDS:
+            paragraph_start = entry['start']
+            yield "\n\n"
+            if timestamps:
+                yield f"[{_clock(entry['start'])}]({url}&t={int(entry['start'])}s) "
+        else:
+            yield " "
+        yield entry['text'].replace('\n', ' ')
+    yield "\n"
+
+
+RENDERERS = {
+    'txt': render_txt,
+    'srt': render_srt,
+    'vtt': render_vtt,
+    'md': render_md,
+}
+
+
+def render(metadata, segments, fmt='txt', timestamps=None):
+    """Yield the transcript in `fmt` piece by piece
+
+    timestamps=None uses the include_timestamps choice recorded when it was scraped.
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(RENDERERS)}")
+    if timestamps is None:
+        timestamps = metadata.get('include_timestamps', False)
+    return RENDERERS[fmt](metadata, segments, timestamps)
+
+
+def render_text(metadata, segments, fmt='txt', timestamps=None):
+    return "".join(render(metadata, segments, fmt, timestamps))
+
+
+class RenderCache:
+    """Byte-bounded LRU of rendered transcripts
+
+    Keys include the index entry's scraped_at, so re-scraping a video makes its old
+    renderings unreachable; they age out like any other entry.
+    """
+
+    def __init__(self, max_bytes=RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, output_dir, entry, fmt='txt', timestamps=None):
+        """Rendered text (str) of an index entry, from the cache or its segment file"""
+        key = (entry['video_id'], entry.get('language'), entry['scraped_at'], fmt, timestamps)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        metadata, segments = load_transcript_file(os.path.join(output_dir, entry['json_file']))
+        text = render_text(metadata, segments, fmt, timestamps)
+        size = len(text)
+        with self._lock:
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = text
+                self._size += size
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return text
+
+
+def download_name(entry, fmt):
+    """File name to offer for a rendered transcript, based on its text file name"""
+    return entry['txt_file'][:-len('.txt')] + FORMATS[fmt][1]
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    from transcript_index import TranscriptIndex
+
+    parser = argparse.ArgumentParser(description="Render saved transcripts as txt, srt, vtt or md")
+    parser.add_argument('video_ids', nargs='*', help="videos to render to stdout")
+    parser.add_argument('--format', '-f', default='txt', choices=sorted(RENDERERS))
+    parser.add_argument('--timestamps', action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument('--output-dir', default='transcripts')
+    parser.add_argument('--all', metavar='DEST', help="render every transcript into files under DEST")
+    args = parser.parse_args()
+
+    index = TranscriptIndex.open(args.output_dir)
+    if args.all:
+        os.makedirs(args.all, exist_ok=True)
+        for entry in index.iter_entries():
+            metadata, segments = load_transcript_file(os.path.join(args.output_dir, entry['json_file']))
+            with open(os.path.join(args.all, download_name(entry, args.format)), 'w', encoding='utf-8') as f:
+                f.writelines(render(metadata, segments, args.format, args.timestamps))
+    for video_id in args.video_ids:
+        entry = index.get(video_id)
+        if entry is None:
+            sys.exit(f"No transcript for {video_id}")
+        metadata, segments = load_transcript_file(os.path.join(args.output_dir, entry['json_file']))
+        sys.stdout.writelines(render(metadata, segments, args.format, args.timestamps))
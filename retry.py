@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime
+
+from sqlite_store import SQLiteStore
+from transcript_index import INDEX_DIRNAME
+
+logger = logging.getLogger(__name__)
+
+PERMANENT = 'permanent'
+TRANSIENT = 'transient'
+RATE_LIMITED = 'rate_limited'
+
+# youtube-transcript-api errors that will not go away by asking again
+PERMANENT_ERRORS = {
+    'TranscriptsDisabled', 'NoTranscriptFound', 'VideoUnavailable', 'VideoUnplayable', 'InvalidVideoId',
+    'AgeRestricted', 'NotTranslatable', 'TranslationLanguageNotAvailable',
+}
+RATE_LIMIT_ERRORS = {'RequestBlocked', 'IpBlocked'}
+# Permanent for the languages asked for, but another job may want a language the video has
+LANGUAGE_ERRORS = {'NoMatchingTranscript', 'NoTranscriptFound'}
+RATE_LIMIT_MARKERS = ('429', 'too many requests')
+
+RATE_LIMIT_COOLDOWN = 15 * 60
+MAX_COOLDOWN = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    video_id TEXT PRIMARY KEY,
+    channel_url TEXT,
+    error_class TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    first_failed_at TEXT NOT NULL,
+    last_failed_at TEXT NOT NULL,
+    retry_after REAL -- NULL for permanent failures: never retried automatically
+);
+CREATE INDEX IF NOT EXISTS failures_class ON failures (error_class, last_failed_at);
+"""
+
+
+def classify_error(error):
+    """'permanent', 'transient' or 'rate_limited' for a transcript fetch error
+
+    Backends can set an `error_class` attribute on their exceptions to classify them
+    directly. Unknown errors count as transient, so they are retried rather than lost.
+    """
+    explicit = getattr(error, 'error_class', None)
+    if explicit:
+        return explicit
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if getattr(error, 'status_code', None) == 429 or names & RATE_LIMIT_ERRORS:
+        return RATE_LIMITED
+    if names & PERMANENT_ERRORS:
+        return PERMANENT
+    message = str(error).lower()
+    if any(marker in message for marker in RATE_LIMIT_MARKERS):
+        return RATE_LIMITED
+    return TRANSIENT
+
+
+def is_language_mismatch(error):
+    """Whether a fetch failed only because the video has no transcript in the requested languages"""
+    return bool({cls.__name__ for cls in type(error).__mro__} & LANGUAGE_ERRORS)
+
+
+def failures_path(output_dir):
+    """Location of the failed-fetch store for an output directory"""
+    return os.path.join(output_dir, INDEX_DIRNAME, 'failures.sqlite3')
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for transient fetch errors within one run
+
+    Attempt n waits a uniformly random time up to min(max_delay, base_delay * 2**n)
+    ("full jitter"), so workers that failed together do not retry together. Permanent
+    and rate-limited errors are raised straight away. on_error sees every failed
+    attempt, on_retry only those about to be retried.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt):
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _should_retry(self, error, attempt):
+        return attempt + 1 < self.max_attempts and classify_error(error) == TRANSIENT
+
+    def call(self, func, *args, on_error=None, on_retry=None):
+        for attempt in range(self.max_attempts):
+            try:
+                return func(*args)
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                if not self._should_retry(e, attempt):
+                    raise
+                delay = self.backoff(attempt)
+                if on_retry:
+                    on_retry(e)
+                logger.info(f"Transient error ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def call_async(self, func, *args, on_error=None, on_retry=None):
+        for attempt in range(self.max_attempts):
+            try:
+                return await func(*args)
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                if not self._should_retry(e, attempt):
+                    raise
+                delay = self.backoff(attempt)
+                if on_retry:
+                    on_retry(e)
+                logger.info(f"Transient error ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+class FailureStore(SQLiteStore):
+    """Persisted record of videos whose transcript fetch failed, keyed by video ID
+
+    Permanent failures form a dead-letter list that later runs skip without a request.
+    Rate-limited videos get a cooldown that doubles each time they are limited again.
+    Videos that only failed transiently are kept for reporting and retried next run.
+    A video lacking the requested languages is not recorded at all, since the record
+    would also skip it for jobs that want other languages.
+    """
+
+    SCHEMA = SCHEMA
+    # 1: language mismatches are no longer dead-lettered
+    SCHEMA_VERSION = 1
+
+    def migrate(self, conn, version):
+        if version < 1:
+            conn.execute(
+                "DELETE FROM failures WHERE error_class = ? AND (reason LIKE 'No transcript in %' "
+                "OR reason LIKE '%No transcripts were found for any of the requested language codes%')",
+                (PERMANENT,)
+            )
+
+    def record(self, video_id, channel_url, error_class, reason, now=None):
+        """Record a failed fetch and return the error class"""
+        now = time.time() if now is None else now
+        timestamp = datetime.fromtimestamp(now).isoformat()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT attempts, error_class FROM failures WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            attempts = row['attempts'] + 1 if row else 1
+            if error_class == PERMANENT:
+                retry_after = None
+            elif error_class == RATE_LIMITED:
+                # Consecutive rate limits on the same video back off further each time
+                streak = attempts if row and row['error_class'] == RATE_LIMITED else 1
+                retry_after = now + min(MAX_COOLDOWN, RATE_LIMIT_COOLDOWN * 2 ** (streak - 1))
+            else:
+                retry_after = now
+            conn.execute(
+                "INSERT INTO failures (video_id, channel_url, error_class, reason, attempts, first_failed_at, "
+                "last_failed_at, retry_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET channel_url = excluded.channel_url, "
+                "error_class = excluded.error_class, reason = excluded.reason, attempts = excluded.attempts, "
+                "last_failed_at = excluded.last_failed_at, retry_after = excluded.retry_after",
+                (video_id, channel_url, error_class, reason[:500], attempts, timestamp, timestamp, retry_after)
+            )
+        return error_class
+
+    def skip_reason(self, video_id, now=None):
+        """'dead_letter' or 'deferred' if video_id should not be fetched now, else None"""
+        row = self._connect().execute(
+            "SELECT error_class, retry_after FROM failures WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row['retry_after'] is None:
+            return 'dead_letter'
+        if row['retry_after'] > (time.time() if now is None else now):
+            return 'deferred'
+        return None
+
+    def resolve(self, video_id):
+        """Forget a video after a successful fetch"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM failures WHERE video_id = ?", (video_id,))
+
+    def list(self, error_class=None, channel=None, limit=1000):
+        conditions = []
+        params = []
+        if error_class:
+            conditions.append("error_class = ?")
+            params.append(error_class)
+        if channel:
+            conditions.append("channel_url = ?")
+            params.append(channel)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM failures {where} ORDER BY last_failed_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        rows = self._connect().execute("SELECT error_class, COUNT(*) FROM failures GROUP BY error_class").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def clear(self, error_class=None):
+        with self._connect() as conn:
+            if error_class:
+                conn.execute("DELETE FROM failures WHERE error_class = ?", (error_class,))
+            else:
+                conn.execute("DELETE FROM failures")
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Inspect or reset recorded transcript fetch failures")
+    parser.add_argument('output_dir', nargs='?', default='transcripts')
+    parser.add_argument('--class', dest='error_class', choices=[PERMANENT, TRANSIENT, RATE_LIMITED])
+    parser.add_argument('--clear', action='store_true', help="forget the failures so they are fetched again")
+    args = parser.parse_args()
+
+    store = FailureStore(failures_path(args.output_dir))
+    if args.clear:
+        store.clear(args.error_class)
+    else:
+        print(json.dumps(store.list(args.error_class), indent=2))
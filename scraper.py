@@ -1,7 +1,24 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from yt_dlp import YoutubeDL
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from rate_limiter import AdaptiveRateLimiter
+from manifest import ChannelManifest
+from transcript_index import TranscriptIndex, listing_item
+from compact_store import compact_filename, encode_transcript
+from search_index import SearchIndex, search_index_path
+from dedup import DedupIndex
+from fetch_cache import TranscriptCache
+from channel_cache import ChannelCache
+from languages import DEFAULT_LANGUAGE, LanguagePreference, raw_segments
+from pipeline import transcript_record
+from transcript_writer import TranscriptWriter, atomic_write
+from render import RenderCache, render_text
+from retry import FailureStore, RetryPolicy, classify_error, failures_path, is_language_mismatch, PERMANENT
+from metrics import (JobMetrics, ACTIVE_WORKERS, BYTES_WRITTEN, CACHE_LOOKUPS, CHANNEL_CACHE_LOOKUPS, FETCH_ERRORS,
+                     QUEUE_DEPTH, RETRIES, VIDEOS)
+import copy
 import json
-import time
+import queue
+import re
+import threading
 import os
 from datetime import datetime
 import logging
@@ -10,182 +27,708 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MANIFEST_DIRNAME = '.manifests'
+
+# Listing tabs of a channel page, enumerated in parallel
+CHANNEL_TABS = ('videos', 'shorts', 'streams')
+PLAYLIST_URL = re.compile(r'[?&]list=|/playlist\b|/watch\b')
+
+# Rendered transcripts memoised for the whole process
+render_cache = RenderCache()
+
+THROTTLE_MARKERS = ('429', 'too many requests', 'timed out', 'timeout')
+
+def is_throttling_error(error):
+    """Whether an exception means we are being rate limited or the network is saturated"""
+    if isinstance(error, TimeoutError):
+        return True
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    if type(error).__name__ in ('RequestBlocked', 'IpBlocked', 'Timeout', 'ReadTimeout', 'ConnectTimeout'):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
 class YouTubeChannelScraper:
-    def __init__(self, channel_url, output_dir="transcripts"):
+    def __init__(self, channel_url, output_dir="transcripts", transcript_api=None, manifest_dir=None,
+                 storage=None, retry_policy=None, languages=None):
         self.channel_url = channel_url
         self.output_dir = output_dir
+        # 'json' (pretty-printed, the default) or 'compact' (see compact_store.py)
+        self.storage = storage or os.environ.get('SCRAPER_STORAGE', 'json')
+        self.manifest_dir = manifest_dir or os.path.join(output_dir, MANIFEST_DIRNAME)
+        if transcript_api is None:
+            # yt-dlp and youtube-transcript-api are imported when a scraper is first needed, so web
+            # workers that only serve listings and downloads never load them
+            from youtube_transcript_api import YouTubeTranscriptApi
+            transcript_api = YouTubeTranscriptApi()
+        self.transcript_api = transcript_api
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Which languages to fetch for each video, see languages.py
+        self.languages = languages or LanguagePreference()
         
         # Create output directory if it doesn't exist
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
             logger.info(f"Created output directory: {self.output_dir}")
 
+        # Stores are opened once per process and output directory, so constructing a scraper is cheap
+        self.index = TranscriptIndex.open(self.output_dir)
+        self.search_index = SearchIndex.shared(search_index_path(self.output_dir))
+        self.failures = FailureStore.shared(failures_path(self.output_dir))
+        self.fetch_cache = TranscriptCache.open(self.output_dir)
+        self.channel_cache = ChannelCache.open(self.output_dir)
+        # Near-duplicate and boilerplate detection of saved transcripts on a background thread, see
+        # dedup.py; SCRAPER_DEDUP=0 turns it off
+        self.dedup = (DedupIndex.open(self.output_dir).background()
+                      if os.environ.get('SCRAPER_DEDUP', '1') != '0' else None)
+        # Channel ID and title yt-dlp resolved the channel URL to, once it has been listed
+        self.resolved_channel = None
+        # Timings and counts of the current scrape; copies from for_channel share it
+        self.metrics = JobMetrics()
+        # Background writer that saves go through during a scrape, see open_writer()
+        self.writer = None
+        self._txt_lock = threading.Lock()
+        self._txt_owners = {}
+
+    def for_channel(self, channel_url):
+        """Scraper for another channel sharing this one's output directory, indexes and transcript client"""
+        scraper = copy.copy(self)
+        scraper.channel_url = channel_url
+        scraper.resolved_channel = None
+        return scraper
+
+    def _tab_urls(self, tabs=CHANNEL_TABS):
+        """(tab, URL) for each listing tab of the channel; a playlist or other URL is its own single tab"""
+        base = self.channel_url.rstrip('/')
+        if PLAYLIST_URL.search(base):
+            return [('playlist', self.channel_url)]
+        for tab in CHANNEL_TABS:
+            if base.endswith('/' + tab):
+                base = base[:-len(tab) - 1]
+        return [(tab, f"{base}/{tab}") for tab in tabs]
+
+    @staticmethod
+    def _video_from_entry(entry):
+        """Turn a flat yt-dlp playlist entry into a video dict, or None if unusable"""
+        if not (entry and entry.get('id') and entry.get('title')):
+            return None
+        # Clean the title to make it filesystem-friendly
+        clean_title = "".join(c for c in entry['title'] if c.isalnum() or c in (' ', '-', '_')).strip()
+        return {
+            'id': entry['id'],
+            'title': clean_title,
+            'original_title': entry['title'],
+            'duration': entry.get('duration'),
+            'upload_date': entry.get('upload_date')
+        }
+
     def get_video_ids(self, max_videos=None):
-        """Extract all video IDs and titles from the channel's uploads"""
+        """Extract video IDs and titles from all of the channel's tabs"""
+        try:
+            with self.metrics.timed('enumerate'):
+                videos = list(self.iter_channel_videos(max_videos))
+        except Exception as e:
+            logger.error(f"Error getting video information: {str(e)}")
+            return []
+        logger.info(f"Found {len(videos)} videos")
+        return videos
+
+    def iter_tab_entries(self, url):
+        """Yield the videos of one listing tab newest first, fetching pages only as they are consumed"""
+        from yt_dlp import YoutubeDL
         ydl_opts = {
             'extract_flat': True,
             'quiet': True,
         }
         
-        if max_videos:
-            ydl_opts['playlistend'] = max_videos
-        
         with YoutubeDL(ydl_opts) as ydl:
+            logger.info(f"Lazily paging video information from: {url}")
+            # process=False leaves 'entries' as the extractor's page-by-page generator
+            channel_info = ydl.extract_info(url, download=False, process=False)
+            if channel_info.get('channel_id'):
+                self.resolved_channel = {
+                    'channel_id': channel_info['channel_id'],
+                    'title': channel_info.get('channel') or channel_info.get('uploader'),
+                }
+            for entry in channel_info.get('entries') or []:
+                video = self._video_from_entry(entry)
+                if video:
+                    yield video
+
+    def iter_channel_videos(self, max_videos=None, known=None, tabs=CHANNEL_TABS):
+        """Yield videos from the videos, shorts and streams tabs as their listing pages arrive
+
+        Every tab is paged on its own thread, so the first videos come back after one
+        page instead of after the whole listing. IDs already seen on another tab are
+        dropped. With `known` (e.g. a ChannelManifest) each tab stops at its first known
+        video. Closing the generator early stops the tabs after their current page.
+
+        Listings are kept in the channel cache (see channel_cache.py): within its TTL
+        no request is made at all, and a stale listing only pages the new videos.
+        """
+        if tabs != CHANNEL_TABS:
+            yield from (video for _, video in self._iter_listing(max_videos, known, tabs))
+            return
+
+        listing = self.channel_cache.get(self.channel_url)
+        if listing is not None and listing.covers(max_videos):
+            if self.channel_cache.is_fresh(listing):
+                self.metrics.count(CHANNEL_CACHE_LOOKUPS, result='hit')
+                self.resolved_channel = {'channel_id': listing.channel_id, 'title': listing.title}
+                yield from listing.select(max_videos, known)
+                return
+            if self.channel_cache.is_refreshable(listing):
+                self.metrics.count(CHANNEL_CACHE_LOOKUPS, result='refresh')
+                added = self.channel_cache.prepend(
+                    self.channel_url, list(self._iter_listing(known=listing.video_ids(), tabs=tabs))
+                )
+                logger.info(f"Refreshed cached listing of {self.channel_url}: {added} new videos")
+                yield from self.channel_cache.get(self.channel_url).select(max_videos, known)
+                return
+        self.metrics.count(CHANNEL_CACHE_LOOKUPS, result='miss')
+
+        listed = []
+        errors = []
+        for tab, video in self._iter_listing(max_videos, known, tabs, errors):
+            listed.append((tab, video))
+            yield video
+        # Only a listing from the top of every tab, whose main tab answered, can stand in for a new one
+        main_tab = self._tab_urls(tabs)[0][0]
+        if known is None and listed and main_tab not in errors:
+            self.channel_cache.put(
+                self.channel_url, listed, complete=not (max_videos and len(listed) >= max_videos),
+                **(self.resolved_channel or {})
+            )
+
+    def _iter_listing(self, max_videos=None, known=None, tabs=CHANNEL_TABS, errors=None):
+        """(tab, video) for iter_channel_videos, straight from YouTube; failed tabs go to `errors`"""
+        tab_urls = self._tab_urls(tabs)
+        entries = queue.Queue()
+        stop = threading.Event()
+
+        def page(tab, url):
             try:
-                # Add /videos to get the uploads playlist
-                if not self.channel_url.endswith('/videos'):
-                    channel_url = self.channel_url + '/videos'
-                else:
-                    channel_url = self.channel_url
-                    
-                logger.info(f"Extracting video information from: {channel_url}")
-                
-                # Get channel information
-                channel_info = ydl.extract_info(channel_url, download=False)
-                
-                # Extract video IDs and titles
-                videos = []
-                if 'entries' in channel_info:
-                    for entry in channel_info['entries']:
-                        if entry and entry.get('id') and entry.get('title'):
-                            # Clean the title to make it filesystem-friendly
-                            clean_title = "".join(c for c in entry['title'] if c.isalnum() or c in (' ', '-', '_')).strip()
-                            videos.append({
-                                'id': entry['id'],
-                                'title': clean_title,
-                                'original_title': entry['title']
-                            })
-                
-                logger.info(f"Found {len(videos)} videos")
-                return videos
+                for video in self.iter_tab_entries(url):
+                    if stop.is_set():
+                        return
+                    if known is not None and video['id'] in known:
+                        logger.info(f"Reached already-synced video {video['id']} on the {tab} tab")
+                        return
+                    entries.put((tab, video))
             except Exception as e:
-                logger.error(f"Error getting video information: {str(e)}")
-                return []
+                # Most channels have no shorts or streams tab at all
+                logger.info(f"Stopped listing the {tab} tab of {self.channel_url}: {str(e)}")
+                if errors is not None:
+                    errors.append(tab)
+            finally:
+                entries.put(None)
+
+        executor = ThreadPoolExecutor(max_workers=len(tab_urls), thread_name_prefix='enumerate')
+        for tab, url in tab_urls:
+            executor.submit(page, tab, url)
+        seen = set()
+        running = len(tab_urls)
+        try:
+            while running:
+                item = entries.get()
+                if item is None:
+                    running -= 1
+                    continue
+                if item[1]['id'] in seen:
+                    continue
+                seen.add(item[1]['id'])
+                yield item
+                if max_videos and len(seen) >= max_videos:
+                    return
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+
+    def get_manifest(self):
+        """Manifest of video IDs already synced for this channel"""
+        return ChannelManifest(self.manifest_dir, self.channel_url)
+
+    def get_new_video_ids(self, max_videos=None, manifest=None):
+        """Page through every tab until its first video already in the channel manifest
+
+        Videos that failed on an earlier sync are appended so they get another attempt.
+        """
+        manifest = manifest or self.get_manifest()
+        try:
+            with self.metrics.timed('enumerate'):
+                videos = list(self.iter_channel_videos(max_videos, known=manifest))
+        except Exception as e:
+            logger.error(f"Error getting video information: {str(e)}")
+            return []
+        
+        logger.info(f"Found {len(videos)} new videos ({len(manifest)} already synced)")
+        return self._with_failed(videos, manifest)
+
+    @staticmethod
+    def _with_failed(videos, manifest):
+        new_ids = {video['id'] for video in videos}
+        return videos + [video for video_id, video in manifest.failed.items() if video_id not in new_ids]
+
+    def download_transcripts(self, video_id, rate_limiter=None):
+        """Fetch the wanted languages of a video over the network into the fetch cache, raising on failure
+
+        The video's transcript list is requested once and every language is picked from
+        it; further requests wait for `rate_limiter` if given. Returns a list of
+        (language, segments, info) as LanguagePreference.select describes.
+        """
+        with self.metrics.timed('fetch'):
+            if hasattr(self.transcript_api, 'list'):
+                fetched = []
+                for language, transcript, info in self.languages.select(self.transcript_api.list(video_id)):
+                    if rate_limiter:
+                        rate_limiter.acquire()
+                    fetched.append((language, raw_segments(transcript.fetch()), info))
+            else:
+                # Backends without transcript lists fetch a single transcript per request
+                language = self.languages.languages[0]
+                fetched = [(language, self.transcript_api.get_transcript(video_id, languages=[language]), None)]
+        for language, transcript, _ in fetched:
+            self.fetch_cache.put(video_id, transcript, language)
+        return fetched
+
+    def download_transcript(self, video_id):
+        """Fetch the most wanted available transcript over the network, raising on failure"""
+        return self.download_transcripts(video_id)[0][1]
+
+    def fetch_transcript(self, video_id):
+        """Get transcript for a single video from the fetch cache or the network, raising on failure"""
+        cached = self.fetch_cache.get(video_id, self.languages.languages[0])
+        if cached is not None:
+            return cached
+        return self.download_transcript(video_id)
 
     def get_transcript(self, video_id):
         """Get transcript for a single video"""
         try:
-            transcript = YouTubeTranscriptApi.get_transcript(video_id)
+            transcript = self.fetch_transcript(video_id)
             return transcript
         except Exception as e:
             logger.warning(f"Error getting transcript for video {video_id}: {str(e)}")
             return None
 
-    def save_transcript(self, video_id, video_title, original_title, transcript, include_timestamps=False):
-        """Save transcript to both JSON and TXT files using video title"""
-        # Save JSON version (keep ID version for reference)
-        json_filename = os.path.join(self.output_dir, f"{video_id}_transcript.json")
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump({
-                'video_id': video_id,
-                'title': original_title,
-                'clean_title': video_title,
-                'url': f"https://www.youtube.com/watch?v={video_id}",
-                'scraped_at': datetime.now().isoformat(),
-                'transcript': transcript
-            }, f, ensure_ascii=False, indent=2)
-        
-        # Save plain text version with title
-        txt_filename = os.path.join(self.output_dir, f"{video_title}.txt")
-        with open(txt_filename, 'w', encoding='utf-8') as f:
-            # Write title at the top
-            f.write(f"Title: {original_title}\n")
-            f.write(f"Video ID: {video_id}\n")
-            f.write(f"URL: https://www.youtube.com/watch?v={video_id}\n")
-            f.write(f"Scraped: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("-" * 50 + "\n\n")
-            
-            # Write each transcript segment
-            for entry in transcript:
-                if include_timestamps:
-                    hours = int(entry['start'] // 3600)
-                    minutes = int((entry['start'] % 3600) // 60)
-                    seconds = int(entry['start'] % 60)
-                    timestamp = f"[{hours:02d}:{minutes:02d}:{seconds:02d}] "
-                    f.write(f"{timestamp}{entry['text']}\n")
+    def _txt_filename(self, video_id, video_title):
+        """Text file name for a video, disambiguated by ID when another video has the same title"""
+        txt_file = f"{video_title}.txt"
+        with self._txt_lock:
+            # Also check names claimed by saves that have not reached the index yet
+            owner = self._txt_owners.get(txt_file) or self.index.owner_of_txt(txt_file)
+            if owner and owner != video_id:
+                txt_file = f"{video_title} [{video_id}].txt"
+            self._txt_owners[txt_file] = video_id
+        return txt_file
+
+    def save_transcript(self, video_id, video_title, original_title, transcript, include_timestamps=False,
+                        language=DEFAULT_LANGUAGE, info=None):
+        """Save the transcript segments and record them in the index
+
+        Text formats are rendered from the segments on demand (see render.py);
+        include_timestamps is kept as the default for plain-text renderings. The file
+        is encoded in memory and written atomically, by the background writer while
+        one is open. Each language of a video is saved separately; `info` says whether
+        it was auto-generated or translated, if known.
+        """
+        with self.metrics.timed('save'):
+            self._save_transcript(video_id, video_title, original_title, transcript, include_timestamps,
+                                  language, info or {})
+
+    def _save_transcript(self, video_id, video_title, original_title, transcript, include_timestamps,
+                         language, info):
+        scraped_at = datetime.now()
+        txt_file = self._txt_filename(video_id, video_title)
+
+        metadata = {
+            'video_id': video_id,
+            'title': original_title,
+            'clean_title': video_title,
+            'url': f"https://www.youtube.com/watch?v={video_id}",
+            'channel_url': self.channel_url or None,
+            'language': language,
+            'is_generated': info.get('is_generated'),
+            'translated_from': info.get('translated_from'),
+            'txt_file': txt_file,
+            'include_timestamps': include_timestamps,
+            'scraped_at': scraped_at.isoformat()
+        }
+        # Size of the default plain-text rendering, which listings report and sort by
+        metadata['txt_size'] = len(render_text(metadata, transcript).encode('utf-8'))
+
+        # Default-language files keep the names they had before languages were tracked
+        stem = video_id if language == DEFAULT_LANGUAGE else f"{video_id}.{language}"
+        if self.storage == 'compact':
+            json_file = compact_filename(stem)
+            data = encode_transcript(metadata, transcript)
+        else:
+            # Save JSON version (keep ID version for reference)
+            json_file = f"{stem}_transcript.json"
+            data = json.dumps({**metadata, 'transcript': transcript}, ensure_ascii=False, indent=2).encode('utf-8')
+        json_filename = os.path.join(self.output_dir, json_file)
+
+        entry = {
+            'video_id': video_id,
+            'title': original_title,
+            'clean_title': video_title,
+            'channel_url': self.channel_url or None,
+            'language': language,
+            'is_generated': info.get('is_generated'),
+            'translated_from': info.get('translated_from'),
+            'segments': len(transcript),
+            'json_file': json_file,
+            'json_size': len(data),
+            'txt_file': txt_file,
+            'txt_size': metadata['txt_size'],
+            'scraped_at': scraped_at.isoformat()
+        }
+        if self.writer:
+            self.writer.submit(json_filename, data, entry, transcript)
+            return
+
+        atomic_write(json_filename, data)
+        self.metrics.count(BYTES_WRITTEN, len(data))
+        self.index.upsert(entry)
+        self.search_index.add_transcript(video_id, original_title, transcript, language)
+        if self.dedup:
+            self.dedup.submit(video_id, transcript, language)
+
+    def open_writer(self):
+        """Start a background writer for saves until close_writer(); copies made by for_channel share it"""
+        self.writer = TranscriptWriter(self.index, self.search_index, self.metrics, dedup=self.dedup)
+        return self.writer
+
+    def close_writer(self):
+        """Flush and stop the background writer and return the IDs of videos it could not save"""
+        writer, self.writer = self.writer, None
+        writer.close()
+        return writer.failed
+
+    def transcript_exists(self, video):
+        """Whether a transcript for this video has already been saved"""
+        return self.index.exists(video['id'])
+
+    def skip_status(self, video):
+        """Status for a video that needs no fetch this run: saved already, dead-lettered or cooling down"""
+        if self.languages.is_satisfied(self.index.saved_languages(video['id'])):
+            return "skipped"
+        return self.failures.skip_reason(video['id'])
+
+    def _fetch_failed(self, video, error):
+        """Record a fetch that failed after any retries and return the video's status"""
+        if is_language_mismatch(error):
+            # Only this job's languages are missing, so nothing is recorded that would skip the video later
+            logger.warning(f"✗ No transcript in the requested languages for: {video['original_title']}")
+            return "no_language"
+        error_class = self.failures.record(video['id'], self.channel_url or None, classify_error(error), str(error))
+        logger.warning(f"✗ Could not get transcript for: {video['original_title']} ({error_class}: {str(error)})")
+        return "dead_letter" if error_class == PERMANENT else "failed"
+
+    def _on_fetch_error(self, error, rate_limiter):
+        """Count a failed request and slow the rate limiter down if it was throttled"""
+        self.metrics.count(FETCH_ERRORS, error_class=classify_error(error))
+        if is_throttling_error(error):
+            rate_limiter.on_throttle()
+
+    def _on_retry(self, error):
+        self.metrics.count(RETRIES, error_class=classify_error(error))
+
+    def _cached_transcripts(self, video_id, allow_stale=False):
+        """Fetch cache lookup made before (or, if stale, after) a network fetch, counted by result
+
+        Returns [(language, segments, None)] like download_transcripts: the most wanted
+        cached language, or with all_languages every one of them. None on a miss.
+        """
+        found = []
+        for language in self.languages.languages:
+            transcript = self.fetch_cache.get(video_id, language, allow_stale=allow_stale)
+            if transcript is not None:
+                found.append((language, transcript, None))
+                if not self.languages.all_languages:
+                    break
+            elif self.languages.all_languages:
+                found = []
+                break
+        if found:
+            self.metrics.count(CACHE_LOOKUPS, result='stale' if allow_stale else 'hit')
+            return found
+        if not allow_stale:
+            self.metrics.count(CACHE_LOOKUPS, result='miss')
+        return None
+
+    def _save_fetched(self, video, fetched, include_timestamps):
+        for language, transcript, info in fetched:
+            self.save_transcript(video['id'], video['title'], video['original_title'], transcript,
+                                 include_timestamps, language, info)
+
+    def _record_status(self, status):
+        self.metrics.count(VIDEOS, status=status)
+
+    def _fetch_and_save(self, video, include_timestamps, rate_limiter):
+        """Fetch and save one video's transcript, feeding the outcome back to the rate limiter
+
+        Transient errors are retried with backoff; every request waits for the rate limiter.
+        """
+        ACTIVE_WORKERS.inc()
+        try:
+            return self._fetch_and_save_video(video, include_timestamps, rate_limiter)
+        finally:
+            ACTIVE_WORKERS.dec()
+
+    def _fetch_and_save_video(self, video, include_timestamps, rate_limiter):
+        fetched, status = self._fetch_video(video, rate_limiter)
+        if fetched is None:
+            return status
+        self._save_fetched(video, fetched, include_timestamps)
+        self.failures.resolve(video['id'])
+        logger.info(f"✓ Saved transcript for: {video['original_title']}")
+        return "success"
+
+    def _fetch_video(self, video, rate_limiter):
+        """([(language, segments, info)], None) for a video from the fetch cache or network, or (None, status)"""
+        video_id = video['id']
+
+        def attempt():
+            rate_limiter.acquire()
+            return self.download_transcripts(video_id, rate_limiter)
+
+        # Cache hits cost no request, so they skip the rate limiter too
+        fetched = self._cached_transcripts(video_id)
+        if fetched is None:
+            try:
+                fetched = self.retry_policy.call(
+                    attempt, on_error=lambda error: self._on_fetch_error(error, rate_limiter),
+                    on_retry=self._on_retry
+                )
+            except Exception as e:
+                # A failed revalidation falls back on the expired cache entry if there is one
+                fetched = self._cached_transcripts(video_id, allow_stale=True)
+                if fetched is None:
+                    return None, self._fetch_failed(video, e)
+                logger.info(f"Using stale cached transcript for {video_id}: {str(e)}")
+            else:
+                rate_limiter.on_success()
+
+        fetched = [item for item in fetched if item[1]]
+        if fetched:
+            return fetched, None
+
+        logger.warning(f"✗ Could not get transcript for: {video['original_title']}")
+        return None, "failed"
+
+    def _records(self, video, fetched):
+        return [
+            transcript_record(video, language, transcript, info, self.channel_url or None)
+            for language, transcript, info in fetched
+        ]
+
+    def iter_transcripts(self, max_videos=None, max_workers=1, requests_per_second=1.0, rate_limiter=None,
+                         save=False, include_timestamps=False, skip_saved=False, buffer=None):
+        """Yield a record (see pipeline.py) for each transcript of the channel as it is fetched
+
+        At most `buffer` videos (default 2 x max_workers) are fetched ahead of the
+        consumer, so a slow consumer holds fetching back and no more than that many
+        transcripts are held in memory however large the channel is; only its listing
+        (IDs and titles) is kept in full. Records come in completion
+        order. With save=True every transcript is also saved and indexed as
+        scrape_all_transcripts would; skip_saved=True leaves out videos already saved.
+        Dead-lettered videos and ones cooling down after a failure are always left out.
+        """
+        self.metrics = JobMetrics()
+        if rate_limiter is None:
+            rate_limiter = AdaptiveRateLimiter(rate=requests_per_second)
+        buffer = buffer or 2 * max(1, max_workers)
+
+        def fetch(video):
+            ACTIVE_WORKERS.inc()
+            try:
+                fetched, status = self._fetch_video(video, rate_limiter)
+            except Exception as e:
+                logger.error(f"Error processing video {video['id']}: {str(e)}")
+                fetched, status = None, "failed"
+            finally:
+                ACTIVE_WORKERS.dec()
+            if fetched is None:
+                return video, None, status
+            if save:
+                self._save_fetched(video, fetched, include_timestamps)
+                self.failures.resolve(video['id'])
+            return video, fetched, "success"
+
+        def wanted(videos):
+            for video in videos:
+                status = self.skip_status(video) if skip_saved else self.failures.skip_reason(video['id'])
+                if status:
+                    self._record_status(status)
                 else:
-                    f.write(f"{entry['text']}\n")
+                    yield video
 
-    def scrape_all_transcripts(self, max_videos=None, include_timestamps=False, progress_callback=None):
-        """Scrape transcripts from all videos in the channel"""
-        videos = self.get_video_ids(max_videos)
-        
-        if not videos:
-            logger.error("No videos found or unable to extract video information")
-            return {"success": False, "message": "No videos found", "processed": 0, "successful": 0}
+        videos = wanted(self.iter_channel_videos(max_videos))
+        if save:
+            self.open_writer()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                running = set()
+
+                def finished(until):
+                    nonlocal running
+                    while len(running) > until:
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            video, fetched, status = future.result()
+                            self._record_status(status)
+                            if fetched is not None:
+                                yield from self._records(video, fetched)
+
+                try:
+                    for video in videos:
+                        running.add(executor.submit(fetch, video))
+                        # Take no more videos until the consumer has taken what is already fetched
+                        yield from finished(buffer - 1)
+                    yield from finished(0)
+                finally:
+                    # A consumer that stops early leaves only the fetches already started to finish
+                    for future in running:
+                        future.cancel()
+        finally:
+            if save:
+                self.close_writer()
+
+    def scrape_all_transcripts(self, max_videos=None, include_timestamps=False, progress_callback=None,
+                               max_workers=1, requests_per_second=1.0, rate_limiter=None, incremental=False):
+        """Scrape transcripts from all videos in the channel
+
+        With max_workers > 1 transcripts are fetched by a pool of worker threads. All
+        requests, sequential or concurrent, go through one shared adaptive rate limiter.
+        With incremental=True only uploads newer than the last synced video are enumerated.
+        Fetching starts as soon as the first listing page arrives; `total` in progress
+        callbacks grows while the channel's tabs are still being enumerated. The result's
+        'metrics' summarise the run's stage timings and counts; its 'enumerate' stage
+        covers the whole listing, overlapping the fetches it feeds.
+        """
+        self.metrics = JobMetrics()
+        manifest = self.get_manifest() if incremental else None
+        if rate_limiter is None:
+            rate_limiter = AdaptiveRateLimiter(rate=requests_per_second)
 
         successful_downloads = 0
         processed = 0
-        
-        for i, video in enumerate(videos, 1):
-            video_id = video['id']
-            video_title = video['title']
-            original_title = video['original_title']
-            
-            logger.info(f"Processing video {i}/{len(videos)}: {original_title}")
-            
-            # Check if transcript already exists
-            if os.path.exists(os.path.join(self.output_dir, f"{video_title}.txt")):
-                logger.info("Transcript already exists, skipping...")
-                processed += 1
-                successful_downloads += 1
-                if progress_callback:
-                    progress_callback(i, len(videos), video_title, "skipped")
-                continue
-
-            transcript = self.get_transcript(video_id)
-            if transcript:
-                self.save_transcript(video_id, video_title, original_title, transcript, include_timestamps)
-                logger.info(f"✓ Saved transcript for: {original_title}")
+        videos = []
+        statuses = {}
+
+        def record(video, status):
+            nonlocal processed, successful_downloads
+            processed += 1
+            statuses[video['id']] = status
+            self._record_status(status)
+            if status in ("success", "skipped"):
                 successful_downloads += 1
-                if progress_callback:
-                    progress_callback(i, len(videos), video_title, "success")
+            if progress_callback:
+                progress_callback(processed, len(videos), video['title'], status)
+
+        def listed():
+            try:
+                with self.metrics.timed('enumerate'):
+                    yield from self.iter_channel_videos(max_videos, known=manifest)
+            except Exception as e:
+                logger.error(f"Error getting video information: {str(e)}")
+            if manifest is None:
+                logger.info(f"Found {len(videos)} videos")
+                return
+            logger.info(f"Found {len(videos)} new videos ({len(manifest)} already synced)")
+            yield from self._with_failed(list(videos), manifest)[len(videos):]
+
+        def admit(video):
+            """Count a listed video and tell whether it still needs fetching"""
+            videos.append(video)
+            # Skip saved transcripts, dead-lettered videos and rate-limited ones still cooling down
+            status = self.skip_status(video)
+            if status:
+                logger.info(f"Not fetching ({status}): {video['original_title']}")
+                record(video, status)
+                return False
+            QUEUE_DEPTH.inc()
+            return True
+
+        def process(video):
+            QUEUE_DEPTH.dec()
+            return self._fetch_and_save(video, include_timestamps, rate_limiter)
+
+        def collect(futures, block):
+            # Progress is reported from this thread only, once per completed video
+            done = as_completed(list(futures)) if block else wait(futures, timeout=0).done
+            for future in done:
+                video = futures.pop(future)
+                try:
+                    status = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing video {video['id']}: {str(e)}")
+                    status = "failed"
+                record(video, status)
+
+        self.open_writer()
+        try:
+            if max_workers <= 1:
+                for video in listed():
+                    if admit(video):
+                        logger.info(f"Processing video {processed + 1}/{len(videos)}: {video['original_title']}")
+                        record(video, process(video))
             else:
-                logger.warning(f"✗ Could not get transcript for: {original_title}")
-                if progress_callback:
-                    progress_callback(i, len(videos), video_title, "failed")
-            
-            processed += 1
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(1)
+                logger.info(f"Fetching transcripts with {max_workers} workers as the listing arrives")
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {}
+                    try:
+                        for video in listed():
+                            if admit(video):
+                                futures[executor.submit(process, video)] = video
+                                collect(futures, block=False)
+                        collect(futures, block=True)
+                    finally:
+                        # Videos left unfetched by an error no longer count as queued
+                        QUEUE_DEPTH.dec(sum(future.cancel() for future in futures))
+        finally:
+            unsaved = self.close_writer()
+
+        if not videos:
+            if incremental:
+                logger.info("No new videos since the last sync")
+                return {"success": True, "message": "No new videos since the last sync", "processed": 0,
+                        "successful": 0, "total_found": 0}
+            logger.error("No videos found or unable to extract video information")
+            return {"success": False, "message": "No videos found", "processed": 0, "successful": 0}
+
+        # Videos counted as downloaded whose file the background writer failed to save
+        for video_id in unsaved:
+            statuses[video_id] = "failed"
+        successful_downloads -= len(unsaved)
+
+        if manifest is not None:
+            manifest.record(videos, statuses)
             
         result = {
             "success": True,
             "message": f"Completed! Successfully downloaded {successful_downloads} out of {processed} transcripts.",
             "processed": processed,
             "successful": successful_downloads,
-            "total_found": len(videos)
+            "total_found": len(videos),
+            "metrics": self.metrics.summary()
         }
         
         logger.info(result["message"])
         return result
 
-    def get_existing_transcripts(self):
-        """Get list of existing transcript files"""
-        transcripts = []
-        if os.path.exists(self.output_dir):
-            for filename in os.listdir(self.output_dir):
-                if filename.endswith('.txt'):
-                    file_path = os.path.join(self.output_dir, filename)
-                    file_size = os.path.getsize(file_path)
-                    modified_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    
-                    transcripts.append({
-                        'filename': filename,
-                        'title': filename.replace('.txt', ''),
-                        'size': file_size,
-                        'modified': modified_time.isoformat(),
-                        'path': file_path
-                    })
-        
-        return sorted(transcripts, key=lambda x: x['modified'], reverse=True)
-
-    def get_transcript_content(self, filename):
-        """Get content of a specific transcript file"""
-        file_path = os.path.join(self.output_dir, filename)
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return None
+    def get_existing_transcripts(self, sort='modified', descending=True, limit=None, **filters):
+        """Get list of existing transcript files from the index"""
+        return [
+            listing_item(entry, self.output_dir)
+            for entry in self.index.list(sort=sort, descending=descending, limit=limit, **filters)
+        ]
 
+    def get_transcript_content(self, filename, fmt='txt', timestamps=None, language=None):
+        """Rendered content of a transcript given its video ID or text file name"""
+        entry = self.index.find(filename, language)
+        if entry is None:
+            return None
+        return render_cache.get_or_render(self.output_dir, entry, fmt, timestamps)
@@ -0,0 +1,192 @@
+import logging
+import os
+import re
+
+from compact_store import load_transcript_file
+from languages import DEFAULT_LANGUAGE
+from sqlite_store import SQLiteStore
+from transcript_index import INDEX_DIRNAME
+
+logger = logging.getLogger(__name__)
+
+# One FTS5 row per transcript segment; the full-text index is the term -> postings map
+SEGMENTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text,
+    video_id UNINDEXED,
+    language UNINDEXED,
+    start UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+)"""
+VIDEOS_TABLE = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    title TEXT NOT NULL,
+    first_rowid INTEGER NOT NULL,
+    last_rowid INTEGER NOT NULL,
+    PRIMARY KEY (video_id, language)
+)"""
+SCHEMA = f"{SEGMENTS_TABLE};\n{VIDEOS_TABLE};\n"
+
+QUERY_TOKENS = re.compile(r'"([^"]*)"|(\S+)')
+WORD = re.compile(r'\w+')
+
+
+def search_index_path(output_dir):
+    """Location of the full-text search index for an output directory"""
+    return os.path.join(output_dir, INDEX_DIRNAME, 'search.sqlite3')
+
+
+def build_match_query(query):
+    """Translate a user query into an FTS5 MATCH expression
+
+    "quoted words" are phrase queries, a trailing * makes a prefix query and every
+    part must match. Punctuation is dropped so user input cannot inject FTS5 syntax.
+    """
+    parts = []
+    for phrase, term in QUERY_TOKENS.findall(query):
+        if phrase:
+            words = WORD.findall(phrase)
+            if words:
+                parts.append('"' + " ".join(words) + '"')
+            continue
+        words = WORD.findall(term)
+        if not words:
+            continue
+        parts.extend(f'"{word}"' for word in words)
+        if term.endswith('*'):
+            parts[-1] += '*'
+    return " AND ".join(parts)
+
+
+def timestamp_url(video_id, start):
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(start)}s"
+
+
+class SearchIndex(SQLiteStore):
+    """Incremental full-text index over transcript segments, persisted in SQLite FTS5"""
+
+    SCHEMA = SCHEMA
+    SCHEMA_VERSION = 1
+
+    def migrate(self, conn, version):
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'videos'").fetchone() is None:
+            return
+        # Version 1 indexes each language of a video separately; older rows are all in the default
+        conn.execute("ALTER TABLE segments RENAME TO segments_old")
+        conn.execute("ALTER TABLE videos RENAME TO videos_old")
+        conn.execute(SEGMENTS_TABLE)
+        conn.execute(VIDEOS_TABLE)
+        conn.execute(
+            "INSERT INTO segments (rowid, text, video_id, language, start) "
+            "SELECT rowid, text, video_id, ?, start FROM segments_old", (DEFAULT_LANGUAGE,)
+        )
+        conn.execute(
+            "INSERT INTO videos (video_id, language, title, first_rowid, last_rowid) "
+            "SELECT video_id, ?, title, first_rowid, last_rowid FROM videos_old", (DEFAULT_LANGUAGE,)
+        )
+        conn.execute("DROP TABLE segments_old")
+        conn.execute("DROP TABLE videos_old")
+
+    def add_transcript(self, video_id, title, transcript, language=DEFAULT_LANGUAGE):
+        """(Re)index one video's segments in a language in a single transaction"""
+        self.add_transcripts([(video_id, title, transcript, language)])
+
+    def add_transcripts(self, transcripts):
+        """(Re)index several (video_id, title, transcript, language) in a single transaction"""
+        conn = self._connect()
+        with conn:
+            # Another writer reindexing the same video must not slip in between the lookup and the insert
+            conn.execute("BEGIN IMMEDIATE")
+            for video_id, title, transcript, language in transcripts:
+                self._add(conn, video_id, title, transcript, language)
+
+    def _add(self, conn, video_id, title, transcript, language):
+        self._remove(conn, video_id, language)
+        cursor = conn.executemany(
+            "INSERT INTO segments (text, video_id, language, start) VALUES (?, ?, ?, ?)",
+            ((entry['text'], video_id, language, entry['start']) for entry in transcript)
+        )
+        last_rowid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        # Rows written in one transaction get consecutive rowids
+        first_rowid = last_rowid - cursor.rowcount + 1
+        conn.execute(
+            "INSERT INTO videos (video_id, language, title, first_rowid, last_rowid) VALUES (?, ?, ?, ?, ?)",
+            (video_id, language, title, first_rowid, last_rowid)
+        )
+
+    def _remove(self, conn, video_id, language=None):
+        """Drop one language of a video, or every language if None"""
+        rows = conn.execute(
+            "SELECT language, first_rowid, last_rowid FROM videos "
+            "WHERE video_id = ? AND language = COALESCE(?, language)", (video_id, language)
+        ).fetchall()
+        for row in rows:
+            conn.execute("DELETE FROM segments WHERE rowid BETWEEN ? AND ?", (row['first_rowid'], row['last_rowid']))
+            conn.execute("DELETE FROM videos WHERE video_id = ? AND language = ?", (video_id, row['language']))
+
+    def remove(self, video_id, language=None):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._remove(conn, video_id, language)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM segments")
+            conn.execute("DELETE FROM videos")
+
+    def count(self):
+        """Number of indexed videos, counting each once whatever its languages"""
+        return self._connect().execute("SELECT COUNT(DISTINCT video_id) FROM videos").fetchone()[0]
+
+    def search(self, query, limit=20, offset=0, language=None):
+        """Ranked segment hits with a deep link to the moment each one starts, optionally in one language"""
+        match = build_match_query(query)
+        if not match:
+            return []
+        filter_language = "AND segments.language = ? " if language else ""
+        rows = self._connect().execute(
+            "SELECT segments.video_id, segments.language, segments.start, "
+            "snippet(segments, 0, '[', ']', '...', 16) AS snippet, bm25(segments) AS score, videos.title "
+            "FROM segments LEFT JOIN videos "
+            "ON videos.video_id = segments.video_id AND videos.language = segments.language "
+            f"WHERE segments MATCH ? {filter_language}ORDER BY rank LIMIT ? OFFSET ?",
+            (match, *([language] if language else []), limit, offset)
+        ).fetchall()
+        return [
+            {
+                'video_id': row['video_id'],
+                'language': row['language'],
+                'title': row['title'],
+                'start': row['start'],
+                'text': row['snippet'],
+                'score': round(-row['score'], 4),
+                'url': timestamp_url(row['video_id'], row['start'])
+            }
+            for row in rows
+        ]
+
+    def rebuild(self, output_dir, transcript_index):
+        """Index every transcript listed in transcript_index from its segment file"""
+        self.clear()
+        indexed = 0
+        for entry in transcript_index.iter_languages():
+            try:
+                _, transcript = load_transcript_file(os.path.join(output_dir, entry['json_file']))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable transcript {entry['json_file']}: {str(e)}")
+                continue
+            self.add_transcript(entry['video_id'], entry['title'], transcript, entry['language'])
+            indexed += 1
+        logger.info(f"Rebuilt search index with {indexed} transcripts")
+        return indexed
+
+
+if __name__ == '__main__':
+    import sys
+    from transcript_index import TranscriptIndex
+    logging.basicConfig(level=logging.INFO)
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else 'transcripts'
+    SearchIndex(search_index_path(output_dir)).rebuild(output_dir, TranscriptIndex.open(output_dir))
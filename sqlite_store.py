@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class SQLiteStore:
+    """Base for stores kept in one SQLite file shared by threads and worker processes
+
+    Each thread gets its own connection; WAL mode lets readers run alongside a writer.
+    Subclasses set SCHEMA, which is applied on open. A subclass that changes the shape
+    of an existing table bumps SCHEMA_VERSION and upgrades older files in migrate().
+    """
+
+    SCHEMA = ""
+    SCHEMA_VERSION = 0
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.created = not os.path.exists(db_path)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        if not self.created and self._schema_version(conn) < self.SCHEMA_VERSION:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # Another process may have upgraded the file while this one waited for the lock
+                version = self._schema_version(conn)
+                if version < self.SCHEMA_VERSION:
+                    self.migrate(conn, version)
+                    conn.execute(f"PRAGMA user_version = {int(self.SCHEMA_VERSION)}")
+        with conn:
+            conn.executescript(self.SCHEMA)
+            conn.execute(f"PRAGMA user_version = {int(self.SCHEMA_VERSION)}")
+
+    @classmethod
+    def shared(cls, db_path, **kwargs):
+        """Process-wide instance for db_path, so every scraper and request reuses one store
+
+        kwargs are passed to the constructor by the first call only.
+        """
+        key = (cls, os.path.abspath(db_path))
+        with _shared_lock:
+            if key not in _shared:
+                _shared[key] = cls(db_path, **kwargs)
+            return _shared[key]
+
+    @staticmethod
+    def _schema_version(conn):
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self, conn, version):
+        """Upgrade a file created with schema `version` inside one transaction, before SCHEMA is applied
+
+        Use conn.execute only: executescript would commit the transaction part way.
+        """
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
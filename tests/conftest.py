@@ -0,0 +1,32 @@
+"""Shared fixtures; the web app keeps its data under the working directory, so it gets a scratch one"""
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def web(tmp_path_factory):
+    """The app module, imported once with jobs off in a scratch working directory"""
+    workdir = tmp_path_factory.mktemp('web')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('SCRAPER_RUN_JOBS', '0')
+        patch.setenv('SCRAPER_DEDUP', '0')
+        patch.chdir(workdir)
+        import app
+        yield app
+
+
+@pytest.fixture
+def corpus(web):
+    """The web app's transcripts directory, emptied before and after the test"""
+    def clear():
+        web.app.test_client().get('/api/clear')
+        shutil.rmtree(web.EXPORTS_DIR, ignore_errors=True)
+
+    clear()
+    yield web.TRANSCRIPTS_DIR
+    clear()
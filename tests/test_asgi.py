@@ -0,0 +1,79 @@
+"""ASGI entry point: Flask requests must not queue behind each other"""
+import asyncio
+import time
+
+from flask import Flask, Response
+
+SLOW_SECONDS = 0.5
+
+
+async def call(application, path):
+    """Drive one GET through an ASGI app and return (status, body)"""
+    messages = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b''}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [],
+             'http_version': '1.1', 'root_path': ''}
+    await application(scope, receive, send)
+    return messages[0]['status'], b"".join(message.get('body', b"") for message in messages[1:])
+
+
+def gather(application, paths):
+    async def run():
+        started = time.monotonic()
+        responses = await asyncio.gather(*(call(application, path) for path in paths))
+        return responses, time.monotonic() - started
+    return asyncio.run(run())
+
+
+def test_slow_requests_run_side_by_side(web):
+    import asgi
+
+    app = Flask(__name__)
+
+    @app.route('/slow')
+    def slow():
+        time.sleep(SLOW_SECONDS)
+        return 'done'
+
+    @app.route('/stream')
+    def stream():
+        def chunks():
+            for n in range(5):
+                time.sleep(SLOW_SECONDS / 5)
+                yield f"{n}".encode()
+        return Response(chunks())
+
+    responses, elapsed = gather(asgi.ThreadedWsgiToAsgi(app, threads=8), ['/slow'] * 4 + ['/stream'])
+
+    assert responses[:4] == [(200, b'done')] * 4
+    assert responses[4] == (200, b'01234')
+    # One at a time they would take five times as long
+    assert elapsed < 2 * SLOW_SECONDS
+
+
+def test_health_answers_during_a_slow_request(web, monkeypatch):
+    import asgi
+
+    health = web.app.view_functions['health']
+
+    def slow_health():
+        time.sleep(SLOW_SECONDS)
+        return health()
+
+    monkeypatch.setitem(web.app.view_functions, 'health', slow_health)
+    responses, elapsed = gather(asgi.application, ['/health'] * 4)
+
+    assert [status for status, _ in responses] == [200] * 4
+    assert b'healthy' in responses[0][1]
+    assert elapsed < 2 * SLOW_SECONDS
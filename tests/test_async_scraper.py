@@ -0,0 +1,57 @@
+"""Async engine against blocking and async-native fake backends"""
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_scraper
+from async_scraper import AsyncYouTubeChannelScraper
+from fake_youtube import FakeChannel, FakeTranscriptBackend
+
+VIDEOS = 40
+
+
+class BlockingBackend(FakeTranscriptBackend):
+    """The fake backend without its coroutine methods, like youtube-transcript-api"""
+
+    list_async = None
+    get_transcript_async = None
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+def fetch_threads():
+    return sum(thread.name.startswith('transcript-fetch') for thread in threading.enumerate())
+
+
+def scrape(tmp_path, backend, channel, max_in_flight):
+    scraper = AsyncYouTubeChannelScraper(f"https://www.youtube.com/@{channel}", str(tmp_path / channel),
+                                         transcript_api=backend, max_in_flight=max_in_flight)
+    scraper.iter_tab_entries = FakeChannel(VIDEOS, page_size=10).iter_tab_entries
+    return asyncio.run(scraper.scrape_all_transcripts_async(requests_per_second=10000))
+
+
+def test_blocking_fetches_share_one_pool(tmp_path):
+    for n in range(5):
+        backend = BlockingBackend(latency=0.01)
+        result = scrape(tmp_path, backend, f"channel{n}", max_in_flight=8)
+        assert result['successful'] == VIDEOS
+        assert 1 < backend.max_in_flight <= 8
+    # Five scrapers with a pool each would leave 40 idle fetch threads behind
+    assert fetch_threads() <= async_scraper._fetch_pool_threads
+
+
+def test_async_backend_starts_no_fetch_threads(tmp_path):
+    before = fetch_threads()
+    backend = FakeTranscriptBackend(latency=0.01)
+    result = scrape(tmp_path, backend, "native", max_in_flight=VIDEOS)
+    assert result['successful'] == VIDEOS
+    assert backend.max_in_flight > 8
+    assert fetch_threads() == before
@@ -0,0 +1,99 @@
+"""Multi-channel batches: fair scheduling and fetching while channels are still being listed"""
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_scraper import AsyncYouTubeChannelScraper
+from batch import FairScheduler, parse_channel, scrape_batch_async
+from fake_youtube import FakeChannel, FakeTranscriptBackend
+
+BIG = "https://www.youtube.com/@big"
+SMALL = "https://www.youtube.com/@small"
+
+
+class ListingBackend(FakeTranscriptBackend):
+    """Fake backend that notes how many listing pages had been served when each fetch began"""
+
+    def __init__(self, channels, **kwargs):
+        super().__init__(**kwargs)
+        self.channels = channels
+        self.pages_at_fetch = []
+
+    async def list_async(self, video_id):
+        self.pages_at_fetch.append(self.channels[BIG].pages)
+        return await super().list_async(video_id)
+
+
+@pytest.fixture
+def channels(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+    channels = {
+        BIG: FakeChannel(200, page_size=20, page_latency=0.03),
+        SMALL: FakeChannel(10, page_size=20),
+    }
+    monkeypatch.setattr(AsyncYouTubeChannelScraper, 'iter_tab_entries',
+                        lambda self, url: channels[self.channel_url].iter_tab_entries(url))
+    return channels
+
+
+def test_scheduler_shares_slots_by_priority():
+    scheduler = FairScheduler()
+    scheduler.add('a', range(100), priority=2)
+    scheduler.add('b', range(100), priority=1)
+    first = [scheduler.next()[0] for _ in range(30)]
+    assert first.count('a') == 20
+    assert first.count('b') == 10
+    assert len(scheduler) == 170
+
+
+def test_parse_channel():
+    assert parse_channel("https://www.youtube.com/@x 2.5") == {'url': "https://www.youtube.com/@x", 'priority': 2.5}
+    with pytest.raises(ValueError):
+        parse_channel({'url': "https://www.youtube.com/@x", 'priority': 0})
+
+
+def test_fetching_starts_while_a_channel_is_listed(tmp_path, channels, monkeypatch):
+    loop_threads = set()
+    skip_threads = set()
+    skip_status = AsyncYouTubeChannelScraper.skip_status
+
+    def recording_skip_status(self, video):
+        skip_threads.add(threading.current_thread())
+        return skip_status(self, video)
+
+    monkeypatch.setattr(AsyncYouTubeChannelScraper, 'skip_status', recording_skip_status)
+    backend = ListingBackend(channels, latency=0.001)
+
+    async def run():
+        loop_threads.add(threading.current_thread())
+        return await scrape_batch_async([BIG, SMALL], str(tmp_path), transcript_api=backend, max_in_flight=8,
+                                        requests_per_second=10000)
+
+    result = asyncio.run(run())
+
+    assert result['processed'] == result['successful'] == 210
+    assert result['channels'][BIG]['found'] == 200
+    # Listing the big channel takes 10 pages; its first fetches must not wait for all of them
+    assert min(backend.pages_at_fetch) < 10
+    assert skip_threads and not skip_threads & loop_threads
+
+
+def test_incremental_batch_records_each_channel(tmp_path, channels):
+    backend = FakeTranscriptBackend(latency=0.001)
+
+    def run():
+        return asyncio.run(scrape_batch_async([BIG, SMALL], str(tmp_path), transcript_api=backend,
+                                              max_in_flight=8, requests_per_second=10000, incremental=True))
+
+    first = run()
+    calls = backend.calls
+    second = run()
+
+    assert first['successful'] == 210
+    assert second['processed'] == 0
+    assert backend.calls == calls
@@ -0,0 +1,119 @@
+"""Compact .tsb transcripts: round trips, random access and the JSON files they replace"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_store import (CompactTranscript, compact_filename, convert_directory, load_transcript_file,
+                           read_compact, read_segments, write_compact)
+from fake_youtube import FakeTranscriptBackend, make_transcript
+from scraper import YouTubeChannelScraper
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+METADATA = {
+    'video_id': "vid0001", 'title': "Ünïcode — títle", 'language': 'en', 'scraped_at': "2026-01-01T00:00:00",
+}
+# Durations that a float32 holds exactly; texts of every length, including none
+TRANSCRIPT = [
+    {'text': ["", "hello", "naïve café ☕", "line\nbreak", "x" * 300][n % 5], 'start': n * 2.25, 'duration': 2.5}
+    for n in range(23)
+]
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+@pytest.fixture
+def compact_path(tmp_path):
+    path = str(tmp_path / compact_filename("vid0001"))
+    # Small blocks, so lookups cross block boundaries and the last block is partial
+    write_compact(path, METADATA, TRANSCRIPT, block_size=4)
+    return path
+
+
+def write_json(path, metadata, transcript):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({**metadata, 'transcript': transcript}, f, ensure_ascii=False, indent=2)
+
+
+def test_round_trip(compact_path):
+    assert read_compact(compact_path) == (METADATA, TRANSCRIPT)
+    assert load_transcript_file(compact_path) == (METADATA, TRANSCRIPT)
+
+
+def test_random_access(compact_path):
+    with CompactTranscript(compact_path) as transcript:
+        assert len(transcript) == len(TRANSCRIPT)
+        for i in (22, 0, 5, 4, 3, 21):
+            assert transcript.segment(i) == TRANSCRIPT[i]
+        with pytest.raises(IndexError):
+            transcript.segment(23)
+
+
+def test_empty_transcript(tmp_path):
+    path = str(tmp_path / compact_filename("empty"))
+    write_compact(path, METADATA, [])
+    assert read_compact(path) == (METADATA, [])
+    assert read_segments(path) == []
+
+
+@pytest.mark.parametrize('data', [b'{"video_id": "vid0001", "transcript": []}', b'YTTS\x01\x00', b''])
+def test_not_a_compact_file(tmp_path, data):
+    path = tmp_path / compact_filename("vid0001")
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        CompactTranscript(str(path))
+
+
+@pytest.mark.parametrize('start_time, end_time',
+                         [(0.0, None), (10.0, 20.0), (11.0, 11.5), (49.5, None), (60.0, None)])
+def test_time_slices_match_json(tmp_path, compact_path, start_time, end_time):
+    json_path = str(tmp_path / "vid0001_transcript.json")
+    write_json(json_path, METADATA, TRANSCRIPT)
+    # 11.0 falls inside the segment that started at 9.0, which is still included
+    assert read_segments(compact_path, start_time, end_time) == read_segments(json_path, start_time, end_time)
+
+
+def test_json_files_load_as_before(tmp_path):
+    json_path = str(tmp_path / "vid0001_transcript.json")
+    write_json(json_path, METADATA, TRANSCRIPT)
+    assert load_transcript_file(json_path) == (METADATA, TRANSCRIPT)
+
+
+def test_compact_storage_saves_what_json_storage_does(tmp_path):
+    transcript = make_transcript("vid0001", 150)
+    loaded = {}
+    for storage in ('json', 'compact'):
+        output_dir = str(tmp_path / storage)
+        scraper = YouTubeChannelScraper(CHANNEL_URL, output_dir, transcript_api=FakeTranscriptBackend(),
+                                        storage=storage)
+        scraper.save_transcript("vid0001", "Video 1", "Video #1", transcript)
+        entry = scraper.index.get("vid0001")
+        loaded[storage] = load_transcript_file(os.path.join(output_dir, entry['json_file']))
+
+    assert scraper.index.get("vid0001")['json_file'] == compact_filename("vid0001")
+    json_metadata, json_segments = loaded['json']
+    compact_metadata, compact_segments = loaded['compact']
+    assert compact_segments == json_segments == transcript
+    assert set(compact_metadata) == set(json_metadata)
+    assert compact_metadata['video_id'] == "vid0001"
+
+
+def test_convert_directory(tmp_path):
+    write_json(str(tmp_path / "vid0001_transcript.json"), METADATA, TRANSCRIPT)
+    write_json(str(tmp_path / "vid0001.de_transcript.json"), {**METADATA, 'language': 'de'}, TRANSCRIPT[:3])
+    # A compact file already there for another video is not overwritten
+    write_json(str(tmp_path / "vid0002_transcript.json"), {**METADATA, 'video_id': "vid0002"}, TRANSCRIPT)
+    write_compact(str(tmp_path / compact_filename("vid0002")), METADATA, [])
+
+    assert convert_directory(str(tmp_path), delete=True) == 2
+
+    assert read_compact(str(tmp_path / compact_filename("vid0001"))) == (METADATA, TRANSCRIPT)
+    assert read_compact(str(tmp_path / compact_filename("vid0001.de")))[1] == TRANSCRIPT[:3]
+    assert read_compact(str(tmp_path / compact_filename("vid0002"))) == (METADATA, [])
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.json')) == ["vid0002_transcript.json"]
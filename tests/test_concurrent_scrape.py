@@ -0,0 +1,110 @@
+"""Concurrent scrapes against the fake backend, with injected failures, timeouts and throttling
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_youtube import FakeChannel, FakeTranscriptBackend
+from rate_limiter import AdaptiveRateLimiter
+from retry import RetryPolicy
+from scraper import YouTubeChannelScraper
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+VIDEOS = 120
+
+
+class RecordingRateLimiter(AdaptiveRateLimiter):
+    """AdaptiveRateLimiter that remembers its rate just before and after every on_throttle"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.throttles = []
+        self._record_lock = threading.Lock()
+
+    def on_throttle(self):
+        # Held across the call so concurrent throttles are recorded in the order they apply
+        with self._record_lock:
+            before = self.rate
+            super().on_throttle()
+            self.throttles.append((before, self.rate))
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    # The duplicate check's helper process is not what these tests are about
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+def make_scraper(tmp_path, backend, videos=VIDEOS):
+    scraper = YouTubeChannelScraper(CHANNEL_URL, str(tmp_path), transcript_api=backend,
+                                    retry_policy=RetryPolicy(base_delay=0.001, max_delay=0.01))
+    scraper.iter_tab_entries = FakeChannel(videos, page_size=25).iter_tab_entries
+    return scraper
+
+
+def scrape(scraper, **kwargs):
+    callbacks = []
+    result = scraper.scrape_all_transcripts(
+        progress_callback=lambda processed, total, title, status: callbacks.append((processed, title, status)),
+        **kwargs
+    )
+    return result, callbacks
+
+
+@pytest.mark.parametrize('max_workers', [1, 8])
+def test_one_callback_per_video(tmp_path, max_workers):
+    backend = FakeTranscriptBackend(latency=0.002, error_rate=0.1, timeout_rate=0.1, seed=3)
+    # Timeouts back the rate off too; the floor keeps the test quick
+    limiter = AdaptiveRateLimiter(rate=1000.0, min_rate=200.0)
+    result, callbacks = scrape(make_scraper(tmp_path, backend), max_workers=max_workers, rate_limiter=limiter)
+
+    titles = [title for _, title, _ in callbacks]
+    assert len(titles) == VIDEOS
+    assert len(set(titles)) == VIDEOS
+    assert [processed for processed, _, _ in callbacks] == list(range(1, VIDEOS + 1))
+
+    statuses = [status for _, _, status in callbacks]
+    assert result['processed'] == VIDEOS
+    assert result['total_found'] == VIDEOS
+    assert result['successful'] == statuses.count('success')
+    assert 'dead_letter' in statuses
+    assert result['successful'] + statuses.count('failed') + statuses.count('dead_letter') == VIDEOS
+    assert result['metrics']['videos']['success'] == result['successful']
+
+
+def test_failures_are_skipped_on_the_next_run(tmp_path):
+    backend = FakeTranscriptBackend(latency=0.002, error_rate=0.2, seed=5)
+    scraper = make_scraper(tmp_path, backend)
+    first, _ = scrape(scraper, max_workers=8, requests_per_second=1000)
+    calls = backend.calls
+
+    second, callbacks = scrape(scraper, max_workers=8, requests_per_second=1000)
+
+    assert backend.calls == calls
+    assert second['processed'] == VIDEOS
+    assert second['successful'] == first['successful']
+    statuses = [status for _, _, status in callbacks]
+    assert statuses.count('skipped') == first['successful']
+    assert statuses.count('dead_letter') == VIDEOS - first['successful']
+
+
+def test_throttling_lowers_the_rate(tmp_path):
+    backend = FakeTranscriptBackend(latency=0.002, throttle_rate=0.15, seed=7)
+    limiter = RecordingRateLimiter(rate=1000.0, min_rate=100.0, max_rate=1000.0)
+    result, callbacks = scrape(make_scraper(tmp_path, backend), max_workers=8, rate_limiter=limiter)
+
+    assert len(callbacks) == VIDEOS
+    statuses = [status for _, _, status in callbacks]
+    # Rate-limited videos are not retried within the run, so each one throttled once
+    assert len(limiter.throttles) == statuses.count('failed') > 0
+    for before, after in limiter.throttles:
+        assert after < before or before == limiter.min_rate
+    assert limiter.throttles[0][1] == pytest.approx(500.0)
+    assert limiter.rate < 1000.0
+    assert result['successful'] + statuses.count('failed') == VIDEOS
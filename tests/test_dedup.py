@@ -0,0 +1,133 @@
+"""Near-duplicate videos (MinHash/LSH) and recurring boilerplate passages"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DedupIndex, strip_ranges
+
+VOCABULARY = [f"word{n}" for n in range(3000)]
+SEGMENT_WORDS = 8
+SEGMENT_SECONDS = 4.0
+
+
+def words(seed, count):
+    rng = random.Random(seed)
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+
+def segments(text_words):
+    return [
+        {'text': " ".join(text_words[i:i + SEGMENT_WORDS]), 'start': i // SEGMENT_WORDS * SEGMENT_SECONDS,
+         'duration': SEGMENT_SECONDS}
+        for i in range(0, len(text_words), SEGMENT_WORDS)
+    ]
+
+
+def edited(text_words, changes, seed):
+    """A copy with `changes` words replaced, e.g. a re-upload with a corrected caption or two"""
+    rng = random.Random(seed)
+    copy = list(text_words)
+    for position in rng.sample(range(len(copy)), changes):
+        copy[position] = rng.choice(VOCABULARY)
+    return copy
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DedupIndex(str(tmp_path / 'dedup.sqlite3'))
+
+
+def test_near_duplicates_point_at_the_original(index):
+    talk = words(1, 800)
+    assert index.add_transcript("original", segments(talk)) is None
+    assert index.add_transcript("reupload", segments(edited(talk, 6, seed=2))) == "original"
+    # A copy of the copy still points at the first upload
+    assert index.add_transcript("second", segments(edited(talk, 6, seed=3))) == "original"
+    assert index.add_transcript("unrelated", segments(words(4, 800))) is None
+    assert index.add_transcript("rewritten", segments(edited(talk, 300, seed=5))) is None
+
+    duplicates = {row['video_id']: row for row in index.duplicates()}
+    assert set(duplicates) == {"reupload", "second"}
+    assert duplicates["reupload"]['similarity'] >= index.threshold
+    assert index.stats()['duplicates'] == 2
+
+
+def test_removing_the_original_frees_its_copies(index):
+    talk = words(1, 800)
+    index.add_transcript("original", segments(talk))
+    index.add_transcript("reupload", segments(edited(talk, 6, seed=2)))
+    index.remove("original")
+    assert index.duplicate_of("reupload") is None
+    # Indexing a video again replaces its old signature instead of matching it
+    assert index.add_transcript("reupload", segments(talk)) is None
+
+
+def test_languages_are_indexed_separately(index):
+    talk = words(1, 800)
+    index.add_transcript("original", segments(talk))
+    index.add_transcript("original", segments(words(6, 800)), language='de')
+    assert index.duplicate_of("original", 'de') is None
+    assert index.add_transcript("reupload", segments(talk), language='de') == "original"
+
+
+SPONSOR = words(99, 96)
+
+
+def with_sponsor(seed, prefix_segments):
+    """A talk with the sponsor read after prefix_segments segments; returns it and the read's time range"""
+    before = words(seed, prefix_segments * SEGMENT_WORDS)
+    after = words(seed + 1000, 400)
+    start = prefix_segments * SEGMENT_SECONDS
+    return segments(before + SPONSOR + after), (start, start + len(SPONSOR) // SEGMENT_WORDS * SEGMENT_SECONDS)
+
+
+def test_boilerplate_needs_min_videos(index):
+    sponsored = {f"talk{n}": with_sponsor(n, prefix_segments=3 * n) for n in range(4)}
+
+    for video_id in ("talk0", "talk1"):
+        index.add_transcript(video_id, sponsored[video_id][0])
+    assert index.boilerplate("talk0") == []
+
+    index.add_transcript("talk2", sponsored["talk2"][0])
+    for video_id in ("talk0", "talk1", "talk2"):
+        transcript, (start, end) = sponsored[video_id]
+        ranges = index.boilerplate(video_id)
+        assert ranges
+        assert all(start <= range_start and range_end <= end for range_start, range_end in ranges)
+
+        # Stripping drops only segments of the sponsor read
+        kept = strip_ranges(transcript, ranges)
+        assert len(kept) < len(transcript)
+        assert all(segment in kept for segment in transcript if not start <= segment['start'] < end)
+
+    assert set(index.marks()) == {("talk0", 'en'), ("talk1", 'en'), ("talk2", 'en')}
+    assert index.marks()[("talk0", 'en')][0] is None
+
+
+def test_removing_a_video_updates_repeat_counts(index):
+    for n in range(3):
+        index.add_transcript(f"talk{n}", with_sponsor(n, prefix_segments=3 * n)[0])
+    assert index.boilerplate("talk0")
+
+    index.remove("talk2")
+    assert index.boilerplate("talk0") == []
+    assert index.stats()['boilerplate_windows'] == 0
+
+    # Indexing the same video again must not count it twice
+    index.add_transcript("talk1", with_sponsor(1, prefix_segments=3)[0])
+    assert index.boilerplate("talk0") == []
+
+
+def test_background_stage(index):
+    talk = words(1, 800)
+    stage = index.background()
+    stage.submit("original", segments(talk))
+    stage.flush()
+    stage.submit("reupload", segments(edited(talk, 6, seed=2)))
+    stage.close()
+    assert index.duplicate_of("reupload") == "original"
+    assert stage.dropped == 0
@@ -0,0 +1,168 @@
+"""Bulk export: incremental re-export of shards, and export jobs queued from the web API"""
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export import ExportCancelled, export_corpus, load_manifest
+from fake_youtube import FakeTranscriptBackend, make_transcript
+from job_queue import JobManager
+from scraper import YouTubeChannelScraper
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+# About 300 KB of segment file per transcript, so a 1 MB shard holds three or four
+SEGMENTS = 2500
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+def ids(numbers):
+    return [f"vid{n:04d}" for n in numbers]
+
+
+def save(output_dir, video_ids, segments=SEGMENTS):
+    scraper = YouTubeChannelScraper(CHANNEL_URL, str(output_dir), transcript_api=FakeTranscriptBackend())
+    for video_id in video_ids:
+        scraper.save_transcript(video_id, f"Video {video_id}", f"Video {video_id}!",
+                                make_transcript(video_id, segments))
+
+
+def export(output_dir, export_dir, **kwargs):
+    return export_corpus(str(output_dir), str(export_dir), formats=['jsonl'], shard_mb=1, workers=1, **kwargs)
+
+
+def shard_files(export_dir, manifest):
+    """{shard name: (file name, mtime)} of an export's JSONL files"""
+    return {
+        shard['name']: (shard['files']['jsonl']['file'],
+                        os.stat(os.path.join(export_dir, shard['files']['jsonl']['file'])).st_mtime_ns)
+        for shard in manifest['shards']
+    }
+
+
+def jsonl_records(export_dir, manifest):
+    records = []
+    for shard in manifest['shards']:
+        with open(os.path.join(export_dir, shard['files']['jsonl']['file']), encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+@pytest.fixture
+def exported(tmp_path):
+    output_dir, export_dir = tmp_path / 'transcripts', tmp_path / 'export'
+    save(output_dir, ids(range(12)))
+    manifest = export(output_dir, export_dir)
+    return output_dir, export_dir, manifest
+
+
+def test_first_export_writes_every_shard(exported):
+    _, export_dir, manifest = exported
+    assert len(manifest['shards']) >= 3
+    assert manifest['written'] == len(manifest['shards'])
+    assert manifest['kept'] == 0
+    assert manifest['transcripts'] == 12
+    records = jsonl_records(export_dir, manifest)
+    assert [record['video_id'] for record in records] == ids(range(12))
+    assert len(records[0]['segments']) == SEGMENTS
+
+
+def test_unchanged_shards_are_kept(exported):
+    output_dir, export_dir, manifest = exported
+    files = shard_files(export_dir, manifest)
+
+    again = export(output_dir, export_dir)
+
+    assert again['written'] == 0
+    assert again['kept'] == len(manifest['shards'])
+    assert shard_files(export_dir, again) == files
+
+
+def test_a_resaved_transcript_rewrites_only_its_shard(exported):
+    output_dir, export_dir, manifest = exported
+    files = shard_files(export_dir, manifest)
+    changed = next(shard['name'] for shard in manifest['shards']
+                   if shard['first_key'][0] <= 'vid0005' <= shard['last_key'][0])
+
+    save(output_dir, ['vid0005'], segments=SEGMENTS + 1)
+    again = export(output_dir, export_dir)
+
+    assert again['written'] == 1
+    assert again['kept'] == len(manifest['shards']) - 1
+    after = shard_files(export_dir, again)
+    assert after.keys() == files.keys()
+    assert [name for name in files if after[name] != files[name]] == [changed]
+    resaved = next(record for record in jsonl_records(export_dir, again) if record['video_id'] == 'vid0005')
+    assert len(resaved['segments']) == SEGMENTS + 1
+
+
+def test_an_oversized_shard_is_split(exported):
+    output_dir, export_dir, manifest = exported
+    files = shard_files(export_dir, manifest)
+    grown = next(shard['name'] for shard in manifest['shards'] if shard['first_key'][0] == 'vid0003')
+
+    # These sort between vid0004 and vid0005, doubling a full shard
+    save(output_dir, ['vid0004a', 'vid0004b', 'vid0004c'])
+    again = export(output_dir, export_dir)
+
+    assert again['transcripts'] == 15
+    assert len(again['shards']) == len(manifest['shards']) + 1
+    assert again['written'] == 2
+    assert again['kept'] == len(manifest['shards']) - 1
+    after = shard_files(export_dir, again)
+    assert all(after[name] == files[name] for name in files if name != grown)
+    # The grown shard keeps its name and start; the spill-over starts a new shard
+    split = [shard for shard in again['shards'] if shard['name'] not in files or shard['name'] == grown]
+    assert [shard['name'] for shard in split][0] == grown
+    assert [shard['first_key'][0] for shard in split] == ['vid0003', 'vid0004b']
+    assert [shard['transcripts'] for shard in split] == [3, 3]
+    assert [record['video_id'] for record in jsonl_records(export_dir, again)] == sorted(
+        ids(range(12)) + ['vid0004a', 'vid0004b', 'vid0004c'])
+    # Nothing is left in the export directory that the manifest does not list
+    assert sorted(os.listdir(export_dir)) == sorted([file for file, _ in after.values()] + ['manifest.json'])
+
+
+def test_a_stopped_export_keeps_the_previous_manifest(exported):
+    output_dir, export_dir, manifest = exported
+    save(output_dir, ids(range(12, 16)))
+    stop = threading.Event()
+    stop.set()
+
+    with pytest.raises(ExportCancelled):
+        export(output_dir, export_dir, stop=stop)
+
+    assert load_manifest(str(export_dir))['created_at'] == manifest['created_at']
+
+
+def test_export_api_queues_a_job(web, corpus):
+    save(corpus, ids(range(3)), segments=50)
+    client = web.app.test_client()
+
+    response = client.post('/api/export', json={'name': 'nightly', 'formats': 'jsonl'})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert client.post('/api/export', json={'name': 'nightly'}).status_code == 409
+    assert client.post('/api/export', json={'name': 'other', 'shard_mb': 'big'}).status_code == 400
+
+    manager = JobManager(web.job_store, runner=None, output_dir=web.TRANSCRIPTS_DIR)
+    asyncio.run(manager._run(web.job_store.get(job_id)))
+
+    job = client.get(f'/api/jobs/{job_id}').get_json()
+    assert job['status'] == 'completed'
+    assert job['results']['transcripts'] == 3
+    assert job['results']['written'] == job['results']['shards'] == 1
+    manifest = client.get('/api/export/nightly').get_json()
+    shard_file = manifest['shards'][0]['files']['jsonl']['file']
+    download = client.get(f'/api/export/nightly/{shard_file}')
+    assert download.status_code == 200
+    assert len(download.data.splitlines()) == 3
+    # Finished, so the name can be exported again
+    assert client.post('/api/export', json={'name': 'nightly'}).status_code == 202
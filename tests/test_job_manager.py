@@ -0,0 +1,75 @@
+"""JobManager: claiming, cancelling and keeping the shared event loop free of SQLite waits"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import JobManager, JobStore
+
+
+class SlowJobStore(JobStore):
+    """JobStore whose claims wait as if another process held the write lock"""
+
+    delay = 0.5
+
+    def claim(self, owner, lease_seconds, max_running):
+        time.sleep(self.delay)
+        return super().claim(owner, lease_seconds, max_running)
+
+
+class SleepingScraper:
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def scrape_all_transcripts_async(self, **kwargs):
+        self.started.set()
+        await asyncio.sleep(60)
+
+
+def make_manager(store, scraper=None):
+    return JobManager(store, runner=None, max_concurrent_jobs=1, scraper_factory=lambda job: scraper)
+
+
+def test_slow_claims_do_not_block_the_loop(tmp_path):
+    manager = make_manager(SlowJobStore(str(tmp_path / 'jobs.sqlite3')))
+
+    async def run():
+        beats = 0
+
+        async def heartbeat():
+            nonlocal beats
+            while True:
+                await asyncio.sleep(0.01)
+                beats += 1
+
+        beating = asyncio.create_task(heartbeat())
+        await manager._tick()
+        beating.cancel()
+        return beats
+
+    # A tick that held the loop for the whole claim would let the heartbeat run at most once
+    assert asyncio.run(run()) >= 10
+
+
+def test_cancel_requested_stops_the_running_job(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    scraper = SleepingScraper()
+    manager = make_manager(store, scraper)
+    job = store.create("https://www.youtube.com/@fakechannel", {'max_workers': 1})
+
+    async def run():
+        await manager._tick()
+        assert store.get(job['id'])['status'] == 'running'
+        await asyncio.wait_for(scraper.started.wait(), 5)
+        store.cancel(job['id'])
+        task = manager.tasks[job['id']]
+        await manager._tick()
+        await asyncio.wait([task], timeout=5)
+
+    asyncio.run(run())
+    cancelled = store.get(job['id'])
+    assert cancelled['status'] == 'cancelled'
+    assert cancelled['lease_expires'] is None
+    assert manager.tasks == {}
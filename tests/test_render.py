@@ -0,0 +1,141 @@
+"""Rendering transcripts as txt, srt, vtt and md, and the cache of renderings"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_youtube import FakeTranscriptBackend, make_transcript
+from render import RenderCache, download_name, render_text
+from scraper import YouTubeChannelScraper
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+METADATA = {
+    'video_id': "vid0001",
+    'title': "A talk",
+    'url': "https://www.youtube.com/watch?v=vid0001",
+    'scraped_at': "2026-01-02T03:04:05.678901",
+}
+SEGMENTS = [
+    {'text': "Hello", 'start': 0.0, 'duration': 1.5},
+    # No duration: the cue runs until the next segment starts
+    {'text': "two\nlines", 'start': 1.5, 'duration': 0.0},
+    {'text': "later", 'start': 3725.25, 'duration': 2.0},
+    {'text': "the end", 'start': 3770.0},
+]
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+def test_txt():
+    header = (
+        "Title: A talk\n"
+        "Video ID: vid0001\n"
+        "URL: https://www.youtube.com/watch?v=vid0001\n"
+        "Scraped: 2026-01-02 03:04:05\n"
+        + "-" * 50 + "\n\n"
+    )
+    assert render_text(METADATA, SEGMENTS) == header + "Hello\ntwo\nlines\nlater\nthe end\n"
+    assert render_text(METADATA, SEGMENTS, timestamps=True) == header + (
+        "[00:00:00] Hello\n[00:00:01] two\nlines\n[01:02:05] later\n[01:02:50] the end\n"
+    )
+    # Without an explicit choice, the one recorded at scrape time applies
+    assert render_text({**METADATA, 'include_timestamps': True}, SEGMENTS) == render_text(METADATA, SEGMENTS,
+                                                                                          timestamps=True)
+
+
+def test_srt():
+    assert render_text(METADATA, SEGMENTS, 'srt') == (
+        "1\n00:00:00,000 --> 00:00:01,500\nHello\n\n"
+        "2\n00:00:01,500 --> 01:02:05,250\ntwo\nlines\n\n"
+        "3\n01:02:05,250 --> 01:02:07,250\nlater\n\n"
+        "4\n01:02:50,000 --> 01:02:52,000\nthe end\n\n"
+    )
+
+
+def test_vtt():
+    assert render_text(METADATA, SEGMENTS[:1], 'vtt') == "WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nHello\n\n"
+
+
+def test_md():
+    assert render_text(METADATA, SEGMENTS, 'md') == (
+        "# A talk\n\n[Watch on YouTube](https://www.youtube.com/watch?v=vid0001)"
+        "\n\nHello two lines"
+        "\n\nlater the end\n"
+    )
+    linked = render_text(METADATA, SEGMENTS, 'md', timestamps=True)
+    assert "\n\n[01:02:05](https://www.youtube.com/watch?v=vid0001&t=3725s) later the end\n" in linked
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        render_text(METADATA, SEGMENTS, 'pdf')
+
+
+def test_download_name():
+    assert download_name({'txt_file': "A talk.txt"}, 'srt') == "A talk.srt"
+
+
+@pytest.fixture
+def scraper(tmp_path):
+    return YouTubeChannelScraper(CHANNEL_URL, str(tmp_path), transcript_api=FakeTranscriptBackend())
+
+
+def save(scraper, text):
+    segments = [{**segment, 'text': f"{text} {n}"} for n, segment in enumerate(make_transcript("vid0001", 3))]
+    scraper.save_transcript("vid0001", "Video 1", "Video #1", segments)
+    return scraper.index.get("vid0001")
+
+
+def test_cache_hits_until_the_video_is_saved_again(scraper):
+    cache = RenderCache()
+    entry = save(scraper, "first")
+
+    for fmt in ('txt', 'srt', 'txt', 'srt'):
+        assert "first 2" in cache.get_or_render(scraper.output_dir, entry, fmt)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # A re-scrape gets a new scraped_at, so the old renderings no longer match
+    entry = save(scraper, "second")
+    text = cache.get_or_render(scraper.output_dir, entry, 'txt')
+    assert "second 2" in text and "first" not in text
+    assert cache.misses == 3
+
+
+def test_cache_stays_within_its_size(scraper):
+    entry = save(scraper, "text")
+    size = len(RenderCache().get_or_render(scraper.output_dir, entry, 'txt'))
+    cache = RenderCache(max_bytes=2 * size)
+
+    for timestamps in (False, None, False, True):
+        cache.get_or_render(scraper.output_dir, entry, 'txt', timestamps)
+    assert cache.hits == 1
+    assert cache._size <= cache.max_bytes
+    # The least recently used rendering was evicted
+    cache.get_or_render(scraper.output_dir, entry, 'txt', None)
+    assert cache.hits == 1
+
+    tiny = RenderCache(max_bytes=size - 1)
+    tiny.get_or_render(scraper.output_dir, entry, 'txt')
+    tiny.get_or_render(scraper.output_dir, entry, 'txt')
+    assert (tiny.hits, tiny._size) == (0, 0)
+
+
+def test_transcript_api_formats(web, corpus):
+    scraper = YouTubeChannelScraper(CHANNEL_URL, corpus, transcript_api=FakeTranscriptBackend())
+    save(scraper, "first")
+    client = web.app.test_client()
+
+    response = client.get('/api/transcript/vid0001?format=srt&download=1')
+    assert response.status_code == 200
+    assert response.content_type == 'application/x-subrip; charset=utf-8'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="Video 1.srt"'
+    assert response.get_data(as_text=True).startswith("1\n00:00:00,000 --> 00:00:04,000\nfirst 0\n")
+    assert client.get('/api/transcript/vid0001?format=pdf').status_code == 400
+
+    save(scraper, "second")
+    assert "second 0" in client.get('/api/transcript/vid0001').get_json()['content']
@@ -0,0 +1,167 @@
+"""Fetch errors: classification, backoff and the dead-letter store later runs consult"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_scraper import AsyncYouTubeChannelScraper
+from fake_youtube import FakeChannel, FakeRateLimitError, FakeTranscriptBackend, FakeTranscriptsDisabled
+from rate_limiter import AdaptiveRateLimiter
+from retry import (PERMANENT, RATE_LIMIT_COOLDOWN, RATE_LIMITED, TRANSIENT, FailureStore, RetryPolicy,
+                   classify_error, failures_path, is_language_mismatch)
+
+VIDEOS = 12
+
+
+class TranscriptsDisabled(Exception):
+    pass
+
+
+class IpBlocked(Exception):
+    pass
+
+
+class NoTranscriptFound(Exception):
+    pass
+
+
+class NoMatchingTranscript(NoTranscriptFound):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+@pytest.mark.parametrize('error, error_class', [
+    (TranscriptsDisabled("disabled"), PERMANENT),
+    (NoMatchingTranscript("no 'de'"), PERMANENT),
+    (FakeTranscriptsDisabled("disabled"), PERMANENT),
+    (IpBlocked("blocked"), RATE_LIMITED),
+    (FakeRateLimitError("slow down"), RATE_LIMITED),
+    (RuntimeError("HTTP Error 429: Too Many Requests"), RATE_LIMITED),
+    (TimeoutError("timed out"), TRANSIENT),
+    (ConnectionResetError("reset"), TRANSIENT),
+    (ValueError("anything else"), TRANSIENT),
+])
+def test_classify_error(error, error_class):
+    assert classify_error(error) == error_class
+
+
+def test_language_mismatch():
+    assert is_language_mismatch(NoMatchingTranscript("no 'de'"))
+    assert not is_language_mismatch(TranscriptsDisabled("disabled"))
+
+
+class Flaky:
+    """Callable failing with each of `errors` in turn before returning 'ok'"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+    async def call_async(self):
+        return self()
+
+
+def test_transient_errors_are_retried():
+    policy = RetryPolicy(base_delay=0)
+    retried = []
+    flaky = Flaky(TimeoutError("1"), TimeoutError("2"))
+    assert policy.call(flaky, on_retry=retried.append) == 'ok'
+    assert flaky.calls == 3
+    assert len(retried) == 2
+
+
+def test_retries_give_up_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3, base_delay=0)
+    errors, retried = [], []
+    flaky = Flaky(*(TimeoutError(str(n)) for n in range(5)))
+    with pytest.raises(TimeoutError):
+        policy.call(flaky, on_error=errors.append, on_retry=retried.append)
+    assert flaky.calls == len(errors) == 3
+    assert len(retried) == 2
+
+
+@pytest.mark.parametrize('error', [TranscriptsDisabled("disabled"), FakeRateLimitError("slow down")])
+def test_permanent_and_rate_limited_errors_are_not_retried(error):
+    flaky = Flaky(error)
+    with pytest.raises(type(error)):
+        asyncio.run(RetryPolicy(base_delay=0).call_async(flaky.call_async))
+    assert flaky.calls == 1
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    delays = [policy.backoff(attempt) for attempt in range(10) for _ in range(20)]
+    assert all(0 <= delay <= min(5.0, 2 ** (n // 20)) for n, delay in enumerate(delays))
+    assert len(set(delays)) > 100
+
+
+def test_failure_store_classes(tmp_path):
+    store = FailureStore(str(tmp_path / 'failures.sqlite3'))
+    now = 1_000_000.0
+    store.record("dead", None, PERMANENT, "Transcripts are disabled", now=now)
+    store.record("flaky", None, TRANSIENT, "Timed out", now=now)
+    store.record("limited", None, RATE_LIMITED, "429", now=now)
+
+    assert store.skip_reason("dead", now=now + 10 ** 9) == 'dead_letter'
+    assert store.skip_reason("flaky", now=now) is None
+    assert store.skip_reason("limited", now=now + RATE_LIMIT_COOLDOWN - 1) == 'deferred'
+    assert store.skip_reason("limited", now=now + RATE_LIMIT_COOLDOWN) is None
+    assert store.skip_reason("unknown") is None
+    assert store.counts() == {PERMANENT: 1, TRANSIENT: 1, RATE_LIMITED: 1}
+
+    # Limited again: the cooldown doubles
+    store.record("limited", None, RATE_LIMITED, "429", now=now + RATE_LIMIT_COOLDOWN)
+    assert store.skip_reason("limited", now=now + 3 * RATE_LIMIT_COOLDOWN - 1) == 'deferred'
+    assert store.list(RATE_LIMITED)[0]['attempts'] == 2
+
+    store.resolve("limited")
+    assert store.skip_reason("limited", now=now) is None
+    assert {row['video_id'] for row in store.list()} == {"dead", "flaky"}
+
+
+def scrape(output_dir, backend):
+    scraper = AsyncYouTubeChannelScraper("https://www.youtube.com/@fakechannel", str(output_dir),
+                                         transcript_api=backend, max_in_flight=4,
+                                         retry_policy=RetryPolicy(base_delay=0))
+    scraper.iter_tab_entries = FakeChannel(VIDEOS, page_size=5).iter_tab_entries
+    statuses = []
+    # Timeouts count as throttling; the floor keeps a run of them from stalling the test
+    rate_limiter = AdaptiveRateLimiter(rate=1000, min_rate=200)
+    asyncio.run(scraper.scrape_all_transcripts_async(
+        progress_callback=lambda current, total, title, status: statuses.append(status), rate_limiter=rate_limiter
+    ))
+    return statuses
+
+
+def test_dead_lettered_videos_are_not_fetched_again(tmp_path):
+    disabled = FakeTranscriptBackend(latency=0, error_rate=1.0)
+    assert scrape(tmp_path, disabled) == ['dead_letter'] * VIDEOS
+    assert disabled.calls == VIDEOS
+
+    healthy = FakeTranscriptBackend(latency=0)
+    assert scrape(tmp_path, healthy) == ['dead_letter'] * VIDEOS
+    assert healthy.calls == 0
+    assert FailureStore(failures_path(str(tmp_path))).counts() == {PERMANENT: VIDEOS}
+
+
+def test_transient_failures_are_fetched_next_run(tmp_path):
+    timing_out = FakeTranscriptBackend(latency=0, timeout_rate=1.0)
+    assert scrape(tmp_path, timing_out) == ['failed'] * VIDEOS
+    assert timing_out.calls == VIDEOS * RetryPolicy().max_attempts
+
+    healthy = FakeTranscriptBackend(latency=0)
+    assert scrape(tmp_path, healthy) == ['success'] * VIDEOS
+    assert FailureStore(failures_path(str(tmp_path))).counts() == {}
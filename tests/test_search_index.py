@@ -0,0 +1,67 @@
+"""Full-text search index: reindexing, search and concurrent writers"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex, build_match_query
+
+
+def segments(words, count=20):
+    return [{'text': f"{words} {n}", 'start': n * 4.0, 'duration': 4.0} for n in range(count)]
+
+
+def open_index(tmp_path):
+    return SearchIndex(str(tmp_path / 'search.sqlite3'))
+
+
+def segment_count(index):
+    return index._connect().execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+
+def test_reindexing_replaces_a_videos_segments(tmp_path):
+    index = open_index(tmp_path)
+    index.add_transcript('v1', "First", segments("alpha beta"))
+    index.add_transcript('v1', "First", segments("gamma delta", count=5))
+    index.add_transcript('v1', "Erste", segments("alpha beta"), language='de')
+
+    assert segment_count(index) == 25
+    assert index.count() == 1
+    hits = index.search("gamma")
+    assert {hit['video_id'] for hit in hits} == {'v1'}
+    assert hits[0]['url'] == "https://www.youtube.com/watch?v=v1&t=0s"
+    assert {hit['language'] for hit in index.search("alpha")} == {'de'}
+
+
+def test_match_query_drops_fts_syntax():
+    assert build_match_query('"exact phrase" pre* NEAR(x)') == '"exact phrase" AND "pre"* AND "NEAR" AND "x"'
+    assert build_match_query('-- ()') == ""
+
+
+def test_concurrent_writers_reindexing_one_video(tmp_path):
+    index = open_index(tmp_path)
+    errors = []
+    start = threading.Barrier(4)
+
+    def write(n):
+        start.wait()
+        for _ in range(50):
+            try:
+                index.add_transcripts([('v1', f"Writer {n}", segments(f"writer{n}"), 'en'),
+                                       (f"only{n}", f"Writer {n}", segments(f"writer{n}", count=3), 'en')])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert index.count() == 5
+    # One writer's copy of v1 survives whole, with no segments left over from the others
+    assert segment_count(index) == 20 + 4 * 3
+    writers = {hit['title'] for hit in index.search("0", limit=100) if hit['video_id'] == 'v1'}
+    assert len(writers) == 1
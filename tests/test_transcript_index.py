@@ -0,0 +1,108 @@
+"""Transcript index: rebuilding from the files on disk and keyset cursor pagination"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_youtube import FakeTranscriptBackend, make_transcript
+from scraper import YouTubeChannelScraper
+from transcript_index import TranscriptIndex, encode_cursor
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+OTHER_URL = "https://www.youtube.com/@otherchannel"
+FIELDS = ('video_id', 'language', 'channel_url', 'segments', 'json_file', 'json_size', 'txt_file', 'scraped_at',
+          'languages')
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+def record(n):
+    # Few distinct times and sizes, so pages have to break ties on the video ID
+    return {
+        'video_id': f"vid{n:04d}",
+        'title': f"Video {n}",
+        'clean_title': f"Video {n % 13:02d}",
+        'channel_url': CHANNEL_URL if n % 3 else OTHER_URL,
+        'segments': 10,
+        'json_file': f"vid{n:04d}_transcript.json",
+        'json_size': 100,
+        'txt_file': f"Video {n:04d}.txt",
+        'txt_size': 1000 + n % 7,
+        'scraped_at': f"2026-01-{1 + n % 5:02d}T00:00:00",
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TranscriptIndex(str(tmp_path / 'index.sqlite3'))
+    index.upsert_many([record(n) for n in range(40)])
+    return index
+
+
+def paginate(index, page_size, sort='modified', **query):
+    entries, cursor = [], None
+    while True:
+        page = index.list(sort=sort, limit=page_size, cursor=cursor, **query)
+        entries.extend(page)
+        if len(page) < page_size:
+            return entries
+        cursor = encode_cursor(page[-1], sort)
+
+
+def video_ids(entries):
+    return [entry['video_id'] for entry in entries]
+
+
+@pytest.mark.parametrize('sort', ['modified', 'size', 'title'])
+@pytest.mark.parametrize('descending', [True, False])
+def test_cursor_pages_cover_the_listing_once(index, sort, descending):
+    listing = index.list(sort=sort, descending=descending)
+    assert len(listing) == 40
+    assert video_ids(paginate(index, 7, sort=sort, descending=descending)) == video_ids(listing)
+
+
+def test_cursor_pages_respect_filters(index):
+    listing = index.list(channel=OTHER_URL, since="2026-01-02")
+    assert listing and all(entry['channel_url'] == OTHER_URL for entry in listing)
+    assert video_ids(paginate(index, 3, channel=OTHER_URL, since="2026-01-02")) == video_ids(listing)
+
+
+def test_cursor_is_not_shifted_by_new_entries(index):
+    first = index.list(limit=10)
+    # Sorts before the cursor in a newest-first listing, which would shift an OFFSET page by one
+    index.upsert({**record(100), 'scraped_at': "2026-02-01T00:00:00"})
+    rest = index.list(cursor=encode_cursor(first[-1], 'modified'))
+    assert video_ids(first + rest) == [entry['video_id'] for entry in index.list() if entry['video_id'] != 'vid0100']
+
+
+def test_invalid_cursor(index):
+    with pytest.raises(ValueError):
+        index.list(cursor="not a cursor")
+
+
+def test_rebuild_matches_the_live_index(tmp_path):
+    output_dir = str(tmp_path / 'transcripts')
+    scraper = YouTubeChannelScraper(CHANNEL_URL, output_dir, transcript_api=FakeTranscriptBackend())
+    for n in range(5):
+        video_id = f"vid{n:04d}"
+        scraper.save_transcript(video_id, f"Video {n}", f"Video #{n}", make_transcript(video_id, 10 + n))
+    scraper.save_transcript("vid0000", "Video 0", "Video #0", make_transcript("vid0000", 8, 'de'), language='de')
+    with open(os.path.join(output_dir, 'broken_transcript.json'), 'w', encoding='utf-8') as f:
+        f.write('{"video_id": ')
+
+    rebuilt = TranscriptIndex(str(tmp_path / 'rebuilt.sqlite3'))
+    assert rebuilt.rebuild(output_dir) == 5
+
+    def rows(index, **query):
+        return [{field: entry[field] for field in FIELDS} for entry in index.list(sort='title', **query)]
+
+    assert rows(rebuilt) == rows(scraper.index)
+    assert rows(rebuilt, language='de') == rows(scraper.index, language='de')
+    assert rebuilt.get("vid0000")['language'] == 'en'
+    assert rebuilt.get("vid0000", 'de')['segments'] == 8
+    assert rebuilt.saved_languages("vid0000") == {'de', 'en'}
@@ -0,0 +1,107 @@
+"""Atomic file writes and the background writer that indexes saved transcripts in batches"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcript_writer
+from transcript_writer import TranscriptWriter, atomic_write
+
+
+class RecordingIndex:
+    """Stands in for both indexes, noting the size of each batch; the first batch waits for `release`"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.searched = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def upsert_many(self, entries):
+        self.entered.set()
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("database is locked")
+        self.batches.append([entry['video_id'] for entry in entries])
+
+    def add_transcripts(self, transcripts):
+        self.searched.append([video_id for video_id, _, _, _ in transcripts])
+
+
+def item(directory, n):
+    video_id = f"vid{n:04d}"
+    entry = {'video_id': video_id, 'title': f"Video {n}", 'language': 'en'}
+    return os.path.join(directory, f"{video_id}_transcript.json"), f"transcript {n}".encode('utf-8'), entry, []
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_write(str(path), b"old")
+    atomic_write(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_failed_write_leaves_the_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    atomic_write(str(path), b"old")
+
+    # Fails after the temporary file is complete, just before it would replace the old one
+    def replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(transcript_writer.os, 'replace', replace)
+    with pytest.raises(OSError):
+        atomic_write(str(path), b"new")
+    monkeypatch.undo()
+    # Fails halfway through writing the temporary file
+    with pytest.raises(TypeError):
+        atomic_write(str(path), "not bytes")
+
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_writes_are_indexed_in_batches(tmp_path):
+    index = RecordingIndex()
+    writer = TranscriptWriter(index, index, batch_size=64)
+    writer.submit(*item(tmp_path, 0))
+    # The writer is busy with the first video while the rest queue up behind it
+    assert index.entered.wait(5)
+    for n in range(1, 100):
+        writer.submit(*item(tmp_path, n))
+    index.release.set()
+    writer.flush()
+
+    assert [len(batch) for batch in index.batches] == [1, 64, 35]
+    assert index.searched == index.batches
+    assert sum(index.batches, []) == [f"vid{n:04d}" for n in range(100)]
+    assert (tmp_path / "vid0042_transcript.json").read_bytes() == b"transcript 42"
+    assert writer.failed == set()
+    writer.close()
+    assert not writer._thread.is_alive()
+
+
+def test_failures_are_collected(tmp_path):
+    index = RecordingIndex()
+    index.release.set()
+    writer = TranscriptWriter(index, index)
+    writer.submit(*item(tmp_path, 0))
+    writer.submit(*item(tmp_path / "missing", 1))
+    writer.close()
+    assert writer.failed == {"vid0001"}
+    assert sum(index.batches, []) == ["vid0000"]
+
+    # Files written but not indexed count as failed too, so the videos are fetched again
+    broken = RecordingIndex(fail=True)
+    broken.release.set()
+    writer = TranscriptWriter(broken, broken)
+    for n in range(2, 5):
+        writer.submit(*item(tmp_path, n))
+    writer.flush()
+    assert writer.failed == {"vid0002", "vid0003", "vid0004"}
+    writer.close()
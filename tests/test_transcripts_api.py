@@ -0,0 +1,69 @@
+"""/api/transcripts: cursor pages and conditional requests"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_youtube import FakeTranscriptBackend, make_transcript
+from scraper import YouTubeChannelScraper
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+
+
+def save(output_dir, numbers):
+    scraper = YouTubeChannelScraper(CHANNEL_URL, output_dir, transcript_api=FakeTranscriptBackend())
+    for n in numbers:
+        video_id = f"vid{n:04d}"
+        scraper.save_transcript(video_id, f"Video {n}", f"Video #{n}", make_transcript(video_id, 5 + n % 4))
+
+
+@pytest.fixture
+def client(web, corpus):
+    save(corpus, range(12))
+    return web.app.test_client()
+
+
+def titles(body):
+    return [item['title'] for item in body['transcripts']]
+
+
+@pytest.mark.parametrize('query', ['sort=modified', 'sort=size&order=asc', 'sort=title&order=asc'])
+def test_cursor_pages_cover_the_listing_once(client, query):
+    everything = client.get(f'/api/transcripts?{query}&limit=100').get_json()
+    assert len(everything['transcripts']) == 12
+    assert everything['next_cursor'] is None
+
+    paged, cursor = [], None
+    while True:
+        body = client.get(f'/api/transcripts?{query}&limit=5' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        paged.extend(titles(body))
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert paged == titles(everything)
+
+
+def test_bad_requests(client):
+    assert client.get('/api/transcripts?cursor=garbage').status_code == 400
+    assert client.get('/api/transcripts?sort=views').status_code == 400
+
+
+def test_unchanged_listing_is_not_modified(client, corpus):
+    first = client.get('/api/transcripts?limit=5')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+
+    again = client.get('/api/transcripts?limit=5', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert again.data == b''
+    # Another query is another listing
+    assert client.get('/api/transcripts?limit=6', headers={'If-None-Match': etag}).status_code == 200
+
+    save(corpus, [12])
+    changed = client.get('/api/transcripts?limit=5', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert titles(changed.get_json())[0] == "Video 12"
@@ -0,0 +1,109 @@
+"""Work queue: leases, their expiry, and reclaiming items from workers that went away"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from work_queue import MAX_ATTEMPTS, VideoWorker, WorkQueue
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+PARAMS = {'requests_per_second': 1000, 'max_in_flight': 4}
+# A lease that has run out by the time anyone else looks, as if its worker crashed right after claiming
+EXPIRED = -1
+
+
+def videos(numbers):
+    return [{'id': f"vid{n:04d}", 'title': f"Video {n}"} for n in numbers]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'work.sqlite3'))
+    queue.enqueue("job1", CHANNEL_URL, PARAMS, videos(range(5)))
+    return queue
+
+
+def claimed_ids(items):
+    return [item['video']['id'] for item in items]
+
+
+def test_claims_follow_listing_order(queue):
+    # Enqueueing again, e.g. after the coordinator moved replicas, adds only new videos
+    queue.enqueue("job1", CHANNEL_URL, PARAMS, videos(range(3, 7)))
+    first = queue.claim("a", 60, limit=4)
+    assert claimed_ids(first) == ["vid0000", "vid0001", "vid0002", "vid0003"]
+    assert first[0]['params'] == PARAMS and first[0]['channel_url'] == CHANNEL_URL
+    assert claimed_ids(queue.claim("b", 60, limit=10)) == ["vid0004", "vid0005", "vid0006"]
+    assert queue.claim("c", 60) == []
+
+
+def test_live_leases_are_not_reclaimed(queue):
+    assert len(queue.claim("a", 60, limit=5)) == 5
+    queue.renew("a", 60)
+    assert queue.claim("b", 60, limit=5) == []
+    assert queue.unfinished("job1") == 5
+
+
+def test_expired_leases_are_reclaimed(queue):
+    lost = queue.claim("a", EXPIRED, limit=2)
+    reclaimed = queue.claim("b", 60, limit=5)
+    assert claimed_ids(reclaimed) == ["vid0000", "vid0001", "vid0002", "vid0003", "vid0004"]
+
+    # The first owner finishing late does not count; the item belongs to "b" now
+    assert not queue.complete("job1", lost[0]['video']['id'], "a", "success")
+    for item in reclaimed:
+        assert queue.complete("job1", item['video']['id'], "b", "success")
+    assert queue.unfinished("job1") == 0
+    assert sorted(video_id for video_id, _, _ in queue.finished_since("job1")) == claimed_ids(reclaimed)
+
+
+def test_items_that_keep_losing_leases_are_given_up(queue):
+    for attempt in range(MAX_ATTEMPTS):
+        assert "vid0000" in claimed_ids(queue.claim(f"crashing{attempt}", EXPIRED, limit=1))
+    assert "vid0000" not in claimed_ids(queue.claim("healthy", 60, limit=5))
+    assert [(video_id, result) for video_id, result, _ in queue.finished_since("job1")] == [("vid0000", "failed")]
+
+
+def test_released_items_do_not_use_up_attempts(queue):
+    for _ in range(MAX_ATTEMPTS + 1):
+        assert claimed_ids(queue.claim("restarting", 60, limit=1)) == ["vid0000"]
+        queue.release("restarting")
+    assert queue.stats() == {'queued': 5}
+
+
+def test_cancel(queue):
+    queue.claim("a", 60, limit=2)
+    queue.cancel("job1")
+    assert queue.claim("b", 60, limit=5) == []
+    assert queue.unfinished("job1") == 0
+    assert queue.stats() == {'cancelled': 5}
+
+
+class FakeScraper:
+    def __init__(self):
+        self.fetched = []
+
+    async def _fetch_and_save_async(self, video, include_timestamps, rate_limiter, semaphore):
+        async with semaphore:
+            self.fetched.append(video['id'])
+            await asyncio.sleep(0.01)
+        return "success"
+
+    def _record_status(self, status):
+        pass
+
+
+def test_worker_picks_up_a_crashed_workers_items(queue):
+    queue.claim("crashed", EXPIRED, limit=2)
+    scraper = FakeScraper()
+    worker = VideoWorker(queue, slots=3, poll_interval=0.01, scraper_factory=lambda item: scraper)
+
+    asyncio.run(worker.run(idle_exit=0.1))
+
+    assert sorted(scraper.fetched) == [video['id'] for video in videos(range(5))]
+    assert worker.processed == 5
+    assert queue.stats() == {'done': 5}
+    assert {result for _, result, _ in queue.finished_since("job1")} == {"success"}
@@ -0,0 +1,74 @@
+"""/api/download-all: the archive streams in flat memory whatever the corpus size"""
+import os
+import sys
+import tracemalloc
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_youtube import FakeTranscriptBackend, make_transcript
+from scraper import YouTubeChannelScraper
+
+CHANNEL_URL = "https://www.youtube.com/@fakechannel"
+SEGMENTS = 1500
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setenv('SCRAPER_DEDUP', '0')
+
+
+def save(output_dir, numbers):
+    scraper = YouTubeChannelScraper(CHANNEL_URL, output_dir, transcript_api=FakeTranscriptBackend())
+    for n in numbers:
+        video_id = f"vid{n:04d}"
+        transcript = make_transcript(video_id, SEGMENTS)
+        # Random hex only compresses about 2:1, so a buffered archive would be large too
+        for segment in transcript:
+            segment['text'] = os.urandom(32).hex()
+        scraper.save_transcript(video_id, f"Video {n}", f"Video #{n}", transcript)
+
+
+def download_all(client, path):
+    """Stream the archive to path; returns the peak traced memory while it was produced"""
+    tracemalloc.start()
+    try:
+        response = client.get('/api/download-all', buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+        with open(path, 'wb') as f:
+            for chunk in response.iter_encoded():
+                f.write(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    response.close()
+    return peak
+
+
+def check_archive(path, videos):
+    """Validate the archive and return the uncompressed size of its entries"""
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        entries = zf.infolist()
+    assert len(entries) == 2 * videos
+    assert sum(entry.filename.endswith('.txt') for entry in entries) == videos
+    return sum(entry.file_size for entry in entries)
+
+
+def test_download_all_memory_does_not_grow_with_the_corpus(web, corpus, tmp_path):
+    client = web.app.test_client()
+
+    save(corpus, range(10))
+    small = download_all(client, tmp_path / 'small.zip')
+    check_archive(tmp_path / 'small.zip', 10)
+
+    save(corpus, range(10, 80))
+    large = download_all(client, tmp_path / 'large.zip')
+    content = check_archive(tmp_path / 'large.zip', 80)
+
+    # Eight times the transcripts; only the central directory grows with the entry count
+    assert large < small * 1.5 + 256 * 1024
+    assert large < content / 10
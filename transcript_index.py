@@ -0,0 +1,423 @@
+import base64
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from compact_store import CompactTranscript, EXTENSION as COMPACT_EXTENSION
+from languages import DEFAULT_LANGUAGE
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = '.index'
+
+SORT_COLUMNS = {
+    'modified': 'scraped_at',
+    'size': 'txt_size',
+    'title': 'clean_title',
+}
+
+LISTING_CACHE_SIZE = 256
+
+# Every saved language of every video; `transcripts` holds each video's default language
+LANGUAGES_TABLE = """
+CREATE TABLE IF NOT EXISTS transcript_languages (
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    is_generated INTEGER, -- NULL when not known, e.g. for transcripts saved before languages were tracked
+    translated_from TEXT,
+    segments INTEGER NOT NULL DEFAULT 0,
+    json_file TEXT NOT NULL,
+    json_size INTEGER NOT NULL DEFAULT 0,
+    txt_size INTEGER NOT NULL DEFAULT 0,
+    scraped_at TEXT NOT NULL,
+    PRIMARY KEY (video_id, language)
+)"""
+
+SCHEMA = LANGUAGES_TABLE + """;
+CREATE INDEX IF NOT EXISTS transcript_languages_language ON transcript_languages (language, video_id);
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    clean_title TEXT NOT NULL,
+    channel_url TEXT,
+    language TEXT,
+    segments INTEGER NOT NULL DEFAULT 0,
+    json_file TEXT NOT NULL, -- segment store file: JSON or compact .tsb
+    json_size INTEGER NOT NULL DEFAULT 0,
+    txt_file TEXT NOT NULL,
+    txt_size INTEGER NOT NULL DEFAULT 0,
+    scraped_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_txt_file ON transcripts (txt_file);
+CREATE INDEX IF NOT EXISTS transcripts_scraped_at ON transcripts (scraped_at, video_id);
+CREATE INDEX IF NOT EXISTS transcripts_txt_size ON transcripts (txt_size, video_id);
+CREATE INDEX IF NOT EXISTS transcripts_clean_title ON transcripts (clean_title, video_id);
+CREATE INDEX IF NOT EXISTS transcripts_channel ON transcripts (channel_url, scraped_at, video_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+BUMP_VERSION = "UPDATE meta SET value = value + 1 WHERE key = 'version'"
+UPSERT = (
+    "INSERT INTO transcripts (video_id, title, clean_title, channel_url, language, segments, "
+    "json_file, json_size, txt_file, txt_size, scraped_at) "
+    "VALUES (:video_id, :title, :clean_title, :channel_url, :language, :segments, "
+    ":json_file, :json_size, :txt_file, :txt_size, :scraped_at) "
+    # A video keeps the language it was first saved in as its default
+    "ON CONFLICT (video_id) DO UPDATE SET title = excluded.title, clean_title = excluded.clean_title, "
+    "channel_url = excluded.channel_url, segments = excluded.segments, json_file = excluded.json_file, "
+    "json_size = excluded.json_size, txt_file = excluded.txt_file, txt_size = excluded.txt_size, "
+    "scraped_at = excluded.scraped_at WHERE transcripts.language = excluded.language"
+)
+UPSERT_LANGUAGE = (
+    "INSERT OR REPLACE INTO transcript_languages (video_id, language, is_generated, translated_from, segments, "
+    "json_file, json_size, txt_size, scraped_at) "
+    "VALUES (:video_id, :language, :is_generated, :translated_from, :segments, "
+    ":json_file, :json_size, :txt_size, :scraped_at)"
+)
+# Rows shaped like `transcripts`, one per saved language of each video
+ALL_LANGUAGE_ROWS = (
+    "SELECT t.video_id, t.title, t.clean_title, t.channel_url, l.language, l.segments, l.json_file, l.json_size, "
+    "t.txt_file, l.txt_size, l.scraped_at, l.is_generated, l.translated_from, t.language AS default_language "
+    "FROM transcripts t JOIN transcript_languages l ON l.video_id = t.video_id"
+)
+# The same for one language per video: the given one, or the default if NULL
+LANGUAGE_ROWS = f"{ALL_LANGUAGE_ROWS} AND l.language = COALESCE(?, t.language)"
+LANGUAGES_OF = (
+    "(SELECT group_concat(language) FROM transcript_languages l WHERE l.video_id = transcripts.video_id) "
+    "AS languages"
+)
+
+
+def language_txt_file(txt_file, language):
+    """Text file name of a video's transcript in a language other than its default"""
+    return f"{txt_file[:-len('.txt')]}.{language}.txt"
+
+
+def _language_entry(row):
+    entry = dict(row)
+    if entry.get('default_language') and entry['language'] != entry['default_language']:
+        entry['txt_file'] = language_txt_file(entry['txt_file'], entry['language'])
+    return entry
+
+
+def listing_item(entry, output_dir):
+    """Shape an index row the way /api/transcripts and get_existing_transcripts report it"""
+    return {
+        'filename': entry['txt_file'],
+        'title': entry['txt_file'][:-len('.txt')],
+        'video_id': entry['video_id'],
+        'language': entry.get('language'),
+        'languages': sorted(entry['languages'].split(',')) if entry.get('languages') else [],
+        'channel_url': entry['channel_url'],
+        'size': entry['txt_size'],
+        'modified': entry['scraped_at'],
+        'path': os.path.join(output_dir, entry['txt_file'])
+    }
+
+
+def encode_cursor(entry, sort):
+    """Opaque cursor pointing just past `entry` in a listing sorted by `sort`"""
+    column = SORT_COLUMNS.get(sort, 'scraped_at')
+    raw = json.dumps([entry[column], entry['video_id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        value, video_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return value, video_id
+
+
+def index_path(output_dir):
+    """Location of the transcript index for an output directory"""
+    return os.path.join(output_dir, INDEX_DIRNAME, 'transcripts.sqlite3')
+
+
+class TranscriptIndex(SQLiteStore):
+    """SQLite index of saved transcripts keyed by video ID"""
+
+    SCHEMA = SCHEMA
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self._cache = OrderedDict()
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, output_dir):
+        """Process-wide index of an output directory, built from existing JSON files on first use"""
+        index = cls.shared(index_path(output_dir))
+        if index.created:
+            # First run against an existing corpus: pick up transcripts saved before the index existed
+            index.created = False
+            index.rebuild(output_dir)
+        return index
+
+    def migrate(self, conn, version):
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'transcripts'").fetchone() is None:
+            return
+        # Version 1 tracks languages; everything saved before was fetched in the default language
+        conn.execute("UPDATE transcripts SET language = ? WHERE language IS NULL", (DEFAULT_LANGUAGE,))
+        conn.execute(LANGUAGES_TABLE)
+        conn.execute(
+            "INSERT OR IGNORE INTO transcript_languages (video_id, language, segments, json_file, json_size, "
+            "txt_size, scraped_at) SELECT video_id, language, segments, json_file, json_size, txt_size, scraped_at "
+            "FROM transcripts"
+        )
+
+    def upsert(self, record):
+        """Insert or replace the entry for record['video_id'] and record['language'] in one transaction"""
+        self.upsert_many([record])
+
+    def upsert_many(self, records):
+        """Insert or replace several entries in one transaction
+
+        A record in a language other than its video's default only adds that language.
+        """
+        records = [
+            {'is_generated': None, 'translated_from': None, **record, 'language': record.get('language') or DEFAULT_LANGUAGE}
+            for record in records
+        ]
+        with self._connect() as conn:
+            conn.executemany(UPSERT_LANGUAGE, records)
+            conn.executemany(UPSERT, records)
+            conn.execute(BUMP_VERSION)
+
+    def get(self, video_id, language=None):
+        """Entry of a video in `language`, by default the language it was first saved in"""
+        row = self._connect().execute(f"{LANGUAGE_ROWS} WHERE t.video_id = ?", (language, video_id)).fetchone()
+        return _language_entry(row) if row else None
+
+    def saved_languages(self, video_id):
+        rows = self._connect().execute(
+            "SELECT language FROM transcript_languages WHERE video_id = ?", (video_id,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def languages(self, video_id):
+        """Every saved language of a video with how it was obtained"""
+        rows = self._connect().execute(
+            "SELECT language, is_generated, translated_from, segments, scraped_at FROM transcript_languages "
+            "WHERE video_id = ? ORDER BY language", (video_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def exists(self, video_id):
+        row = self._connect().execute("SELECT 1 FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    def find(self, name, language=None):
+        """Entry for a video ID or a text file name as listed, in `language` or the name's own"""
+        entry = self.get(name, language)
+        if entry is None:
+            owner = self.owner_of_txt(name)
+            if owner is None and name.count('.') >= 2:
+                # '{title}.{language}.txt' names a video's transcript in another language
+                base, name_language, _ = name.rsplit('.', 2)
+                owner = self.owner_of_txt(f"{base}.txt")
+                language = language or name_language
+            entry = self.get(owner, language) if owner else None
+        return entry
+
+    def owner_of_txt(self, txt_file):
+        """Video ID whose text file is named txt_file, if any"""
+        row = self._connect().execute(
+            "SELECT video_id FROM transcripts WHERE txt_file = ?", (txt_file,)
+        ).fetchone()
+        return row['video_id'] if row else None
+
+    def version(self):
+        """Counter bumped by every write; changes whenever any listing could change"""
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def list(self, sort='modified', descending=True, limit=None, offset=0, cursor=None,
+             channel=None, since=None, until=None, title_prefix=None, language=None):
+        """Indexed listing of transcripts ordered by modified time, size or title
+
+        `cursor` (from encode_cursor) continues a listing by keyset instead of OFFSET, so
+        every page costs the same no matter how deep it is. `since`/`until` bound the scrape
+        time (ISO strings) and `title_prefix` matches the start of the clean title. With
+        `language` only videos saved in it are listed, with that language's files and sizes.
+        Every entry lists the video's saved `languages`.
+        """
+        column = SORT_COLUMNS.get(sort, 'scraped_at')
+        direction = 'DESC' if descending else 'ASC'
+        conditions = []
+        params = []
+        source = "transcripts"
+        if language:
+            source = f"({LANGUAGE_ROWS}) AS transcripts"
+            params.append(language)
+        if channel:
+            conditions.append("channel_url = ?")
+            params.append(channel)
+        if since:
+            conditions.append("scraped_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("scraped_at < ?")
+            params.append(until)
+        if title_prefix:
+            conditions.append("clean_title >= ? AND clean_title < ?")
+            params.extend([title_prefix, title_prefix + '\U0010ffff'])
+        if cursor:
+            value, video_id = decode_cursor(cursor)
+            conditions.append(f"({column}, video_id) {'<' if descending else '>'} (?, ?)")
+            params.extend([value, video_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connect().execute(
+            f"SELECT *, {LANGUAGES_OF} FROM {source} {where} "
+            f"ORDER BY {column} {direction}, video_id {direction} LIMIT ? OFFSET ?",
+            (*params, limit if limit is not None else -1, offset)
+        ).fetchall()
+        return [_language_entry(row) for row in rows]
+
+    def cached_list(self, **query):
+        """list() memoised in memory until the next write to the index; returns (version, entries)"""
+        version = self.version()
+        key = tuple(sorted(query.items()))
+        with self._cache_lock:
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return version, self._cache[key]
+
+        entries = self.list(**query)
+        with self._cache_lock:
+            if version == self._cache_version:
+                self._cache[key] = entries
+                if len(self._cache) > LISTING_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return version, entries
+
+    def iter_entries(self, channel=None, video_ids=None, language=None, batch_size=500):
+        """Stream index rows for a channel and/or list of video IDs without loading them all
+
+        Rows are in each video's default language, or only videos saved in `language` if given.
+        """
+        conn = self._connect()
+        if video_ids is None:
+            query = f"{LANGUAGE_ROWS} WHERE 1"
+            params = [language]
+            if channel:
+                query += " AND t.channel_url = ?"
+                params.append(channel)
+            for row in conn.execute(query, params):
+                yield _language_entry(row)
+            return
+
+        video_ids = list(video_ids)
+        for start in range(0, len(video_ids), batch_size):
+            batch = video_ids[start:start + batch_size]
+            query = f"{LANGUAGE_ROWS} WHERE t.video_id IN ({', '.join('?' * len(batch))})"
+            params = [language, *batch]
+            if channel:
+                query += " AND t.channel_url = ?"
+                params.append(channel)
+            for row in conn.execute(query, params):
+                yield _language_entry(row)
+
+    def iter_languages(self):
+        """Stream one row per saved language of every video"""
+        for row in self._connect().execute(ALL_LANGUAGE_ROWS):
+            yield _language_entry(row)
+
+    def remove(self, video_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
+            conn.execute("DELETE FROM transcript_languages WHERE video_id = ?", (video_id,))
+            conn.execute(BUMP_VERSION)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM transcripts")
+            conn.execute("DELETE FROM transcript_languages")
+            conn.execute(BUMP_VERSION)
+
+    def rebuild(self, output_dir):
+        """Recreate the index from the JSON or compact transcript files in output_dir"""
+        records = {}
+        # Sorted so a compact file wins over the JSON it was converted from
+        for filename in sorted(os.listdir(output_dir), key=lambda name: name.endswith(COMPACT_EXTENSION)):
+            if filename.endswith('_transcript.json'):
+                suffix = '_transcript.json'
+            elif filename.endswith(f'_transcript{COMPACT_EXTENSION}'):
+                suffix = f'_transcript{COMPACT_EXTENSION}'
+            else:
+                continue
+            data_path = os.path.join(output_dir, filename)
+            try:
+                if suffix == '_transcript.json':
+                    with open(data_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    segments = len(data.get('transcript') or [])
+                else:
+                    with CompactTranscript(data_path) as compact:
+                        data = compact.metadata
+                        segments = len(compact)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable transcript {filename}: {str(e)}")
+                continue
+
+            # {video_id}_transcript.json, or {video_id}.{language}_transcript.json for further languages
+            stem, _, file_language = filename[:-len(suffix)].partition('.')
+            video_id = data.get('video_id', stem)
+            language = data.get('language') or file_language or DEFAULT_LANGUAGE
+            clean_title = data.get('clean_title') or data.get('title') or video_id
+            txt_file = data.get('txt_file') or f"{clean_title}.txt"
+            txt_path = os.path.join(output_dir, txt_file)
+            if file_language and txt_file.endswith(f".{language}.txt"):
+                txt_file = f"{txt_file[:-len(f'.{language}.txt')]}.txt"
+            records[video_id, language] = {
+                'video_id': video_id,
+                'title': data.get('title') or clean_title,
+                'clean_title': clean_title,
+                'channel_url': data.get('channel_url'),
+                'language': language,
+                'is_generated': data.get('is_generated'),
+                'translated_from': data.get('translated_from'),
+                'default': not file_language,
+                'segments': segments,
+                'json_file': filename,
+                'json_size': os.path.getsize(data_path),
+                'txt_file': txt_file,
+                # Transcripts saved since text became render-on-demand record the rendered size
+                'txt_size': os.path.getsize(txt_path) if os.path.exists(txt_path) else data.get('txt_size', 0),
+                'scraped_at': data.get('scraped_at') or '',
+            }
+        # The first record of a video sets its default language: the legacy-named file, else the oldest
+        records = sorted(records.values(), key=lambda record: (not record.pop('default'), record['scraped_at']))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM transcripts")
+            conn.execute("DELETE FROM transcript_languages")
+            conn.executemany(UPSERT_LANGUAGE, records)
+            conn.executemany(UPSERT, records)
+            conn.execute(BUMP_VERSION)
+        count = len({record['video_id'] for record in records})
+        logger.info(f"Rebuilt transcript index with {count} entries")
+        return count
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else 'transcripts'
+    TranscriptIndex(index_path(output_dir)).rebuild(output_dir)
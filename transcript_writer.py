@@ -0,0 +1,123 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from metrics import BYTES_WRITTEN
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 64
+MAX_PENDING = 256
+
+
+def atomic_write(path, data):
+    """Write bytes to path through a temporary file and a rename
+
+    Readers see the old file or the new one, never a partial write, and a crash
+    mid-write leaves only a stray .tmp file next to the old one.
+    """
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class TranscriptWriter:
+    """Background thread that writes transcript files and indexes them in batches
+
+    submit() returns at once unless `max_pending` files are already waiting, so fetch
+    workers only wait on the disk when it is the bottleneck. Up to `batch_size` queued
+    files are written together, then recorded in the transcript and search indexes in
+    one transaction each instead of one per video, then handed to the duplicate check
+    (a dedup.DedupStage) if there is one. Videos whose write failed are collected in
+    `failed`.
+    """
+
+    def __init__(self, index, search_index, metrics=None, batch_size=BATCH_SIZE, max_pending=MAX_PENDING,
+                 dedup=None):
+        self.index = index
+        self.search_index = search_index
+        self.dedup = dedup
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.failed = set()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._submitted = 0
+        self._done = 0
+        self._done_changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='transcript-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, path, data, entry, transcript):
+        """Queue `data` for `path`, then `entry` for the transcript index and `transcript` for search"""
+        with self._done_changed:
+            self._submitted += 1
+        self._queue.put((path, data, entry, transcript))
+
+    def flush(self):
+        """Wait until everything submitted before this call is written and indexed"""
+        with self._done_changed:
+            target = self._submitted
+            self._done_changed.wait_for(lambda: self._done >= target)
+
+    def close(self):
+        """Flush and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # This thread is the only consumer, so a non-empty queue never blocks it
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get()
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        start = time.monotonic()
+        written = []
+        try:
+            for path, data, entry, transcript in batch:
+                try:
+                    atomic_write(path, data)
+                    written.append((len(data), entry, transcript))
+                except OSError as e:
+                    logger.error(f"Could not write {path}: {str(e)}")
+                    self.failed.add(entry['video_id'])
+            if written:
+                self.index.upsert_many([entry for _, entry, _ in written])
+                self.search_index.add_transcripts(
+                    [(entry['video_id'], entry['title'], transcript, entry['language'])
+                     for _, entry, transcript in written]
+                )
+            if self.dedup:
+                for _, entry, transcript in written:
+                    self.dedup.submit(entry['video_id'], transcript, entry['language'])
+        except Exception as e:
+            logger.error(f"Could not index {len(written)} saved transcripts: {str(e)}")
+            self.failed.update(entry['video_id'] for _, entry, _ in written)
+            written = []
+        finally:
+            if self.metrics:
+                self.metrics.observe('write', time.monotonic() - start)
+                if written:
+                    self.metrics.count(BYTES_WRITTEN, sum(size for size, _, _ in written))
+            with self._done_changed:
+                self._done += len(batch)
+                self._done_changed.notify_all()
@@ -0,0 +1,286 @@
+"""Video-level work items shared by every replica that mounts the same data volume
+
+A job's coordinator lists the channel and enqueues each video that still needs a
+fetch; VideoWorkers in any process claim items under time-limited leases, renew
+them while fetching and mark them done. An item whose owner stops heartbeating is
+claimed again once its lease expires. Saves are keyed by video ID and written
+atomically, so an item finished twice after a lost lease leaves the same files.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+
+from languages import LanguagePreference
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Claims after which an item that keeps losing its lease (e.g. crashes its worker) is given up
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_jobs (
+    job_id TEXT PRIMARY KEY,
+    channel_url TEXT NOT NULL,
+    params TEXT NOT NULL, -- what a worker needs to fetch and save: rate, timestamps, languages
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS work_items (
+    job_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    position INTEGER NOT NULL, -- listing order within the job
+    video TEXT NOT NULL,
+    status TEXT NOT NULL, -- queued, leased, done or cancelled
+    result TEXT, -- scrape status of a done item: success, failed, dead_letter, ...
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    finished_at REAL,
+    PRIMARY KEY (job_id, video_id)
+);
+CREATE INDEX IF NOT EXISTS work_items_status ON work_items (status, lease_expires);
+CREATE INDEX IF NOT EXISTS work_items_owner ON work_items (owner, status);
+"""
+
+
+def work_queue_path(data_dir):
+    return os.path.join(data_dir, 'work.sqlite3')
+
+
+class WorkQueue(SQLiteStore):
+    """SQLite-backed queue of per-video work items with lease-based claiming"""
+
+    SCHEMA = SCHEMA
+
+    def enqueue(self, job_id, channel_url, params, videos):
+        """Add videos to a job; videos the job already holds keep their state, so re-enqueueing is safe"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO work_jobs (job_id, channel_url, params, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, channel_url, json.dumps(params), time.time())
+            )
+            first = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM work_items WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO work_items (job_id, video_id, position, video, status) "
+                "VALUES (?, ?, ?, ?, 'queued')",
+                ((job_id, video['id'], first + n, json.dumps(video)) for n, video in enumerate(videos))
+            )
+
+    def claim(self, owner, lease_seconds, limit=1):
+        """Atomically lease up to `limit` queued items, or leased ones whose lease ran out, oldest job first
+
+        Returns dicts with the item's job_id, channel_url, params and video.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Items that already lost MAX_ATTEMPTS leases are given up instead of crashing another worker
+            conn.execute(
+                "UPDATE work_items SET status = 'done', result = 'failed', owner = NULL, lease_expires = NULL, "
+                "finished_at = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, MAX_ATTEMPTS)
+            )
+            rows = conn.execute(
+                "SELECT work_items.job_id, work_items.video_id, work_items.video, "
+                "work_jobs.channel_url, work_jobs.params "
+                "FROM work_items JOIN work_jobs ON work_jobs.job_id = work_items.job_id "
+                "WHERE work_items.status = 'queued' "
+                "OR (work_items.status = 'leased' AND work_items.lease_expires < ?) "
+                "ORDER BY work_jobs.created_at, work_items.position LIMIT ?", (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE work_items SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE job_id = ? AND video_id = ?",
+                ((owner, now + lease_seconds, row['job_id'], row['video_id']) for row in rows)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [
+            {
+                'job_id': row['job_id'],
+                'channel_url': row['channel_url'],
+                'params': json.loads(row['params']),
+                'video': json.loads(row['video']),
+            }
+            for row in rows
+        ]
+
+    def renew(self, owner, lease_seconds):
+        """Heartbeat: extend the lease on every item this owner holds"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE work_items SET lease_expires = ? WHERE owner = ? AND status = 'leased'",
+                (time.time() + lease_seconds, owner)
+            )
+
+    def complete(self, job_id, video_id, owner, result):
+        """Mark an item done; False if its lease was lost to another owner in the meantime"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET status = 'done', result = ?, owner = NULL, lease_expires = NULL, "
+                "finished_at = ? WHERE job_id = ? AND video_id = ? AND owner = ? AND status = 'leased'",
+                (result, time.time(), job_id, video_id, owner)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, owner):
+        """Hand every item this owner holds back to the queue, e.g. on shutdown"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = 'queued', owner = NULL, lease_expires = NULL, "
+                "attempts = attempts - 1 WHERE owner = ? AND status = 'leased'", (owner,)
+            )
+
+    def cancel(self, job_id):
+        """Stop handing out a job's unfinished items; ones being fetched right now still finish"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = 'cancelled', owner = NULL, lease_expires = NULL "
+                "WHERE job_id = ? AND status IN ('queued', 'leased')", (job_id,)
+            )
+
+    def finished_since(self, job_id, since=0):
+        """[(video_id, result, finished_at)] of a job's items done at or after `since`, in finishing order"""
+        rows = self._connect().execute(
+            "SELECT video_id, result, finished_at FROM work_items "
+            "WHERE job_id = ? AND status = 'done' AND finished_at >= ? ORDER BY finished_at", (job_id, since)
+        ).fetchall()
+        return [(row['video_id'], row['result'], row['finished_at']) for row in rows]
+
+    def unfinished(self, job_id):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM work_items WHERE job_id = ? AND status IN ('queued', 'leased')", (job_id,)
+        ).fetchone()[0]
+
+    def remove(self, job_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM work_items WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM work_jobs WHERE job_id = ?", (job_id,))
+
+    def stats(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM work_items GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+class VideoWorker:
+    """Claims work items from a WorkQueue and fetches them on the running event loop
+
+    Up to `slots` items are held at once. Each job gets its own scraper, rate limiter
+    and fetch semaphore in this process, so a job's request rate applies per replica.
+    scraper_factory(item), if given, builds the scraper from a claimed item's job_id,
+    channel_url and params, like JobManager's does from a job.
+    """
+
+    def __init__(self, queue, output_dir="transcripts", slots=10, lease_seconds=60, poll_interval=1.0,
+                 scraper_factory=None, owner=None, max_jobs=16):
+        self.queue = queue
+        self.output_dir = output_dir
+        self.slots = slots
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.scraper_factory = scraper_factory
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_jobs = max_jobs
+        self.processed = 0
+        self._jobs = OrderedDict()
+
+    def _job(self, item):
+        """(scraper, rate_limiter, semaphore) for an item's job, kept for the most recent max_jobs jobs"""
+        job_id = item['job_id']
+        if job_id not in self._jobs:
+            from rate_limiter import AdaptiveRateLimiter
+            params = item['params']
+            if self.scraper_factory:
+                scraper = self.scraper_factory(item)
+            else:
+                from async_scraper import AsyncYouTubeChannelScraper
+                scraper = AsyncYouTubeChannelScraper(
+                    item['channel_url'], self.output_dir, max_in_flight=params.get('max_in_flight', 1),
+                    languages=LanguagePreference.from_params(params)
+                )
+            self._jobs[job_id] = (
+                scraper,
+                AdaptiveRateLimiter(rate=params.get('requests_per_second', 1.0)),
+                asyncio.Semaphore(params.get('max_in_flight', 1))
+            )
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._jobs.move_to_end(job_id)
+        return self._jobs[job_id]
+
+    async def _process(self, item):
+        video = item['video']
+        scraper, rate_limiter, semaphore = self._job(item)
+        try:
+            status = await scraper._fetch_and_save_async(
+                video, item['params'].get('include_timestamps', False), rate_limiter, semaphore
+            )
+        except Exception as e:
+            logger.error(f"Error processing video {video['id']}: {str(e)}")
+            status = "failed"
+        scraper._record_status(status)
+        if not await self._run_blocking(self.queue.complete, item['job_id'], video['id'], self.owner, status):
+            logger.info(f"Lease on {video['id']} was lost before it finished; its save is kept")
+        self.processed += 1
+
+    @staticmethod
+    async def _run_blocking(func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def run(self, idle_exit=None):
+        """Claim and process items until cancelled, or until `idle_exit` seconds pass with nothing to claim"""
+        active = set()
+        idle_since = time.monotonic()
+        last_renew = time.monotonic()
+        try:
+            while True:
+                if time.monotonic() - last_renew >= self.lease_seconds / 3:
+                    await self._run_blocking(self.queue.renew, self.owner, self.lease_seconds)
+                    last_renew = time.monotonic()
+                items = []
+                if len(active) < self.slots:
+                    items = await self._run_blocking(
+                        self.queue.claim, self.owner, self.lease_seconds, self.slots - len(active)
+                    )
+                    active.update(asyncio.ensure_future(self._process(item)) for item in items)
+                if active or items:
+                    idle_since = time.monotonic()
+                elif idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                    return
+                # Wake up as soon as a slot frees, or after poll_interval to look for new items
+                if active:
+                    _, active = await asyncio.wait(active, timeout=self.poll_interval,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            for task in active:
+                task.cancel()
+            self.queue.release(self.owner)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch queued videos for jobs coordinated by the web replicas")
+    parser.add_argument('--output-dir', default='transcripts')
+    parser.add_argument('--data-dir', default=os.environ.get('SCRAPER_DATA_DIR', 'data'))
+    parser.add_argument('--slots', type=int, default=int(os.environ.get('SCRAPER_WORKER_SLOTS', 10)))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    worker = VideoWorker(WorkQueue(work_queue_path(args.data_dir)), args.output_dir, slots=args.slots)
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,86 @@
+import io
+import os
+import time
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+
+# Content that is already compressed gains nothing from deflate
+STORED_EXTENSIONS = ('.gz', '.zip', '.zst', '.xz', '.bz2', '.tsb')
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that collects whatever zipfile writes
+
+    Because it cannot seek, zipfile writes sizes and CRCs in data descriptors after
+    each entry instead of going back to patch the local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files, compress=True, chunk_size=CHUNK_SIZE):
+    """Yield a ZIP archive of `files` chunk by chunk as entries are compressed
+
+    `files` is an iterable of (path, arcname) pairs, where path may instead be the
+    entry's content as bytes, and is consumed lazily. Memory use stays at roughly
+    one chunk plus compressor state (and one generated entry) regardless of archive size.
+    With compress=False, or for already-compressed files, entries are stored as-is.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for source, arcname in files:
+            if isinstance(source, bytes):
+                # Content generated on the fly, e.g. a rendered transcript
+                info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+                info.file_size = len(source)
+                src = io.BytesIO(source)
+            else:
+                try:
+                    info = zipfile.ZipInfo.from_file(source, arcname)
+                    src = open(source, 'rb')
+                except OSError:
+                    # File removed between listing and export
+                    continue
+            if compress and not arcname.endswith(STORED_EXTENSIONS):
+                info.compress_type = zipfile.ZIP_DEFLATED
+            else:
+                info.compress_type = zipfile.ZIP_STORED
+
+            with src, zf.open(info, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def directory_files(directory):
+    """(path, arcname) pairs for the regular files directly inside directory"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield entry.path, entry.name